@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+
+import asyncpg
+import numpy as np
+import pandas as pd
+
+from db_config import DB_CONFIG
+from queries import ALERT_KINDS, PRICE_CLUSTERS
+from username_features import LENGTH_BUCKET_EDGES, LENGTH_BUCKET_LABELS
+
+# Потоковый поиск подозрительных продаж на пути загрузки (upload_to_db.insert_batch).
+# Вся статистика обновляется за O(1) на продажу:
+# - цена — по группе "длина имени x кластер предыдущей продажи имени" (или "не продавалось" за RESALE_WINDOW):
+#   EWMA и робастная оценка (медиана и 90-й перцентиль) логарифма цены. Кластер по цене самой продажи
+#   в ключ не входит: накрученная продажа попала бы в группу дорогих и сравнивалась бы не со своими;
+# - частота продаж — по группе "ценовой кластер x длина", в коротком и длинном окне;
+# - по именам — последняя продажа за RESALE_WINDOW (перепродажа с накруткой цены, analysis/накрутка цены.png).
+# Найденное пишется в sale_alerts (sql/migrations/009_sale_alerts.sql).
+
+# Кластеры в порядке возрастания цены и их верхние границы (как в column_store.py)
+CLUSTER_NAMES = [name for name in PRICE_CLUSTERS if name != "all"]
+CLUSTER_BOUNDS = np.array([PRICE_CLUSTERS[name][1] for name in CLUSTER_NAMES[:-1]], dtype=np.float64)
+
+# Цена: вес новой продажи в EWMA (~50 последних продаж) и шаг слежения за квантилями
+PRICE_ALPHA = 0.02
+QUANTILE_STEP = 0.02
+# Разброс — по верхнему хвосту (90-й перцентиль минус медиана, в сигмах нормального распределения):
+# MAD у цен с массой в одной точке (10 TON) стремится к нулю, а интересны только завышенные цены
+UPPER_QUANTILE = 0.9
+UPPER_SIGMAS = 1.2816
+# Разброс логарифма цены не меньше ~5%
+MIN_SCALE = 0.05
+# Продажа подозрительна, если ее цена выше и по робастной оценке, и по EWMA, и хотя бы втрое выше медианы
+# (иначе в группах, где почти все продано по 10 TON, отмечалась бы любая продажа за 20-25)
+ROBUST_Z = 5.0
+EWMA_Z = 3.0
+MIN_PRICE_RATIO = 3.0
+# Сколько продаж группы нужно, прежде чем по ней выдаются предупреждения
+MIN_SALES = 50
+
+# Перепродажа того же имени не позже чем через RESALE_WINDOW дороже предыдущей в RESALE_RATIO раз и больше
+RESALE_WINDOW = 30 * 86_400
+RESALE_RATIO = 3.0
+
+# Частота продаж: короткое окно (analysis/логика продажи в последние 4 часа.png) против недельной нормы
+BURST_WINDOW = 4 * 3_600
+BASELINE_WINDOW = 7 * 86_400
+BURST_RATIO = 4.0
+BURST_MIN_SALES = 20
+# Норма частоты считается установившейся после суток наблюдений группы
+BURST_WARMUP = 86_400
+
+# Сколько дней истории прогоняется через детектор при запуске загрузчика
+WARM_UP_DAYS = RESALE_WINDOW // 86_400
+
+# Строк за одно чтение при прогоне всей истории
+REPLAY_CHUNK_ROWS = 200_000
+
+ALERT_COLUMNS = ["sale_id", "kind", "username", "price", "sale_date", "price_cluster", "length_bucket",
+                 "score", "baseline"]
+
+SALES_COLUMNS = "id, username, price::FLOAT8 AS price, sale_date, name_length"
+
+MIN_LOG_EXCESS = math.log(MIN_PRICE_RATIO)
+
+
+class PriceStats:
+    """Скользящая статистика цены одной группы "длина x прошлый кластер имени": все обновления — O(1)"""
+
+    __slots__ = ("count", "mean", "var", "median", "upper")
+
+    def __init__(self, log_price):
+        self.count = 0
+        self.mean = self.median = log_price
+        self.var = 0.25
+        self.upper = log_price + 0.5
+
+    def price_scores(self, x):
+        """(робастный z, z по EWMA) логарифма цены x, затем обновление статистики"""
+        # Сравнения вместо max()/min(): метод вызывается на каждую продажу
+        scale = (self.upper - self.median) / UPPER_SIGMAS
+        if scale < MIN_SCALE:
+            scale = MIN_SCALE
+        robust_z = (x - self.median) / scale
+        # Тот же нижний предел разброса: иначе после серии одинаковых цен std = 0, обрезка ниже
+        # обнуляет любое отклонение и EWMA группы больше не сдвигается
+        std = math.sqrt(self.var)
+        if std < MIN_SCALE:
+            std = MIN_SCALE
+        ewma_z = (x - self.mean) / std
+
+        self.count += 1
+        # Квантили — стохастическим приближением (шаг по знаку отклонения, пропорционален разбросу);
+        # в начале шаг крупнее, чтобы оценка быстрее дошла до уровня группы
+        weight = 1.0 / self.count
+        step = (weight if weight > QUANTILE_STEP else QUANTILE_STEP) * scale
+        if x > self.median:
+            self.median += step
+        elif x < self.median:
+            self.median -= step
+        # Равновесие при P(цена выше upper) = 1 - UPPER_QUANTILE
+        if x > self.upper:
+            self.upper += step * UPPER_QUANTILE
+        else:
+            self.upper -= step * (1 - UPPER_QUANTILE)
+        if self.upper < self.median:
+            self.upper = self.median
+        # В EWMA выбросы входят обрезанными, чтобы одна накрутка не сдвигала норму
+        delta = x - self.mean
+        if self.count > MIN_SALES and abs(delta) > 4 * std:
+            delta = 4 * std if delta > 0 else -4 * std
+        # Начальная дисперсия считается одним наблюдением: первая продажа не обнуляет ее
+        alpha = 1.0 / (self.count + 1)
+        if alpha < PRICE_ALPHA:
+            alpha = PRICE_ALPHA
+        self.mean += alpha * delta
+        self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        return robust_z, ewma_z
+
+
+class RateStats:
+    """Частота продаж одной группы "кластер x длина": затухающие счетчики, обновления — O(1)"""
+
+    __slots__ = ("short_rate", "long_rate", "first_seen", "last_seen", "bursting")
+
+    def __init__(self, timestamp):
+        self.short_rate = self.long_rate = 0.0
+        self.first_seen = self.last_seen = timestamp
+        self.bursting = False
+
+    def rate_ratio(self, timestamp):
+        """(продаж в коротком окне, ожидаемо по норме) после учета продажи в момент timestamp"""
+        elapsed = timestamp - self.last_seen
+        if elapsed > 0:
+            self.last_seen = timestamp
+        else:
+            elapsed = 0.0  # Продажа старше уже учтенных (опоздавшая строка ленты)
+        # Экспоненциально затухающие счетчики: ~число продаж за последние BURST_WINDOW и BASELINE_WINDOW
+        self.short_rate = self.short_rate * math.exp(-elapsed / BURST_WINDOW) + 1
+        self.long_rate = self.long_rate * math.exp(-elapsed / BASELINE_WINDOW) + 1
+        age = self.last_seen - self.first_seen
+        if age < BURST_WARMUP:
+            return self.short_rate, None
+        # Поправка на то, что длинное окно еще не заполнено историей группы
+        observed = 1 - math.exp(-age / BASELINE_WINDOW)
+        return self.short_rate, self.long_rate / observed * BURST_WINDOW / BASELINE_WINDOW
+
+
+class AnomalyDetector:
+    """Потоковый детектор: продажи подаются по времени пакетами, возвращаются предупреждения"""
+
+    def __init__(self):
+        self.price_groups = {}
+        self.rate_groups = {}
+        # Последняя продажа имени (время, цена, кластер) за RESALE_WINDOW, от старых к новым
+        self.last_sales = OrderedDict()
+        self.processed = 0
+
+    def process(self, sales, alerts=True):
+        """Продажи DataFrame(id, username, price, sale_date, name_length) в порядке времени -> предупреждения.
+
+        Предупреждения — DataFrame со столбцами ALERT_COLUMNS; alerts=False только обновляет статистику (прогрев).
+        """
+        price = sales['price'].to_numpy(dtype=np.float64)
+        valid = price > 0
+        if not valid.all():
+            sales, price = sales[valid], price[valid]
+        if sales.empty:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        timestamps = (sales['sale_date'].to_numpy(dtype='datetime64[ns]').view(np.int64) / 1e9).tolist()
+        cluster = np.searchsorted(CLUSTER_BOUNDS, price, side='right')
+        length = np.searchsorted(LENGTH_BUCKET_EDGES, sales['name_length'].to_numpy(dtype=np.int64), side='left')
+        groups = (cluster * len(LENGTH_BUCKET_LABELS) + length).tolist()
+        log_prices = np.log(price).tolist()
+        # Ключ ценовой группы: длина x кластер прошлой продажи имени, len(CLUSTER_NAMES) — имя не продавалось
+        history_clusters = len(CLUSTER_NAMES) + 1
+
+        found = []  # (позиция, вид, оценка, база сравнения)
+        price_groups, rate_groups = self.price_groups, self.rate_groups
+        last_sales = self.last_sales
+        for i, (length_group, sale_cluster, group, timestamp, x, username, value) in enumerate(
+                zip(length.tolist(), cluster.tolist(), groups, timestamps, log_prices, sales['username'].tolist(),
+                    price.tolist())):
+            previous = last_sales.pop(username, None)
+            price_group = length_group * history_clusters + (previous[2] if previous is not None
+                                                              else len(CLUSTER_NAMES))
+            price_stats = price_groups.get(price_group)
+            if price_stats is None:
+                price_stats = price_groups[price_group] = PriceStats(x)
+            warmed = price_stats.count >= MIN_SALES
+            typical = price_stats.median
+
+            robust_z, ewma_z = price_stats.price_scores(x)
+            if alerts and warmed and robust_z >= ROBUST_Z and ewma_z >= EWMA_Z and x - typical >= MIN_LOG_EXCESS:
+                found.append((i, "price", robust_z, math.exp(typical)))
+
+            stats = rate_groups.get(group)
+            if stats is None:
+                stats = rate_groups[group] = RateStats(timestamp)
+            recent, expected = stats.rate_ratio(timestamp)
+            if expected is not None:
+                ratio = recent / max(expected, 1.0)
+                if not stats.bursting and recent >= BURST_MIN_SALES and ratio >= BURST_RATIO:
+                    # Одно предупреждение на всплеск: следующее — после возврата частоты к норме
+                    stats.bursting = True
+                    if alerts:
+                        found.append((i, "burst", ratio, expected))
+                elif stats.bursting and ratio < BURST_RATIO / 2:
+                    stats.bursting = False
+
+            if previous is not None and alerts and timestamp - previous[0] <= RESALE_WINDOW \
+                    and value >= RESALE_RATIO * previous[1]:
+                found.append((i, "resale", value / previous[1], previous[1]))
+            last_sales[username] = (timestamp, value, sale_cluster)
+
+        # Продажи идут по времени, поэтому устаревшие имена — в начале словаря
+        horizon = timestamps[-1] - RESALE_WINDOW
+        while last_sales and next(iter(last_sales.values()))[0] < horizon:
+            last_sales.popitem(last=False)
+        self.processed += len(groups)
+        return self._alerts(sales, price, cluster, length, found)
+
+    @staticmethod
+    def _alerts(sales, price, cluster, length, found):
+        if not found:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        positions, kinds, scores, baselines = zip(*found)
+        positions = np.array(positions)
+        return pd.DataFrame({
+            "sale_id": sales['id'].to_numpy(dtype=np.int64)[positions],
+            "kind": kinds,
+            "username": sales['username'].to_numpy()[positions],
+            "price": price[positions],
+            "sale_date": sales['sale_date'].to_numpy()[positions],
+            "price_cluster": np.array(CLUSTER_NAMES)[cluster[positions]],
+            "length_bucket": np.array(LENGTH_BUCKET_LABELS)[length[positions]],
+            "score": np.round(scores, 3),
+            "baseline": np.round(baselines, 3),
+        })
+
+
+def records_to_frame(records):
+    """Строки asyncpg (SALES_COLUMNS) -> DataFrame для AnomalyDetector.process"""
+    return pd.DataFrame([tuple(record) for record in records],
+                        columns=["id", "username", "price", "sale_date", "name_length"])
+
+
+async def save_alerts(conn, alerts):
+    """Запись предупреждений; повторная обработка тех же продаж дублей не создает"""
+    if alerts.empty:
+        return 0
+    await conn.executemany(
+        f"""
+        INSERT INTO sale_alerts ({', '.join(ALERT_COLUMNS)})
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT DO NOTHING
+        """,
+        [(int(row.sale_id), row.kind, row.username, float(row.price), pd.Timestamp(row.sale_date).to_pydatetime(),
+          row.price_cluster, row.length_bucket, float(row.score), float(row.baseline))
+         for row in alerts.itertuples()]
+    )
+    return len(alerts)
+
+
+async def record_alerts(conn, detector, source="sold_inserted"):
+    """Прогон через детектор строк из source (только что вставленных) и запись предупреждений.
+
+    Вызывается в транзакции пакета; если она откатится, статистика детектора уже учла эти продажи —
+    при повторной вставке они лишь немного сдвинут нормы, дублей предупреждений не будет.
+    """
+    records = await conn.fetch(f"SELECT {SALES_COLUMNS} FROM {source} ORDER BY sale_date, id")
+    alerts = detector.process(records_to_frame(records))
+    return await save_alerts(conn, alerts)
+
+
+async def warm_up(conn, detector, days=WARM_UP_DAYS, table="sold_usernames"):
+    """Прогон последних days дней истории без предупреждений: нормы групп и недавние продажи имен"""
+    started = time.perf_counter()
+    records = await conn.fetch(
+        f"""
+        SELECT {SALES_COLUMNS}
+        FROM {table}
+        WHERE sale_date >= (SELECT MAX(sale_date) FROM {table}) - INTERVAL '{int(days)} days'
+        ORDER BY sale_date, id
+        """
+    )
+    detector.process(records_to_frame(records), alerts=False)
+    logging.info(f"Детектор аномалий прогрет по {len(records)} продажам за {time.perf_counter() - started:.2f} с.")
+    return len(records)
+
+
+async def rebuild_alerts(conn, chunk_rows=REPLAY_CHUNK_ROWS):
+    """Прогон всей истории sold_usernames и перезапись sale_alerts (после смены порогов или бэкфилла)"""
+    detector = AnomalyDetector()
+    started = time.perf_counter()
+    total = 0
+    async with conn.transaction():
+        await conn.execute("TRUNCATE sale_alerts")
+        cursor = await conn.cursor(f"SELECT {SALES_COLUMNS} FROM sold_usernames ORDER BY sale_date, id")
+        while True:
+            records = await cursor.fetch(chunk_rows)
+            if not records:
+                break
+            total += await save_alerts(conn, detector.process(records_to_frame(records)))
+    logging.info(f"Прогнано продаж: {detector.processed} за {time.perf_counter() - started:.1f} с, "
+                 f"предупреждений: {total}.")
+    return total
+
+
+async def main(args):
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        if args.rebuild:
+            await rebuild_alerts(conn)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Поиск подозрительных продаж (накрутка цены, всплески продаж)")
+    parser.add_argument("--rebuild", action="store_true", help="Прогнать всю историю и перезаписать sale_alerts")
+    asyncio.run(main(parser.parse_args()))
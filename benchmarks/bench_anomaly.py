@@ -0,0 +1,145 @@
+"""Прогон синтетической истории продаж через детектор аномалий: скорость и найденные подмешанные аномалии.
+
+К продажам из synthetic.py подмешиваются перепродажи тех же имен с накруткой цены, продажи
+по цене в десятки раз выше типичной для группы (в том числе дешевых имен по цене дорогого кластера)
+и всплески продаж в одной группе за пару часов. Детектор (anomaly_detector.py) получает историю
+пакетами, как от загрузчика; база не нужна. Перед прогоном — короткая проверка на группе около 10 TON.
+
+Пример: python benchmarks/bench_anomaly.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anomaly_detector
+from synthetic import generate_sales
+
+# Цель: история из миллиона продаж прогоняется за секунды
+TARGET_SECONDS = 10
+
+LETTERS = list("abcdefghijklmnopqrstuvwxyz")
+
+
+def inject(sales, count, seed):
+    """Продажи с подмешанными аномалиями и вид подмешанной аномалии у каждой строки (или None)"""
+    rng = np.random.default_rng(seed)
+    start, end = sales['sale_date'].min(), sales['sale_date'].max()
+    # Подмешиваем после первой недели: детектору нужна норма групп
+    usable = sales[sales['sale_date'] > start + pd.Timedelta(days=7)]
+    parts = [sales.assign(injected=None)]
+
+    # Перепродажа: то же имя через 1-10 дней в 5-10 раз дороже
+    source = usable.sample(count, random_state=seed)
+    parts.append(pd.DataFrame({
+        "username": source['username'].to_numpy(),
+        "price": np.round(source['price'].to_numpy() * rng.uniform(5, 10, count)),
+        "sale_date": source['sale_date'].to_numpy() + pd.to_timedelta(rng.integers(1, 11, count), unit="D"),
+        "injected": "resale",
+    }))
+
+    # Цена: имена из дорогой группы по цене в 30-100 раз выше медианы ее продаж
+    expensive = usable[usable['price'] >= anomaly_detector.CLUSTER_BOUNDS[-1]]
+    source = expensive.sample(count, random_state=seed + 1)
+    parts.append(pd.DataFrame({
+        "username": [f"{name}x" for name in source['username']],
+        "price": np.round(expensive['price'].median() * rng.uniform(30, 100, count)),
+        "sale_date": source['sale_date'].to_numpy(),
+        "injected": "price",
+    }))
+
+    # Переход кластера: имя, проданное дешевле 25 TON, через 1-10 дней продается за 100-400 TON
+    cheap = usable[usable['price'] < anomaly_detector.CLUSTER_BOUNDS[0]]
+    source = cheap.sample(count, random_state=seed + 2)
+    parts.append(pd.DataFrame({
+        "username": source['username'].to_numpy(),
+        "price": rng.integers(100, 400, count).astype(np.float64),
+        "sale_date": source['sale_date'].to_numpy() + pd.to_timedelta(rng.integers(1, 11, count), unit="D"),
+        "injected": "cross",
+    }))
+
+    # Всплеск: 100 продаж пятибуквенных имен по 30-70 TON за 2 часа
+    bursts = max(1, count // 10)
+    moments = start + (end - start) * rng.uniform(0.2, 1.0, bursts)
+    for moment in moments:
+        parts.append(pd.DataFrame({
+            "username": ["".join(rng.choice(LETTERS, 5)) for _ in range(100)],
+            "price": rng.integers(30, 70, 100).astype(np.float64),
+            "sale_date": moment + pd.to_timedelta(np.sort(rng.integers(0, 7_200, 100)), unit="s"),
+            "injected": "burst",
+        }))
+
+    mixed = pd.concat(parts, ignore_index=True)
+    mixed = mixed[mixed['sale_date'] <= end].sort_values("sale_date", kind="stable", ignore_index=True)
+    mixed['id'] = np.arange(1, len(mixed) + 1)
+    mixed['name_length'] = mixed['username'].str.len()
+    return mixed
+
+
+def check_cross_cluster():
+    """Продажи семибуквенных имен около 10 TON, затем накрученные: какие из них отмечены"""
+    rng = np.random.default_rng(0)
+    normal = 200
+    pumped = [24.0, 70.0, 150.0, 300.0, 2000.0]
+    sales = pd.DataFrame({
+        "id": np.arange(1, normal + len(pumped) + 1),
+        "username": [f"name{i:03d}" for i in range(normal + len(pumped))],
+        "price": np.concatenate([np.round(rng.uniform(8, 12, normal), 1), pumped]),
+        "sale_date": pd.Timestamp("2026-01-01") + pd.to_timedelta(np.arange(normal + len(pumped)) * 3, unit="h"),
+    })
+    sales['name_length'] = sales['username'].str.len()
+    alerts = anomaly_detector.AnomalyDetector().process(sales)
+    flagged = set(alerts.loc[alerts['kind'] == "price", 'price'].astype(float))
+    # 24 TON меньше чем втрое выше медианы — не отмечается, остальные должны
+    expected = {price for price in pumped if price >= 10 * anomaly_detector.MIN_PRICE_RATIO}
+    print("Группа около 10 TON: " + ", ".join(f"{price:g} — {'да' if price in flagged else 'нет'}"
+                                             for price in pumped)
+          + f"; как ожидалось: {'да' if flagged == expected else 'нет'}")
+    return flagged == expected
+
+
+def run(args):
+    check_cross_cluster()
+    sales = pd.concat(generate_sales(args.rows, end=args.end, days=args.days, seed=args.seed), ignore_index=True)
+    sales = inject(sales, args.inject, args.seed)
+    injected = sales['injected']
+
+    detector = anomaly_detector.AnomalyDetector()
+    started = time.perf_counter()
+    alerts = pd.concat([detector.process(sales.iloc[offset:offset + args.batch])
+                        for offset in range(0, len(sales), args.batch)], ignore_index=True)
+    elapsed = time.perf_counter() - started
+    print(f"Продаж: {len(sales):,}, прогон: {elapsed:.2f} с ({len(sales) / elapsed / 1000:.0f} тыс./с, "
+          f"{elapsed / len(sales) * 1e6:.2f} мкс на продажу), цель {TARGET_SECONDS} с: "
+          f"{'да' if elapsed <= TARGET_SECONDS else 'нет'}")
+
+    flagged = alerts.merge(sales[['id', 'injected']], left_on="sale_id", right_on="id")
+    print(f"\n{'вид':<8} {'предупреждений':>15} {'из подмешанных':>15} {'подмешано':>10} {'найдено':>8}")
+    for kind in anomaly_detector.ALERT_KINDS:
+        of_kind = flagged[flagged['kind'] == kind]
+        hits = of_kind['injected'] == kind
+        # Всплеск отмечается один раз — по продаже, на которой частота превысила норму
+        planted = (injected == kind).sum() // (100 if kind == "burst" else 1)
+        print(f"{kind:<8} {len(of_kind):15d} {hits.sum():15d} {planted:10d} {hits.sum() / max(planted, 1):8.0%}")
+    # Переход кластера засчитывается по любому виду предупреждения
+    crossed = flagged.loc[flagged['injected'] == "cross", 'sale_id'].nunique()
+    planted = (injected == "cross").sum()
+    print(f"{'cross':<8} {'':>15} {crossed:15d} {planted:10d} {crossed / max(planted, 1):8.0%}")
+    false_alerts = flagged['injected'].isna().sum()
+    print(f"\nПредупреждений по обычным продажам: {false_alerts} ({false_alerts / injected.isna().sum():.3%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365, help="Длина истории в днях")
+    parser.add_argument("--end", default="2026-10-17")
+    parser.add_argument("--inject", type=int, default=100, help="Подмешать аномалий каждого вида")
+    parser.add_argument("--batch", type=int, default=10_000, help="Продаж в пакете (как от загрузчика)")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
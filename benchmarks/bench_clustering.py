@@ -0,0 +1,99 @@
+"""Сравнение одномерного DBSCAN (price_clustering) с sklearn DBSCAN: время и совпадение меток.
+
+Пример: python benchmarks/bench_clustering.py --synthetic 20000 200000 --eps 1000 5 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_clustering import PriceDistribution, dbscan_1d, kmeans_1d, natural_breaks
+
+# Выше этого размера sklearn не запускаем: его память растет с числом пар соседей
+# (на 50 тыс. цен с крупным eps ему не хватает памяти, как и в run_suite.py)
+SKLEARN_LIMIT = 10_000
+
+
+def synthetic_prices(n, seed=0):
+    """Цены, похожие на ленту: логнормальная смесь, округленная до круглых значений и центов"""
+    rng = np.random.default_rng(seed)
+    log_prices = np.concatenate([
+        rng.normal(1.0, 0.15, n // 2),
+        rng.normal(1.7, 0.25, n // 3),
+        rng.normal(2.8, 0.4, n - n // 2 - n // 3),
+    ])
+    prices = 10 ** log_prices
+    round_mask = rng.random(n) < 0.6
+    prices[round_mask] = np.round(prices[round_mask])
+    return np.round(prices, 2)
+
+
+def rounded_prices(n=278, seed=0):
+    """Цены с одним знаком после запятой: разность цен у края eps округляется (15.9 - 15.4 = 0.5000000000000018)"""
+    rng = np.random.default_rng(seed)
+    return np.round(rng.uniform(5, 30, n), 1)
+
+
+def load_db_prices():
+    from queries import read
+    return read("SELECT price FROM public.sold_usernames ORDER BY id")['price'].to_numpy(dtype=np.float64)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def compare_dbscan(name, prices, eps, min_samples):
+    labels, elapsed = timed(dbscan_1d, prices, eps, min_samples)
+    line = f"{name:<16} n={len(prices):<9} eps={eps:<7g} clusters={labels.max() + 1:<5} 1d={elapsed:.3f}s"
+    if len(prices) <= SKLEARN_LIMIT:
+        from sklearn.cluster import DBSCAN
+        reference, sklearn_elapsed = timed(DBSCAN(eps=eps, min_samples=min_samples).fit_predict, prices.reshape(-1, 1))
+        same = np.array_equal(labels, reference)
+        line += f" sklearn={sklearn_elapsed:.3f}s labels={'совпадают' if same else 'ОТЛИЧАЮТСЯ'}"
+    print(line)
+
+
+def check_incremental(prices, eps, min_samples, parts=4):
+    """Пополнение распределения частями дает те же метки, что и расчет сразу по всем ценам"""
+    distribution = PriceDistribution()
+    for chunk in np.array_split(prices, parts):
+        distribution.add(chunk)
+    labels = distribution.dbscan(eps, min_samples)[distribution.index_of(prices)]
+    same = np.array_equal(labels, dbscan_1d(prices, eps, min_samples))
+    print(f"{'incremental':<16} n={len(prices):<9} parts={parts} labels={'совпадают' if same else 'ОТЛИЧАЮТСЯ'}")
+
+
+def run(args):
+    datasets = []
+    if not args.no_db:
+        datasets.append(("db", load_db_prices()))
+    datasets += [("synthetic", synthetic_prices(n)) for n in args.synthetic]
+
+    # Граница eps при округленных ценах
+    compare_dbscan("rounded", rounded_prices(), 0.5, 6)
+    for name, prices in datasets:
+        for eps in args.eps:
+            compare_dbscan(name, prices, eps, args.min_samples)
+        check_incremental(prices, args.eps[-1], args.min_samples)
+        breaks, elapsed = timed(natural_breaks, prices, args.k)
+        print(f"{'natural_breaks':<16} n={len(prices):<9} k={args.k} time={elapsed:.3f}s breaks={np.round(breaks, 2)}")
+        (centers, bounds), elapsed = timed(kmeans_1d, prices, args.k)
+        print(f"{'kmeans_1d':<16} n={len(prices):<9} k={args.k} time={elapsed:.3f}s bounds={np.round(bounds, 2)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[20_000, 200_000, 2_000_000],
+                        help="Размеры синтетических выборок")
+    parser.add_argument("--eps", type=float, nargs="+", default=[1000, 5, 0.5])
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--k", type=int, default=4, help="Число классов для natural breaks и k-means")
+    parser.add_argument("--no-db", action="store_true", help="Не загружать цены из базы")
+    run(parser.parse_args())
@@ -0,0 +1,72 @@
+"""Задержка одного изменения периода на дашборде: последовательные запросы против параллельных.
+
+Пример: python benchmarks/bench_dashboard.py --start 2025-03-01 --end 2025-03-20 --repeat 20 --tabs 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries
+from dashboard_data import QueryBatcher
+
+
+def interaction(start, end):
+    """Запросы, которые вызывает смена date-picker (как в load_dashboard_data)"""
+    return {
+        "daily_stats": ("get_daily_stats", (start, end, "all", None, "all")),
+        "daily_stats_filtered": ("get_daily_stats", (start, end, "all", (10, 1000), "clean")),
+        "price_histogram": ("get_price_histogram", (start, end, 1, 1000)),
+        "hourly_activity": ("get_hourly_activity", (start, end, "Europe/Moscow")),
+    }
+
+
+def sequential(source, requests):
+    """Прежнее поведение: каждый запрос ждет предыдущий"""
+    return {name: getattr(source, method)(*args) for name, (method, args) in requests.items()}
+
+
+def measure(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def report(name, p50, p95):
+    print(f"{name:<28} p50={p50:8.1f}ms p95={p95:8.1f}ms")
+
+
+def run(args):
+    requests = interaction(args.start, args.end)
+    batcher = QueryBatcher(queries)
+    sequential(queries, requests)  # Прогрев пула соединений
+
+    report("последовательно", *measure(lambda: sequential(queries, requests), args.repeat))
+    report("параллельно", *measure(lambda: batcher.fetch(requests), args.repeat))
+
+    # Несколько вкладок меняют период одновременно: одинаковые запросы выполняются один раз
+    with ThreadPoolExecutor(max_workers=args.tabs) as tabs:
+        def concurrent_tabs(fetch):
+            list(tabs.map(lambda _: fetch(), range(args.tabs)))
+        report(f"{args.tabs} вкладки, последовательно",
+               *measure(lambda: concurrent_tabs(lambda: sequential(queries, requests)), args.repeat))
+        report(f"{args.tabs} вкладки, параллельно",
+               *measure(lambda: concurrent_tabs(lambda: batcher.fetch(requests)), args.repeat))
+    print(f"Объединено одинаковых запросов: {batcher.deduplicated}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", help="Начало периода (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Конец периода (YYYY-MM-DD)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tabs", type=int, default=4, help="Число одновременных вкладок")
+    run(parser.parse_args())
@@ -0,0 +1,50 @@
+"""Сравнение скорости движков разбора HTML (строк в секунду) на сохраненных страницах ленты.
+
+Пример: python benchmarks/bench_extractors.py --pages-dir saved_pages --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import available_extractors, get_extractor
+
+
+def load_pages(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append(f.read())
+    return pages
+
+
+def run(args):
+    pages = load_pages(args.pages_dir)
+    reference = None
+    for name in available_extractors():
+        extract = get_extractor(name)
+        rows = [extract(page) for page in pages]
+        # Все движки должны давать одинаковый результат
+        if reference is None:
+            reference = rows
+        elif rows != reference:
+            print(f"{name}: результат отличается от эталона ({available_extractors()[0]})")
+
+        started = time.perf_counter()
+        total = 0
+        for _ in range(args.repeat):
+            for page in pages:
+                total += len(extract(page))
+        elapsed = time.perf_counter() - started
+        print(f"{name:<11} pages={len(pages) * args.repeat:<6} rows={total:<8} time={elapsed:.3f}s "
+              f"rows/s={total / elapsed:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages-dir", required=True, help="Каталог с сохраненными страницами ленты (*.html)")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,38 @@
+"""Замер пропускной способности обхода ленты на сохраненных HTML-страницах.
+
+Пример: python benchmarks/bench_fetcher.py --pages-dir saved_pages --delay 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetcher import fetch_sold_rows, start_fixture_server
+from upload_to_db import parse_html
+
+
+async def run(args):
+    runner = await start_fixture_server(args.pages_dir, port=args.port, delay=args.delay)
+    base_url = f"http://127.0.0.1:{args.port}/"
+    try:
+        for concurrency in args.concurrency:
+            started = time.perf_counter()
+            rows = await fetch_sold_rows(base_url, parse_html, concurrency=concurrency, max_pages=args.max_pages)
+            elapsed = time.perf_counter() - started
+            print(f"concurrency={concurrency:<3} rows={len(rows):<7} time={elapsed:.3f}s "
+                  f"rows/s={len(rows) / elapsed:.0f}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages-dir", required=True, help="Каталог с сохраненными страницами ленты (*.html)")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0, help="Искусственная задержка ответа, секунды")
+    parser.add_argument("--max-pages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""Сравнение построчной вставки и пакетной вставки через COPY на локальном PostgreSQL.
+
+Замер идет в отдельную таблицу bench_sold_usernames, рабочие данные не затрагиваются.
+Пример: python benchmarks/bench_insert.py --sizes 10000 1000000 --legacy-limit 10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_config import DB_CONFIG
+from upload_to_db import insert_batch
+
+BENCH_TABLE = "bench_sold_usernames"
+
+
+def make_records(count, seed=0):
+    """Синтетические записи (username, price, sale_date) с уникальными именами"""
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    alphabet = string.ascii_lowercase + string.digits + "_"
+    return [
+        (
+            "".join(rnd.choices(string.ascii_lowercase, k=1) + rnd.choices(alphabet, k=rnd.randint(4, 15))) + str(i),
+            round(rnd.lognormvariate(3, 1.2), 2),
+            start + timedelta(seconds=i * 30)
+        )
+        for i in range(count)
+    ]
+
+
+async def reset_table(conn):
+    await conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    # Те же столбцы и генерируемые признаки, что у sold_usernames, но со своим счетчиком id
+    await conn.execute(
+        f"""
+        CREATE TABLE {BENCH_TABLE} (LIKE sold_usernames INCLUDING GENERATED);
+        ALTER TABLE {BENCH_TABLE}
+            ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY,
+            ADD PRIMARY KEY (id),
+            ADD UNIQUE (username, sale_date);
+        """
+    )
+
+
+async def insert_rowwise(conn, records):
+    """Прежний путь: один INSERT ... ON CONFLICT на строку"""
+    for username, price, sale_date in records:
+        await conn.execute(
+            f"""
+            INSERT INTO {BENCH_TABLE} (username, price, sale_date)
+            VALUES ($1, $2, $3)
+            ON CONFLICT DO NOTHING
+            """,
+            username, price, sale_date
+        )
+
+
+async def run(args):
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        for size in args.sizes:
+            records = make_records(size)
+
+            if size <= args.legacy_limit:
+                await reset_table(conn)
+                started = time.perf_counter()
+                await insert_rowwise(conn, records)
+                elapsed = time.perf_counter() - started
+                print(f"rowwise rows={size:<8} time={elapsed:.3f}s rows/s={size / elapsed:.0f}")
+
+            await reset_table(conn)
+            started = time.perf_counter()
+            inserted, duplicates = await insert_batch(conn, records, table=BENCH_TABLE, rollups=False, partitions=False)
+            elapsed = time.perf_counter() - started
+            print(f"copy    rows={size:<8} time={elapsed:.3f}s rows/s={size / elapsed:.0f} "
+                  f"inserted={inserted} duplicates={duplicates}")
+
+            # Повторная загрузка той же пачки: все строки должны оказаться дубликатами
+            started = time.perf_counter()
+            inserted, duplicates = await insert_batch(conn, records, table=BENCH_TABLE, rollups=False, partitions=False)
+            elapsed = time.perf_counter() - started
+            print(f"copy    rows={size:<8} time={elapsed:.3f}s rows/s={size / elapsed:.0f} "
+                  f"inserted={inserted} duplicates={duplicates} (повтор)")
+        await conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--legacy-limit", type=int, default=10_000,
+                        help="Построчную вставку замеряем только до этого размера")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""Отсечение разделов на запросах дашборда: одна heap-таблица против помесячных разделов.
+
+Создает в схеме partition_bench две копии sold_usernames с одинаковыми синтетическими данными
+(обычная таблица с B-tree, как до 006_partition_sold_usernames.sql, и секционированная
+с BRIN + B-tree) и сравнивает EXPLAIN ANALYZE запросов из queries.DASHBOARD_QUERIES.
+
+Пример: python benchmarks/bench_partitions.py --rows 20000000 --months 36
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import DASHBOARD_QUERIES, engine
+
+SCHEMA = "partition_bench"
+HEAP_TABLE = f"{SCHEMA}.sold_heap"
+PARTITIONED_TABLE = f"{SCHEMA}.sold_partitioned"
+
+# Окна дат, отсчитываемые от конца синтетической истории (дней)
+WINDOWS = [1, 7, 30, 90]
+
+
+def execute(cursor, sql, params=None):
+    started = time.perf_counter()
+    cursor.execute(sql, params)
+    return time.perf_counter() - started
+
+
+def create_tables(cursor, rows, months, end_date):
+    """Две таблицы с одинаковыми данными: строки идут в порядке sale_date, как при загрузке ленты"""
+    start_date = end_date - pd.DateOffset(months=months)
+    end_date = end_date + pd.Timedelta(days=1)  # Последний день окна заполнен целиком
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"CREATE TABLE {HEAP_TABLE} (LIKE public.sold_usernames INCLUDING GENERATED)")
+    cursor.execute(
+        f"CREATE TABLE {PARTITIONED_TABLE} (LIKE public.sold_usernames INCLUDING GENERATED) "
+        f"PARTITION BY RANGE (sale_date)"
+    )
+    for month in pd.date_range(start_date.replace(day=1), end_date, freq="MS"):
+        cursor.execute(
+            f"CREATE TABLE {SCHEMA}.sold_p{month:%Y_%m} PARTITION OF {PARTITIONED_TABLE} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            (month.to_pydatetime(), (month + pd.DateOffset(months=1)).to_pydatetime())
+        )
+
+    elapsed = execute(cursor, f"""
+        INSERT INTO {HEAP_TABLE} (id, username, price, sale_date)
+        SELECT
+            i,
+            substr(md5(i::TEXT), 1, 5 + i %% 10) || CASE WHEN i %% 7 = 0 THEN '_' || i %% 100 ELSE '' END,
+            round((10 ^ (0.7 + 2.5 * random() * random()))::NUMERIC, 2),
+            %(start)s::TIMESTAMP + (%(end)s::TIMESTAMP - %(start)s::TIMESTAMP) * ((i - 1)::FLOAT8 / %(rows)s)
+        FROM generate_series(1, %(rows)s) AS i
+    """, {"start": start_date.to_pydatetime(), "end": end_date.to_pydatetime(), "rows": rows})
+    print(f"Заполнена {HEAP_TABLE}: {rows} строк за {elapsed:.1f} с")
+    elapsed = execute(cursor, f"INSERT INTO {PARTITIONED_TABLE} SELECT id, username, price, sale_date FROM {HEAP_TABLE}")
+    print(f"Заполнена {PARTITIONED_TABLE}: {elapsed:.1f} с")
+
+    # Индексы heap-таблицы — как до секционирования (004/005), секционированной — как в 006
+    elapsed = sum(execute(cursor, sql) for sql in [
+        f"CREATE INDEX ON {HEAP_TABLE} (sale_date, price) INCLUDE (is_clean, name_length)",
+        f"CREATE INDEX ON {PARTITIONED_TABLE} USING brin (sale_date)",
+        f"CREATE INDEX ON {PARTITIONED_TABLE} (sale_date, price) INCLUDE (is_clean, name_length)",
+        f"VACUUM ANALYZE {HEAP_TABLE}",
+        f"VACUUM ANALYZE {PARTITIONED_TABLE}",
+    ])
+    print(f"Индексы и статистика: {elapsed:.1f} с")
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params or None)
+    result = cursor.fetchone()[0]
+    return result[0] if isinstance(result, list) else json.loads(result)[0]
+
+
+def describe(explained):
+    """Время, прочитанные страницы и число затронутых таблиц/разделов"""
+    plan = explained["Plan"]
+    relations = {node["Relation Name"] for node in plan_nodes(plan) if "Relation Name" in node}
+    scans = sorted({node["Node Type"] for node in plan_nodes(plan) if "Scan" in node["Node Type"]})
+    buffers = plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+    return explained["Execution Time"], buffers, len(relations), ", ".join(scans)
+
+
+def run(args):
+    connection = engine.raw_connection()
+    connection.dbapi_connection.autocommit = True  # VACUUM не выполняется внутри транзакции
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT date_trunc('day', now())::TIMESTAMP")
+        end_date = pd.Timestamp(cursor.fetchone()[0])
+        if not args.reuse:
+            create_tables(cursor, args.rows, args.months, end_date)
+        else:
+            cursor.execute(f"SELECT MAX(sale_date)::DATE FROM {HEAP_TABLE}")
+            end_date = pd.Timestamp(cursor.fetchone()[0])
+
+        for name, build in DASHBOARD_QUERIES.items():
+            for days in WINDOWS:
+                start = (end_date - pd.Timedelta(days=days - 1)).date().isoformat()
+                query, params = build(start, end_date.date().isoformat())
+                if "public.sold_usernames" not in query:
+                    continue  # Запрос читает агрегаты, а не сырые продажи
+                for label, table in (("heap", HEAP_TABLE), ("partitioned", PARTITIONED_TABLE)):
+                    sql = query.replace("public.sold_usernames", table)
+                    explain(cursor, sql, params)  # Прогрев кэша
+                    elapsed, buffers, relations, scans = describe(explain(cursor, sql, params))
+                    print(f"{name:<22} {days:>3}d {label:<12} time={elapsed:9.2f}ms buffers={buffers:<8} "
+                          f"relations={relations:<3} scans={scans}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000_000, help="Число синтетических продаж")
+    parser.add_argument("--months", type=int, default=36, help="Длина синтетической истории в месяцах")
+    parser.add_argument("--reuse", action="store_true", help="Не пересоздавать таблицы, только запросы")
+    run(parser.parse_args())
@@ -0,0 +1,65 @@
+"""График продаж на длинных периодах: точки и объем данных при выборе интервала и прореживании LTTB.
+
+Для каждого периода сравниваются прежний режим (по дням, без прореживания) и выбор интервала
+(resolution.py): время запроса статистики, строк в хранилище, точек в трассах графика (их рисует
+plotly в браузере) и размер JSON хранилища и трасс.
+
+Пример: SOLD_DATABASE=SoldAnalysis_bench python benchmarks/bench_resolution.py --end 2026-10-17
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SOLD_WARM_UP", "0")
+
+import queries
+import web_app
+from resolution import LINE_POINTS, bucket_labels, chart_buckets
+
+SPANS = {"7 дней": 7, "90 дней": 90, "1 год": 365, "3 года": 3 * 365}
+
+
+def payload(start, end, bar_bucket, bucket, chart_type, repeat):
+    """(мс запроса, строк в хранилище, точек в трассах, КБ JSON хранилища, КБ JSON трасс)"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stats = queries.get_daily_stats(start, end, "all", None, "all", bucket)
+        latencies.append((time.perf_counter() - started) * 1000)
+    daily = {"price_cluster": "all", "bucket": bucket, "bar_bucket": bar_bucket,
+             "rows": stats.assign(date=bucket_labels(stats['date'], bucket).to_numpy()).to_dict('records')}
+    series = web_app.sales_series(chart_type, daily)
+    store_size = len(json.dumps(daily, default=float)) / 1024
+    return np.median(latencies), len(stats), sum(len(x) for x, _ in series), store_size, len(json.dumps(series)) / 1024
+
+
+def run(args):
+    end = pd.Timestamp(args.end)
+    print(f"{'период':<9} {'режим':<18} {'запрос, мс':>11} {'строк':>7} {'точек':>7} "
+          f"{'хранилище, КБ':>14} {'трассы, КБ':>11}")
+    for name, days in SPANS.items():
+        start = (end - pd.Timedelta(days=days - 1)).date().isoformat()
+        bar_bucket, bucket = chart_buckets(start, args.end)
+        modes = {
+            "по дням": ("day", "day", float("inf")),
+            f"{bar_bucket}/{bucket} + LTTB": (bar_bucket, bucket, LINE_POINTS),
+        }
+        for mode, (bars, lines, line_points) in modes.items():
+            web_app.LINE_POINTS = line_points  # sales_series прореживает линии до web_app.LINE_POINTS
+            latency, rows, points, store_size, traces_size = payload(start, args.end, bars, lines,
+                                                                     args.chart_type, args.repeat)
+            print(f"{name:<9} {mode:<18} {latency:11.1f} {rows:7d} {points:7d} {store_size:14.1f} {traces_size:11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--end", default=pd.Timestamp.today().date().isoformat(), help="Конец периодов")
+    parser.add_argument("--chart-type", default="sales", choices=list(web_app.CHARTS_CONFIG))
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов запроса (медиана)")
+    run(parser.parse_args())
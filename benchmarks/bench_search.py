@@ -0,0 +1,85 @@
+"""Задержка поиска имени, истории перепродаж и сопоставимых продаж (p50/p95).
+
+Запросы строятся из случайных проданных имен: префикс, кусок из середины и имя с опечаткой.
+Для таблицы на миллионы строк — база замеров run_suite.py. Цель по задержке для подстроки
+и нечеткого поиска выполняется только с pg_trgm; без него они ищут перебором всей таблицы.
+
+Пример: SOLD_DATABASE=SoldAnalysis_bench python benchmarks/bench_search.py --samples 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import username_search
+from queries import read
+
+# Цель по задержке поиска (подстрока и нечеткий поиск — только с триграммным индексом pg_trgm)
+TARGET_P95_MS = 50
+
+# Виды поиска, которым без pg_trgm нужен перебор всей таблицы
+TRIGRAM_CASES = {"substring", "fuzzy"}
+
+
+def sample_names(count, total, seed):
+    """Случайные проданные имена (TABLESAMPLE, чтобы не сортировать всю таблицу)"""
+    percent = min(100.0, 100.0 * count * 100 / max(total, 1))
+    names = read(
+        "SELECT username FROM public.sold_usernames TABLESAMPLE SYSTEM (%(percent)s)", {"percent": percent}
+    )["username"]
+    rng = np.random.default_rng(seed)
+    return list(rng.choice(names.to_numpy(), size=min(count, len(names)), replace=False)), rng
+
+
+def typo(name, rng):
+    """Одна замена буквы в середине имени"""
+    position = int(rng.integers(1, max(len(name) - 1, 2)))
+    return name[:position] + "x" + name[position + 1:]
+
+
+def measure(func, arguments):
+    latencies = []
+    for args in arguments:
+        started = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def run(args):
+    total = int(read("SELECT COUNT(*) AS rows FROM public.sold_usernames")["rows"].iloc[0])
+    names, rng = sample_names(args.samples, total, args.seed)
+    trigram = username_search.trigram_available()
+    print(f"Строк в sold_usernames: {total:,}, имен в выборке: {len(names)}, "
+          f"pg_trgm: {'да' if trigram else 'нет'}")
+    if not trigram:
+        print(f"Без pg_trgm цель {TARGET_P95_MS} мс для {', '.join(sorted(TRIGRAM_CASES))} не гарантируется: "
+              f"поиск перебором всей таблицы (sql/migrations/007_username_search.sql)")
+
+    cases = {
+        "prefix": (username_search.search_usernames, [(name[:4], "prefix") for name in names]),
+        "substring": (username_search.search_usernames, [(name[1:5], "substring") for name in names]),
+        "fuzzy": (username_search.search_usernames, [(typo(name, rng), "fuzzy") for name in names]),
+        "auto": (username_search.search_usernames, [(name[:5], "auto") for name in names]),
+        "sale_history": (username_search.get_sale_history, [(name,) for name in names]),
+        "comparable_sales": (username_search.get_comparable_sales, [(name,) for name in names]),
+        "comparable_summary": (username_search.get_comparable_summary, [(name,) for name in names]),
+    }
+    for name, (func, arguments) in cases.items():
+        measure(func, arguments[:5])  # Прогрев
+        p50, p95 = measure(func, arguments)
+        mark = "" if p95 <= TARGET_P95_MS else f"  > {TARGET_P95_MS} мс"
+        if not trigram and name in TRIGRAM_CASES:
+            mark += "  (без pg_trgm)"
+        print(f"{name:<20} p50={p50:8.1f}ms p95={p95:8.1f}ms{mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200, help="Число запросов каждого вида")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,144 @@
+"""Запуск дашборда: профиль импортов и время до первого графика с прогревом и без.
+
+Профиль — как python -X importtime: модули, которые дольше всего импортируются вместе с web_app.
+Время до первого графика — от запуска процесса до ответа callback'ов, которые вызывает
+первое открытие страницы (load_dashboard_data и update_cluster_chart).
+
+Пример: python benchmarks/bench_startup.py --repeat 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8092
+STARTUP_TIMEOUT = 300
+
+# Callback'и первого открытия страницы, которые обращаются к базе: (выходы, входы)
+FIRST_PAGE_CALLBACKS = {
+    "load_dashboard_data": (
+        [("daily-stats-store", "data"), ("price-histogram-store", "data"), ("hourly-activity-store", "data"),
+         ("live-cursor", "data")],
+        [("date-picker", "start_date"), ("date-picker", "end_date"), ("price-cluster-selector", "value"),
+         ("name-purity-selector", "value"), ("price-clusters-store", "data"), ("price-range-slider", "value"),
+         ("timezone-selector", "value")],
+    ),
+    "update_cluster_chart": (
+        [("cluster-length-chart", "figure")],
+        [("all-time-interval", "n_intervals")],
+    ),
+}
+
+
+def import_profile(top):
+    """Самые долгие импорты web_app (накопительное время, мс) и общее время импорта"""
+    env = {**os.environ, "SOLD_WARM_UP": "0"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import web_app"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name.rstrip()))
+    total = next(cumulative for cumulative, _, name in rows if name.strip() == "web_app")
+    # Пакеты верхнего уровня и прямые зависимости web_app (importtime сдвигает вложенные на 2 пробела)
+    shallow = [row for row in rows if len(row[2]) - len(row[2].lstrip()) <= 3 and row[2].strip() != "web_app"]
+    return total, sorted(shallow, reverse=True)[:top]
+
+
+def find_props(node, found):
+    """id компонента -> props по JSON-макету из /_dash-layout"""
+    if isinstance(node, dict):
+        props = node.get("props", {})
+        if "id" in props:
+            found[props["id"]] = props
+        for value in props.values():
+            find_props(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            find_props(item, found)
+    return found
+
+
+def callback_payload(outputs, inputs, props):
+    """Тело POST /_dash-update-component, как его отправляет браузер (у нескольких выходов — '..a...b..')"""
+    targets = [{"id": id_, "property": prop} for id_, prop in outputs]
+    names = [f"{id_}.{prop}" for id_, prop in outputs]
+    return {
+        "output": f"..{'...'.join(names)}.." if len(outputs) > 1 else names[0],
+        "outputs": targets if len(outputs) > 1 else targets[0],
+        "inputs": [{"id": id_, "property": prop, "value": props.get(id_, {}).get(prop)} for id_, prop in inputs],
+        "changedPropIds": [],
+    }
+
+
+def first_chart(base_url):
+    """Callback'и первой страницы параллельно, как их отправляет браузер; время ответа самого медленного"""
+    props = find_props(requests.get(f"{base_url}/_dash-layout").json(), {})
+
+    def call(name):
+        outputs, inputs = FIRST_PAGE_CALLBACKS[name]
+        response = requests.post(f"{base_url}/_dash-update-component", json=callback_payload(outputs, inputs, props))
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(len(FIRST_PAGE_CALLBACKS)) as pool:
+        list(pool.map(call, FIRST_PAGE_CALLBACKS))
+    return time.perf_counter() - started
+
+
+def startup(warm_up):
+    """(до готовности, первый график после готовности, до первого графика), секунды"""
+    env = {**os.environ, "SOLD_WARM_UP": "1" if warm_up else "0"}
+    env.pop("SOLD_QUERY_CACHE_DIR", None)  # Иначе второй запуск получит результаты первого с диска
+    base_url = f"http://127.0.0.1:{PORT}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", f"import web_app; web_app.app.run(port={PORT})"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Дашборд завершился с кодом {process.returncode}")
+            if time.perf_counter() - started > STARTUP_TIMEOUT:
+                raise TimeoutError("Дашборд не поднялся")
+            try:
+                if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.05)
+        ready = time.perf_counter() - started
+        chart = first_chart(base_url)
+        return ready, chart, time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(args):
+    total, slowest = import_profile(args.top)
+    print(f"Импорт web_app: {total:.0f} мс; самые долгие модули (накопительно / собственное время):")
+    for cumulative, self_ms, name in slowest:
+        print(f"  {cumulative:8.1f} {self_ms:8.1f}  {name.strip()}")
+
+    print(f"\n{'режим':<12} {'готов, с':>10} {'1-й график, мс':>15} {'до графика, с':>14}")
+    for warm_up in (False, True):
+        results = np.array([startup(warm_up) for _ in range(args.repeat)])
+        ready, chart, total = np.median(results, axis=0)
+        print(f"{'прогрев' if warm_up else 'без прогрева':<12} {ready:10.2f} {chart * 1000:15.0f} {total:14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Запусков каждого режима (медиана)")
+    parser.add_argument("--top", type=int, default=15, help="Сколько модулей показать в профиле импорта")
+    run(parser.parse_args())
@@ -0,0 +1,63 @@
+"""Проверка планов запросов дашборда: EXPLAIN ANALYZE, время и использование индексов.
+
+Пример: python benchmarks/explain_queries.py --start 2025-03-10 --end 2025-03-12
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import DASHBOARD_QUERIES, engine
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def plan_nodes(plan):
+    """Все узлы плана (обход в глубину)"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params or None)
+    result = cursor.fetchone()[0]
+    return result[0] if isinstance(result, list) else json.loads(result)[0]
+
+
+def run(args):
+    connection = engine.raw_connection()
+    failed = []
+    try:
+        cursor = connection.cursor()
+        if args.no_seqscan:
+            # На маленьких таблицах планировщик предпочитает Seq Scan; так проверяется применимость индексов
+            cursor.execute("SET enable_seqscan = off")
+        for name, build in DASHBOARD_QUERIES.items():
+            query, params = build(args.start, args.end)
+            explained = explain(cursor, query, params)
+            nodes = list(plan_nodes(explained["Plan"]))
+            scans = [f"{node['Node Type']}({node.get('Index Name') or node.get('Relation Name', '')})"
+                     for node in nodes if "Scan" in node["Node Type"]]
+            uses_index = any(node["Node Type"] in INDEX_NODES for node in nodes)
+            if not uses_index:
+                failed.append(name)
+            print(f"{name:<22} {'OK ' if uses_index else 'SEQ'} "
+                  f"time={explained['Execution Time']:.2f}ms scans={', '.join(scans)}")
+        connection.rollback()
+    finally:
+        connection.close()
+    if failed:
+        print(f"Без индексного сканирования: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", required=True, help="Начало диапазона дат (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Конец диапазона дат (YYYY-MM-DD)")
+    parser.add_argument("--no-seqscan", action="store_true",
+                        help="Запретить Seq Scan, чтобы проверить применимость индексов на малом объеме")
+    run(parser.parse_args())
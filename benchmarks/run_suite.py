@@ -0,0 +1,304 @@
+"""Сквозной набор замеров на синтетических данных: разбор ленты, вставка, запросы дашборда, анализ.
+
+Работает с отдельной базой (по умолчанию SoldAnalysis_bench на том же сервере): создает ее,
+применяет схему и миграции, на каждом размере очищает sold_usernames и агрегаты.
+Результаты пишутся в JSON; --compare сравнивает с прошлым прогоном и отмечает регрессии.
+
+Пример: python benchmarks/run_suite.py --sizes 10000 1000000 10000000 --compare benchmarks/results/base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# База для замеров задается до импорта модулей проекта: они читают db_config при импорте
+os.environ.setdefault("SOLD_DATABASE", "SoldAnalysis_bench")
+
+import asyncpg
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import queries
+from column_store import ColumnStore
+from db_config import DB_CONFIG
+from fetcher import fetch_sold_rows, start_fixture_server
+from migrate import migrate
+from price_clustering import dbscan_1d, kmeans_1d, natural_breaks
+from price_density import binned_kde, find_regimes
+from resolution import chart_buckets
+from upload_to_db import insert_batch, parse_html
+from synthetic import generate_sales, iter_pages, write_pages
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Пакет вставки — как в csv_import.py
+BATCH_SIZE = 50_000
+
+# Обход ленты через локальный сервер: больше страниц в памяти сервера не держим
+FETCH_LIMIT = 50_000
+FIXTURE_PORT = 8089
+
+# Исходные скрипты analysis/misc (sklearn DBSCAN, scipy gaussian_kde) квадратичны по памяти/времени:
+# при eps=1000 почти все цены — соседи друг друга, 50 тыс. точек уже не помещаются в память
+REFERENCE_LIMIT = 10_000
+
+# Окна дашборда (дней от конца истории); None — вся история
+WINDOWS = [1, 7, 30, None]
+REPEAT = 5
+
+# Порог регрессии при сравнении прогонов; разница меньше MIN_DIFFERENCE_MS считается шумом
+REGRESSION_THRESHOLD = 0.2
+MIN_DIFFERENCE_MS = 5
+
+
+class Suite:
+    """Сбор замеров: имя этапа -> время и производные метрики"""
+
+    def __init__(self):
+        self.results = []
+
+    def record(self, size, stage, name, seconds, rows=None, **extra):
+        result = {"size": size, "stage": stage, "name": name, "seconds": round(seconds, 6)}
+        if rows:
+            result["rows"] = rows
+            result["rows_per_s"] = round(rows / seconds) if seconds else None
+        result.update(extra)
+        self.results.append(result)
+        rate = f" rows/s={result['rows_per_s']:,}" if rows and seconds else ""
+        print(f"{size:>10,} {stage:<10} {name:<40} {seconds * 1000:11.1f}ms{rate}", flush=True)
+        return result
+
+    def timed(self, size, stage, name, func, rows=None, repeat=1):
+        """Замер func(); при repeat > 1 записывается медиана и p95"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            value = func()
+            timings.append(time.perf_counter() - started)
+        extra = {"p95_ms": round(float(np.percentile(timings, 95)) * 1000, 3)} if repeat > 1 else {}
+        self.record(size, stage, name, float(np.median(timings)), rows=rows, **extra)
+        return value
+
+
+async def prepare_database():
+    """Создание базы замеров и схемы: sql/create_table.sql + миграции"""
+    server = await asyncpg.connect(**{**DB_CONFIG, "database": "postgres"})
+    try:
+        if not await server.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", DB_CONFIG["database"]):
+            await server.execute(f'CREATE DATABASE "{DB_CONFIG["database"]}"')
+    finally:
+        await server.close()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        if await conn.fetchval("SELECT to_regclass('sold_usernames')") is None:
+            with open(os.path.join(ROOT, "sql", "create_table.sql"), encoding="utf-8") as f:
+                statements = [statement.strip() for statement in f.read().split(";") if statement.strip()]
+            # Последняя команда переводила старый текстовый столбец price в NUMERIC — на новой таблице не нужна
+            for statement in statements:
+                if "ALTER COLUMN price" not in statement:
+                    await conn.execute(statement)
+        await migrate(conn)
+    finally:
+        await conn.close()
+
+
+async def reset_tables(conn):
+    await conn.execute("TRUNCATE sold_usernames, sales_daily_rollup, sales_hourly_rollup")
+    await conn.execute("SELECT setval('sold_usernames_id_seq', 1, false)")
+
+
+def parse_pages(sales):
+    """Разбор страниц ленты через parse_html (как в parse_data); возвращает (строк, секунд)"""
+    pages = list(iter_pages(sales))
+    started = time.perf_counter()
+    parsed = sum(len(parse_html(page)) for page in pages)
+    elapsed = time.perf_counter() - started
+    assert parsed == len(sales), f"разобрано {parsed} строк из {len(sales)}"
+    return parsed, elapsed
+
+
+async def bench_fetch(suite, size, sales):
+    """Обход ленты fetch_sold_rows через локальный сервер сохраненных страниц"""
+    with tempfile.TemporaryDirectory() as directory:
+        pages = write_pages(directory, sales)
+        runner = await start_fixture_server(directory, port=FIXTURE_PORT)
+        try:
+            started = time.perf_counter()
+            rows = await fetch_sold_rows(f"http://127.0.0.1:{FIXTURE_PORT}/", parse_html, max_pages=pages)
+            suite.record(size, "parse", "fetch_sold_rows (fixture server)", time.perf_counter() - started, rows=len(rows))
+        finally:
+            await runner.cleanup()
+
+
+async def bench_ingest(suite, size, args):
+    """Генерация, разбор HTML и вставка через insert_batch пакетами (путь insert_data и csv_import)"""
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        await reset_tables(conn)
+        timings = {"generate": 0.0, "parse": 0.0, "insert": 0.0}
+        parsed_total = inserted_total = 0
+        first_batch = chunk = None
+        started = time.perf_counter()
+        for chunk in generate_sales(size, seed=args.seed, chunk_size=BATCH_SIZE):
+            timings["generate"] += time.perf_counter() - started
+            if parsed_total < args.parse_limit:
+                parsed, elapsed = parse_pages(chunk)
+                parsed_total += parsed
+                timings["parse"] += elapsed
+            records = list(zip(chunk["username"], chunk["price"].astype(float), chunk["sale_date"].dt.to_pydatetime()))
+            first_batch = first_batch or records
+            started = time.perf_counter()
+            async with conn.transaction():
+                inserted, _ = await insert_batch(conn, records)
+            timings["insert"] += time.perf_counter() - started
+            inserted_total += inserted
+            started = time.perf_counter()
+        suite.record(size, "generate", "generate_sales", timings["generate"], rows=size)
+        suite.record(size, "parse", "parse_html", timings["parse"], rows=parsed_total)
+        # Последние продажи — как свежие страницы ленты
+        await bench_fetch(suite, size, chunk.iloc[-min(len(chunk), FETCH_LIMIT):])
+        suite.record(size, "insert", "insert_batch", timings["insert"], rows=inserted_total)
+
+        started = time.perf_counter()
+        async with conn.transaction():
+            inserted, _ = await insert_batch(conn, first_batch)
+        suite.record(size, "insert", "insert_batch (duplicates)", time.perf_counter() - started,
+                     rows=len(first_batch), inserted=inserted)
+        for table in ("sold_usernames", "sales_daily_rollup", "sales_hourly_rollup"):
+            await conn.execute(f"VACUUM ANALYZE {table}")
+        return await conn.fetchval("SELECT MAX(sale_date)::DATE FROM sold_usernames")
+    finally:
+        await conn.close()
+
+
+def bench_dashboard(suite, size, end_date, repeat):
+    """Запросы, которые выполняет web_app.py, для SQL и колоночного источника"""
+    store = suite.timed(size, "dashboard", "ColumnStore.load", lambda: ColumnStore().load(), rows=size)
+    for label, source in (("sql", queries), ("columnar", store)):
+        for days in WINDOWS:
+            start = None if days is None else (end_date - pd.Timedelta(days=days - 1)).isoformat()
+            end = end_date.isoformat()
+            window = "all" if days is None else f"{days}d"
+            calls = {
+                "get_daily_stats": lambda: source.get_daily_stats(start, end, "25-75"),
+                "get_daily_stats filtered": lambda: source.get_daily_stats(start, end, "all", (10, 1000), "clean"),
+                # Интервал, который выбирает график продаж для этого периода (resolution.py)
+                "get_daily_stats chart": lambda: source.get_daily_stats(start, end, "all", None, "all",
+                                                                        chart_buckets(start, end)[1]),
+                "get_price_histogram": lambda: source.get_price_histogram(start, end, 1, 1000),
+                "get_price_summary": lambda: source.get_price_summary(start, end, 1, 1000),
+                "get_hourly_activity": lambda: source.get_hourly_activity(start, end, "Europe/Moscow"),
+            }
+            for name, call in calls.items():
+                call()  # Прогрев
+                suite.timed(size, "dashboard", f"{label} {name} {window}", call, repeat=repeat)
+        suite.timed(size, "dashboard", f"{label} get_avg_length_by_cluster", source.get_avg_length_by_cluster, repeat=repeat)
+
+
+def bench_analysis(suite, size):
+    """Анализ цен: модули проекта и исходные алгоритмы analysis/misc на ограниченной выборке"""
+    prices = suite.timed(size, "analysis", "load prices", lambda: queries.read(
+        "SELECT price FROM public.sold_usernames WHERE price > 0")["price"].to_numpy(dtype=np.float64), rows=size)
+    filtered = prices[prices <= 1000]
+    suite.timed(size, "analysis", "binned_kde (price <= 1000)", lambda: binned_kde(filtered), rows=len(filtered))
+    suite.timed(size, "analysis", "find_regimes", lambda: find_regimes(prices), rows=len(prices))
+    suite.timed(size, "analysis", "dbscan_1d eps=1000", lambda: dbscan_1d(prices, 1000, 5), rows=len(prices))
+    suite.timed(size, "analysis", "natural_breaks k=5", lambda: natural_breaks(prices, 5), rows=len(prices))
+    suite.timed(size, "analysis", "kmeans_1d k=5", lambda: kmeans_1d(prices, 5), rows=len(prices))
+
+    sample = np.random.default_rng(0).choice(prices, size=min(len(prices), REFERENCE_LIMIT), replace=False)
+    try:
+        from sklearn.cluster import DBSCAN
+        suite.timed(size, "analysis", "misc/price_clusters sklearn DBSCAN",
+                    lambda: DBSCAN(eps=1000, min_samples=5).fit_predict(sample.reshape(-1, 1)), rows=len(sample))
+    except ImportError:
+        print("sklearn не установлен: замер analysis/misc/price_clusters.py пропущен")
+    from scipy.stats import gaussian_kde
+    sample = sample[sample <= 1000]
+    suite.timed(size, "analysis", "misc/price_density gaussian_kde",
+                lambda: gaussian_kde(sample)(np.linspace(sample.min(), sample.max(), 1000)), rows=len(sample))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Сравнение с прошлым прогоном по (size, stage, name); возвращает число регрессий"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["stage"], r["name"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nСравнение с {baseline_path} (регрессия — медленнее на {threshold:.0%}):")
+    for result in results:
+        before = baseline.get((result["size"], result["stage"], result["name"]))
+        if not before or not before["seconds"]:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        mark = ""
+        if abs(result["seconds"] - before["seconds"]) * 1000 < MIN_DIFFERENCE_MS:
+            pass
+        elif ratio > 1 + threshold:
+            mark = "  <-- регрессия"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            mark = "  ускорение"
+        print(f"{result['size']:>10,} {result['stage']:<10} {result['name']:<40} "
+              f"{before['seconds'] * 1000:11.1f}ms -> {result['seconds'] * 1000:11.1f}ms x{ratio:.2f}{mark}")
+    return regressions
+
+
+async def run(args):
+    await prepare_database()
+    suite = Suite()
+    for size in args.sizes:
+        end_date = await bench_ingest(suite, size, args)
+        bench_dashboard(suite, size, end_date, args.repeat)
+        bench_analysis(suite, size)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "started_at": args.started_at,
+                "revision": git_revision(),
+                "database": DB_CONFIG["database"],
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "sizes": args.sizes,
+                "seed": args.seed,
+            },
+            "results": suite.results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare and compare(suite.results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Число синтетических продаж")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Повторов каждого запроса дашборда")
+    parser.add_argument("--parse-limit", type=int, default=1_000_000,
+                        help="Сколько первых строк каждого размера прогонять через разбор HTML")
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/<время>.json)")
+    parser.add_argument("--compare", help="Прошлый файл результатов для сравнения")
+    args = parser.parse_args()
+    args.started_at = datetime.now().isoformat(timespec="seconds")
+    args.output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    asyncio.run(run(args))
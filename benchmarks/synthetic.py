@@ -0,0 +1,186 @@
+"""Синтетические продажи имен с распределениями, снятыми с реальной выгрузки ленты.
+
+Параметры ниже посчитаны по analysis/2782_ALL_for_hosting.csv (2782 продажи, март 2025):
+квантили цены с тяжелым хвостом и массой на минимальной цене 10 TON, доли длин имен,
+доли чистых и «грязных» имен и почасовая сезонность продаж (UTC).
+
+Пример: python benchmarks/synthetic.py --rows 100000 --pages-dir saved_pages
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Эмпирические квантили цены (вероятность, TON); между точками — линейно по логарифму цены
+PRICE_QUANTILES = [
+    (0.0, 4.0), (0.02, 7.0), (0.05, 8.0), (0.1, 9.0), (0.15, 10.0), (0.55, 10.0),
+    (0.6, 11.0), (0.65, 14.0), (0.7, 16.7), (0.75, 20.0), (0.8, 33.8), (0.85, 99.0),
+    (0.9, 104.0), (0.93, 116.0), (0.95, 215.7), (0.97, 760.3), (0.98, 3200.0),
+    (0.99, 3360.0), (0.995, 5050.0), (0.999, 7963.4), (1.0, 80000.0),
+]
+
+# Доля целых цен; остальные — с копейками (два знака)
+INTEGER_PRICE_SHARE = 0.946
+
+# Доли длин имен
+LENGTH_WEIGHTS = {
+    4: 0.0083, 5: 0.2477, 6: 0.1589, 7: 0.1427, 8: 0.1165, 9: 0.0852, 10: 0.0643,
+    11: 0.0474, 12: 0.0273, 13: 0.0291, 14: 0.0191, 15: 0.0104, 16: 0.0097, 17: 0.0212,
+    18: 0.0032, 19: 0.0025, 20: 0.0014, 21: 0.0004, 22: 0.0004, 23: 0.0004, 24: 0.0004,
+    26: 0.0004, 27: 0.0004, 28: 0.0004, 29: 0.0004, 30: 0.0004, 31: 0.0004, 32: 0.0014,
+}
+
+# Чистые имена (только буквы), с цифрами, с подчеркиванием, с тем и другим
+PURITY_WEIGHTS = {"clean": 0.695, "digits": 0.171, "underscore": 0.113, "both": 0.021}
+
+# Доля продаж по часам UTC
+HOURLY_WEIGHTS = [
+    0.0205, 0.0241, 0.0280, 0.0252, 0.0248, 0.0302, 0.0395, 0.0374, 0.0478, 0.0514, 0.0399, 0.0421,
+    0.0532, 0.0561, 0.0525, 0.0474, 0.0568, 0.0733, 0.0575, 0.0532, 0.0471, 0.0370, 0.0306, 0.0244,
+]
+
+MAX_LENGTH = 32
+LETTERS = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+DIGITS = np.frombuffer(b"0123456789", dtype=np.uint8)
+
+# Самая длинная история по умолчанию (3 года): больше продаж — плотнее дни, а не больше разделов
+MAX_DAYS = 3 * 365
+
+# Размер порции генерации: 10 млн строк не держим в памяти целиком
+CHUNK_SIZE = 200_000
+
+# Строк на странице ленты
+PAGE_SIZE = 50
+
+
+def _weights(mapping):
+    keys = np.array(list(mapping))
+    probabilities = np.array(list(mapping.values()), dtype=np.float64)
+    return keys, probabilities / probabilities.sum()
+
+
+def sample_prices(rng, n):
+    """Цены по обратной эмпирической функции распределения"""
+    probabilities, prices = np.array(PRICE_QUANTILES).T
+    values = np.exp(np.interp(rng.random(n), probabilities, np.log(prices)))
+    return np.where(rng.random(n) < INTEGER_PRICE_SHARE, np.round(values), np.round(values, 2))
+
+
+def sample_usernames(rng, n):
+    """Имена Telegram: начинаются с буквы, подчеркивание не первое и не последнее"""
+    lengths, length_p = _weights(LENGTH_WEIGHTS)
+    lengths = rng.choice(lengths, size=n, p=length_p)
+    kinds, kind_p = _weights(PURITY_WEIGHTS)
+    kinds = rng.choice(kinds, size=n, p=kind_p)
+
+    chars = LETTERS[rng.integers(0, len(LETTERS), size=(n, MAX_LENGTH))]
+    positions = np.arange(MAX_LENGTH)
+
+    # Цифры — хвост из 1..3 символов (не затрагивая первую букву)
+    with_digits = np.isin(kinds, ["digits", "both"])
+    digit_count = np.minimum(rng.integers(1, 4, size=n), lengths - 1)
+    digit_mask = with_digits[:, None] & (positions >= (lengths - digit_count)[:, None])
+    chars = np.where(digit_mask, DIGITS[rng.integers(0, len(DIGITS), size=(n, MAX_LENGTH))], chars)
+
+    # Подчеркивание — одна позиция внутри имени перед цифровым хвостом
+    with_underscore = np.isin(kinds, ["underscore", "both"])
+    tail = np.where(with_digits, digit_count, 0)
+    room = np.maximum(lengths - tail - 2, 1)
+    underscore_at = 1 + (rng.random(n) * room).astype(np.int64)
+    underscore_mask = with_underscore[:, None] & (positions == underscore_at[:, None]) & (underscore_at < lengths - 1)[:, None]
+    chars = np.where(underscore_mask, ord("_"), chars)
+
+    # Нулевые байты за концом имени отбрасываются при просмотре строки как bytes фиксированной длины
+    chars = np.where(positions < lengths[:, None], chars, 0).astype(np.uint8)
+    return np.char.decode(np.ascontiguousarray(chars).view(f"S{MAX_LENGTH}").ravel(), "ascii")
+
+
+def sample_times(rng, days, day_start, n):
+    """Время продаж: дни по порядку, час — по почасовой сезонности, внутри часа равномерно"""
+    hours = rng.choice(24, size=n, p=np.array(HOURLY_WEIGHTS) / sum(HOURLY_WEIGHTS))
+    seconds = days * 86_400 + hours * 3_600 + rng.integers(0, 3_600, size=n)
+    return day_start + pd.to_timedelta(np.sort(seconds), unit="s")
+
+
+def generate_sales(rows, end=None, days=None, seed=0, chunk_size=CHUNK_SIZE):
+    """Порции DataFrame(username, price, sale_date) в хронологическом порядке.
+
+    История заканчивается днем end (по умолчанию сегодня) и длится days дней
+    (по умолчанию — ~1000 продаж в день, но не меньше 30 дней и не больше MAX_DAYS).
+    """
+    rng = np.random.default_rng(seed)
+    days = days or min(max(30, rows // 1000), MAX_DAYS)
+    end = pd.Timestamp(end or pd.Timestamp.now()).normalize()
+    day_start = end - pd.Timedelta(days=days - 1)
+    for offset in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - offset)
+        # Номер дня растет с номером строки: порции идут подряд по времени
+        day = (np.arange(offset, offset + n, dtype=np.int64) * days) // rows
+        yield pd.DataFrame({
+            "username": sample_usernames(rng, n),
+            "price": sample_prices(rng, n),
+            "sale_date": sample_times(rng, day, day_start, n),
+        })
+
+
+def format_price(price):
+    """Цена в виде ленты: разделитель тысяч, копейки — только у нецелых"""
+    return f"{price:,.0f}" if price == int(price) else f"{price:,.2f}"
+
+
+def render_page(sales):
+    """HTML-страница ленты с продажами (username, price, sale_date) в формате tm-row-selectable"""
+    rows = [
+        '<tr class="tm-row-selectable">'
+        f'<td><a href="/username/{username}" class="table-cell">'
+        f'<div class="table-cell-value tm-value">@{username}</div>'
+        '<div class="table-cell-status-thin">sold</div></a></td>'
+        f'<td><div class="table-cell-value tm-value icon-before icon-ton">{price}</div></td>'
+        f'<td><div class="tm-datetime"><time datetime="{sale_date}+00:00" class="short">'
+        f'{sale_date[:10]}</time></div></td>'
+        '</tr>'
+        for username, price, sale_date in sales
+    ]
+    return ("<html><body><table class=\"table tm-table\"><tbody>"
+            + "".join(rows) + "</tbody></table></body></html>").encode("utf-8")
+
+
+def iter_pages(sales, page_size=PAGE_SIZE):
+    """Страницы ленты по набору продаж: первая страница — самые свежие продажи"""
+    ordered = sales.sort_values("sale_date", ascending=False, kind="stable")
+    records = list(zip(
+        ordered["username"],
+        [format_price(price) for price in ordered["price"]],
+        ordered["sale_date"].dt.strftime("%Y-%m-%dT%H:%M:%S"),
+    ))
+    for start in range(0, len(records), page_size):
+        yield render_page(records[start:start + page_size])
+
+
+def write_pages(directory, sales, page_size=PAGE_SIZE):
+    """Сохранение страниц в каталог для fetcher.start_fixture_server и benchmarks/bench_*.py"""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for count, page in enumerate(iter_pages(sales, page_size), start=1):
+        with open(os.path.join(directory, f"page_{count:05d}.html"), "wb") as f:
+            f.write(page)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--days", type=int, help="Длина истории в днях")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="Сохранить продажи в CSV (формат csv_import.py)")
+    parser.add_argument("--pages-dir", help="Сохранить страницы ленты в каталог")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    sales = pd.concat(generate_sales(args.rows, days=args.days, seed=args.seed), ignore_index=True)
+    print(sales.describe(include="all"))
+    if args.csv:
+        sales.to_csv(args.csv, index=False)
+    if args.pages_dir:
+        print(f"Сохранено страниц: {write_pages(args.pages_dir, sales, args.page_size)}")
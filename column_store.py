@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed_query
+from queries import PRICE_CLUSTERS, HISTOGRAM_BINS, get_engine, histogram_upper
+from resolution import truncate_ns
+
+# Как часто подтягивать новые строки (id > last_id), секунды
+REFRESH_INTERVAL = 30
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Кластеры в порядке возрастания цены и их верхние границы (для np.searchsorted)
+CLUSTER_NAMES = [name for name in PRICE_CLUSTERS if name != "all"]
+CLUSTER_BOUNDS = np.array([PRICE_CLUSTERS[name][1] for name in CLUSTER_NAMES[:-1]], dtype=np.float64)
+
+
+# Столбцы хранилища одной версии. Дозагрузка собирает новый набор и подменяет его одним присваиванием,
+# а каждый запрос берет набор один раз — параллельные запросы не видят столбцы разных версий
+Columns = namedtuple("Columns", ["ids", "sale_ts", "price", "name_length", "is_clean", "cluster"])
+
+EMPTY_COLUMNS = Columns(
+    ids=np.empty(0, dtype=np.int64),
+    sale_ts=np.empty(0, dtype=np.int64),
+    price=np.empty(0, dtype=np.float64),
+    name_length=np.empty(0, dtype=np.int16),
+    is_clean=np.empty(0, dtype=bool),
+    cluster=np.empty(0, dtype=np.int8),
+)
+
+
+def to_ns(value):
+    """Дата (строка, date, Timestamp) -> начало дня в наносекундах UTC"""
+    return pd.Timestamp(value).normalize().value
+
+
+class ColumnStore:
+    """Колоночное хранилище sold_usernames в памяти процесса, отсортированное по sale_date.
+
+    Повторяет API queries.py (get_daily_stats, get_price_histogram, ...), поэтому дашборд
+    может переключаться между ним и прямыми SQL-запросами.
+    """
+
+    def __init__(self, sql_engine=None, refresh_interval=REFRESH_INTERVAL):
+        self.engine = sql_engine or get_engine()
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.refreshed_at = 0.0
+        self.columns = EMPTY_COLUMNS
+
+    def load(self):
+        """Первичная загрузка всей таблицы"""
+        with self.lock:
+            self._append(self._fetch(0))
+        logging.info(f"Колоночное хранилище загружено: {len(self.columns.ids)} строк.")
+        return self
+
+    def refresh(self, force=False):
+        """Дозагрузка строк с id > last_id не чаще refresh_interval"""
+        if not force and time.monotonic() - self.refreshed_at < self.refresh_interval:
+            return 0
+        with self.lock:
+            df = self._fetch(self.last_id)
+            self._append(df)
+        return len(df)
+
+    def last_sale_id(self):
+        """Наибольший загруженный id — курсор живого режима дашборда"""
+        self.refresh()
+        return self.last_id
+
+    def _fetch(self, after_id):
+        df = pd.read_sql(
+            "SELECT id, price, sale_date, name_length, is_clean FROM public.sold_usernames "
+            "WHERE id > %(after_id)s ORDER BY sale_date",
+            self.engine, params={"after_id": int(after_id)}
+        )
+        self.refreshed_at = time.monotonic()
+        return df
+
+    def _append(self, df):
+        if df.empty:
+            return
+        price = df['price'].to_numpy(dtype=np.float64)
+        added = Columns(
+            ids=df['id'].to_numpy(dtype=np.int64),
+            sale_ts=df['sale_date'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+            price=price,
+            name_length=df['name_length'].to_numpy(dtype=np.int16),
+            is_clean=df['is_clean'].to_numpy(dtype=bool),
+            cluster=np.searchsorted(CLUSTER_BOUNDS, price, side='right').astype(np.int8),
+        )
+        current = self.columns
+        needs_sort = len(current.sale_ts) and added.sale_ts[0] < current.sale_ts[-1]
+        columns = Columns(*(np.concatenate([old, new]) for old, new in zip(current, added)))
+        if needs_sort:
+            # Новые строки оказались старше последних загруженных: восстанавливаем порядок
+            order = np.argsort(columns.sale_ts, kind='stable')
+            columns = Columns(*(values[order] for values in columns))
+        self.columns = columns
+        self.last_id = max(self.last_id, int(added.ids.max()))
+
+    def _slice(self, start_date=None, end_date=None):
+        """(столбцы, диапазон строк за период): границы включительно, по дням, через бинарный поиск"""
+        self.refresh()
+        columns = self.columns
+        lo = 0 if start_date is None else np.searchsorted(columns.sale_ts, to_ns(start_date), side='left')
+        hi = len(columns.sale_ts) if end_date is None else \
+            np.searchsorted(columns.sale_ts, to_ns(end_date) + NS_PER_DAY, side='left')
+        return columns, slice(lo, hi)
+
+    @staticmethod
+    def _mask(columns, rows, price_range=None, purity=None):
+        price = columns.price[rows]
+        mask = price >= 0
+        if price_range is not None:
+            min_price, max_price = price_range
+            if min_price is not None:
+                mask &= price >= min_price
+            if max_price is not None:
+                mask &= price < max_price
+        if purity == "clean":
+            mask &= columns.is_clean[rows]
+        elif purity == "not_clean":
+            mask &= ~columns.is_clean[rows]
+        return mask
+
+    @timed_query("columnar")
+    def get_daily_stats(self, start_date=None, end_date=None, price_cluster="all", price_range=None, purity=None,
+                        bucket="day"):
+        columns, rows = self._slice(start_date, end_date)
+        mask = self._mask(columns, rows, price_range or PRICE_CLUSTERS[price_cluster], purity)
+        starts = truncate_ns(columns.sale_ts[rows][mask], bucket)
+        price = columns.price[rows][mask]
+        clean = columns.is_clean[rows][mask]
+        length = columns.name_length[rows][mask]
+
+        buckets, index = np.unique(starts, return_inverse=True)
+        count = np.bincount(index, minlength=len(buckets)).astype(np.float64)
+        clean_count = np.bincount(index, weights=clean, minlength=len(buckets))
+        price_sum = np.bincount(index, weights=price, minlength=len(buckets))
+        clean_price_sum = np.bincount(index, weights=price * clean, minlength=len(buckets))
+        dates = pd.to_datetime(buckets)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                "date": dates if bucket == "hour" else dates.date,
+                "sales_count": count,
+                "average_price": price_sum / count,
+                "avg_price_clean": np.where(clean_count > 0, clean_price_sum / clean_count, np.nan),
+                "avg_price_not_clean": np.where(count > clean_count,
+                                                (price_sum - clean_price_sum) / (count - clean_count), np.nan),
+                "clean_ratio": clean_count / count,
+                "avg_name_length": np.bincount(index, weights=length, minlength=len(buckets)) / count,
+            })
+
+    @timed_query("columnar")
+    def get_avg_length_by_cluster(self):
+        columns, rows = self._slice()
+        mask = self._mask(columns, rows)
+        cluster = columns.cluster[rows][mask]
+        count = np.bincount(cluster, minlength=len(CLUSTER_NAMES))
+        length_sum = np.bincount(cluster, weights=columns.name_length[rows][mask], minlength=len(CLUSTER_NAMES))
+        present = count > 0
+        df = pd.DataFrame({
+            "price_cluster": np.array(CLUSTER_NAMES)[present],
+            "avg_length": length_sum[present] / count[present],
+            "total_count": count[present],
+        })
+        return df.sort_values("price_cluster").reset_index(drop=True)
+
+    def _price_window(self, start_date, end_date, min_price, max_price):
+        columns, rows = self._slice(start_date, end_date)
+        price = columns.price[rows]
+        return price[(price >= min_price) & (price <= max_price)]
+
+    @timed_query("columnar")
+    def get_price_histogram(self, start_date, end_date, min_price, max_price, bins=HISTOGRAM_BINS):
+        edges = np.linspace(min_price, histogram_upper(min_price, max_price), bins + 1)
+        counts, _ = np.histogram(self._price_window(start_date, end_date, min_price, max_price), bins=edges)
+        return edges, counts
+
+    @timed_query("columnar")
+    def get_price_summary(self, start_date, end_date, min_price, max_price):
+        price = self._price_window(start_date, end_date, min_price, max_price)
+        if not len(price):
+            price = np.array([np.nan])  # Пустая выборка: метрики NaN, как NULL в SQL
+        q1, median, q3 = np.percentile(price, [25, 50, 75])
+        return pd.Series({
+            "sample_size": np.count_nonzero(~np.isnan(price)),
+            "min_price": price.min(),
+            "max_price": price.max(),
+            "mean_price": price.mean(),
+            "median_price": median,
+            "std_price": price.std(ddof=1) if len(price) > 1 else np.nan,
+            "q1": q1,
+            "q3": q3,
+            "total_revenue": price.sum(),
+        })
+
+    @timed_query("columnar")
+    def get_hourly_activity(self, start_date=None, end_date=None, timezone="UTC"):
+        columns, rows = self._slice(start_date, end_date)
+        mask = self._mask(columns, rows)
+        local = pd.DatetimeIndex(columns.sale_ts[rows][mask]).tz_localize('UTC').tz_convert(timezone)
+        cell = local.dayofweek.to_numpy() * 24 + local.hour.to_numpy()
+        counts = np.bincount(cell, minlength=168)
+        present = np.flatnonzero(counts)
+        return pd.DataFrame({
+            "weekday": present // 24 + 1,
+            "hour_of_day": present % 24,
+            "sales_count": counts[present].astype(np.float64),
+        })
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import time
+from datetime import datetime
+
+from upload_to_db import create_pool, clean_price, insert_batch
+
+# Сколько строк отправлять в базу одним COPY и как часто печатать прогресс
+BATCH_SIZE = 50_000
+PROGRESS_EVERY = 200_000
+
+# Схемы файлов без заголовка по числу столбцов (старые выгрузки бывают и такими)
+HEADERLESS_COLUMNS = {
+    1: ["username"],
+    2: ["username", "price"],
+    3: ["username", "price", "sale_date"],
+    4: ["id", "username", "price", "sale_date"],
+}
+
+
+class ImportStats:
+    """Счетчики импорта одного файла"""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.bytes_read = 0
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.reported_rows = 0
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        percent = 100 * self.bytes_read / self.size if self.size else 100
+        prefix = "Импорт завершен" if final else "Импорт"
+        logging.info(
+            f"{prefix} {self.path}: {percent:.0f}%, прочитано {self.rows}, вставлено {self.inserted}, "
+            f"дубликатов {self.duplicates}, пропущено {self.skipped}, {rate:.0f} строк/с"
+        )
+        self.reported_rows = self.rows
+
+
+def read_lines(f, stats):
+    """Строки файла по одной с подсчетом прочитанных байт (для процента прогресса)"""
+    for raw in f:
+        stats.bytes_read += len(raw)
+        yield raw.decode("utf-8-sig")
+
+
+def detect_columns(first_row):
+    """Имена столбцов: из заголовка или по числу столбцов; второй элемент — был ли заголовок"""
+    names = [name.strip().lower() for name in first_row]
+    if "username" in names:
+        return names, True
+    return HEADERLESS_COLUMNS.get(len(first_row)), False
+
+
+def normalize_row(row, columns, default_date=None):
+    """Запись (username, price, sale_date) по тем же правилам, что и парсер ленты; None — пропустить"""
+    values = dict(zip(columns, row))
+    # Удаляем символ @ из начала имени
+    username = (values.get("username") or "").strip().lstrip('@')
+    price = values.get("price")
+    cleaned_price = clean_price(price.strip()) if price else None
+    sale_date = values.get("sale_date")
+    if sale_date:
+        try:
+            sale_date = datetime.fromisoformat(sale_date.strip()).replace(tzinfo=None)
+        except ValueError:
+            sale_date = None
+    else:
+        sale_date = default_date
+    if not username or cleaned_price is None or sale_date is None:
+        return None
+    return username, cleaned_price, sale_date
+
+
+async def import_file(conn, path, default_date=None, batch_size=BATCH_SIZE, progress_every=PROGRESS_EVERY):
+    """Потоковый импорт CSV: пакеты по batch_size строк через COPY, память не зависит от размера файла"""
+    stats = ImportStats(path)
+    with open(path, "rb") as f:
+        reader = csv.reader(read_lines(f, stats))
+        first_row = next(reader, None)
+        if first_row is None:
+            stats.report(final=True)
+            return stats
+        columns, has_header = detect_columns(first_row)
+        if columns is None:
+            logging.error(f"Не удалось определить столбцы {path}: {first_row}")
+            return stats
+        if "sale_date" not in columns and default_date is None:
+            logging.warning(f"В {path} нет даты продажи: строки будут пропущены (укажите --sale-date).")
+
+        async def flush(batch):
+            inserted, duplicates = await insert_batch(conn, batch)
+            stats.inserted += inserted
+            stats.duplicates += duplicates
+            batch.clear()
+
+        batch = []
+        rows = reader if has_header else _prepend(first_row, reader)
+        for row in rows:
+            if not row:
+                continue
+            stats.rows += 1
+            record = normalize_row(row, columns, default_date)
+            if record is None:
+                stats.skipped += 1
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                await flush(batch)
+            if stats.rows - stats.reported_rows >= progress_every:
+                stats.report()
+        if batch:
+            await flush(batch)
+    stats.report(final=True)
+    return stats
+
+
+def _prepend(first_row, reader):
+    yield first_row
+    yield from reader
+
+
+async def main(args):
+    default_date = datetime.fromisoformat(args.sale_date) if args.sale_date else None
+    pool = await create_pool(min_size=1, max_size=1, dsn=args.dsn)
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+    started = time.perf_counter()
+    try:
+        async with pool.acquire() as conn:
+            for path in args.paths:
+                stats = await import_file(conn, path, default_date, args.batch_size)
+                for key in totals:
+                    totals[key] += getattr(stats, key)
+    finally:
+        await pool.close()
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Итого файлов {len(args.paths)}: прочитано {totals['rows']}, вставлено {totals['inserted']}, "
+        f"дубликатов {totals['duplicates']}, пропущено {totals['skipped']} за {elapsed:.1f} с "
+        f"({totals['rows'] / elapsed if elapsed else 0:.0f} строк/с)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт исторических CSV-выгрузок в sold_usernames")
+    parser.add_argument("paths", nargs="+", help="CSV-файлы (outputs/*.csv, analysis/*.csv)")
+    parser.add_argument("--sale-date", help="Дата продажи для файлов без столбца sale_date (ISO)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Строк в одном пакете COPY")
+    parser.add_argument("--dsn", help="Строка подключения к PostgreSQL вместо DB_CONFIG")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from queries import POOL_SIZE
+
+# Сколько последних взаимодействий хранить для перцентилей задержки
+LATENCY_WINDOW = 200
+
+
+class QueryBatcher:
+    """Параллельное выполнение запросов одного взаимодействия с дашбордом.
+
+    Все запросы, которые вызывает одно изменение фильтров, отправляются в пул потоков сразу,
+    поэтому пользователь ждет самый медленный запрос, а не их сумму. Одинаковые запросы,
+    которые уже выполняются (другая вкладка, повторный клик), не дублируются: второй
+    вызывающий получает тот же Future.
+    """
+
+    def __init__(self, source, workers=POOL_SIZE, window=LATENCY_WINDOW):
+        self.source = source
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard-query")
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.latencies = deque(maxlen=window)
+        self.sequential = deque(maxlen=window)
+        self.deduplicated = 0
+
+    def _run(self, method, args):
+        started = time.perf_counter()
+        result = getattr(self.source, method)(*args)
+        return result, time.perf_counter() - started
+
+    def _release(self, key, future):
+        with self.lock:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def submit(self, method, *args):
+        """Future с (результат, время выполнения); повторный одинаковый запрос присоединяется к текущему"""
+        key = (method, args)
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = self.executor.submit(self._run, method, args)
+            self.inflight[key] = future
+        future.add_done_callback(lambda done: self._release(key, done))
+        return future
+
+    def fetch(self, requests):
+        """Выполнение набора {имя: (метод источника, аргументы)}; возвращает {имя: результат}"""
+        started = time.perf_counter()
+        futures = {name: self.submit(method, *args) for name, (method, args) in requests.items()}
+        results, durations = {}, {}
+        for name, future in futures.items():
+            results[name], durations[name] = future.result()
+        latency = time.perf_counter() - started
+        self.latencies.append(latency)
+        self.sequential.append(sum(durations.values()))
+        logging.info(
+            f"Запросы дашборда ({', '.join(requests)}): {latency * 1000:.0f} мс, "
+            f"последовательно было бы {sum(durations.values()) * 1000:.0f} мс"
+        )
+        return results
+
+    def snapshot(self):
+        """Перцентили задержки взаимодействия: фактической и при последовательном выполнении"""
+        if not self.latencies:
+            return {"interactions": 0, "deduplicated": self.deduplicated}
+        latencies = np.array(self.latencies) * 1000
+        sequential = np.array(self.sequential) * 1000
+        return {
+            "interactions": len(latencies),
+            "deduplicated": self.deduplicated,
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+            "sequential_p50_ms": float(np.percentile(sequential, 50)),
+            "sequential_p95_ms": float(np.percentile(sequential, 95)),
+        }
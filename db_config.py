@@ -0,0 +1,14 @@
+import os
+
+# Параметры подключения к базе данных PostgreSQL
+# (SOLD_DATABASE — другая база на том же сервере, например для benchmarks/run_suite.py)
+DB_CONFIG = {
+    "user": "postgres",
+    "password": "Pdjyjr2",
+    "database": os.environ.get("SOLD_DATABASE", "SoldAnalysis"),
+    "host": "localhost",
+    "port": "5432",
+}
+
+# Тот же адрес в формате SQLAlchemy (дашборд и скрипты анализа)
+DB_URI = "postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}".format(**DB_CONFIG)
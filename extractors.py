@@ -0,0 +1,136 @@
+import logging
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+# Компилируемые парсеры подключаются, если установлены; BeautifulSoup остается запасным вариантом
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+# Классы элементов строки ленты (совпадение по атрибуту class целиком, как в BeautifulSoup)
+ROW_CLASS = "tm-row-selectable"
+USERNAME_CLASS = "table-cell-value tm-value"
+PRICE_CLASS = "table-cell-value tm-value icon-before icon-ton"
+
+
+def build_row(username, price, datetime_str):
+    """Нормализация сырых значений строки; None, если строку нужно пропустить"""
+    if username:
+        # Удаляем символ @ из начала имени
+        username = username.strip().lstrip('@')
+    else:
+        logging.warning("Юзернейм не найден в строке.")
+
+    if price:
+        price = price.strip()
+    else:
+        logging.warning("Цена не найдена в строке.")
+
+    datetime_obj = None
+    if datetime_str:
+        try:
+            # Удаляем информацию о временной зоне (делаем timezone-naive)
+            datetime_obj = datetime.fromisoformat(datetime_str).replace(tzinfo=None)
+        except ValueError:
+            logging.error(f"Невозможно преобразовать дату: {datetime_str}")
+    else:
+        logging.warning("Дата и время не найдены в строке.")
+
+    if username and price and datetime_obj:
+        return username, price, datetime_obj
+    logging.warning("Пропущена строка из-за отсутствия данных.")
+    return None
+
+
+def extract_soup(content):
+    """Разбор страницы через BeautifulSoup (html.parser)"""
+    soup = BeautifulSoup(content, "html.parser")
+    rows = []
+    for row in soup.find_all("tr", class_=ROW_CLASS):
+        username_element = row.find("div", class_=USERNAME_CLASS)
+        price_element = row.find("div", class_=PRICE_CLASS)
+        time_element = row.find("time")
+        parsed = build_row(
+            username_element.text if username_element else None,
+            price_element.text if price_element else None,
+            time_element.get("datetime") if time_element else None
+        )
+        if parsed:
+            rows.append(parsed)
+    return rows
+
+
+# Селекторы для selectolax (точное совпадение class, как у BeautifulSoup с составным классом)
+_SLX_ROW = f"tr.{ROW_CLASS}"
+_SLX_USERNAME = f'div[class="{USERNAME_CLASS}"]'
+_SLX_PRICE = f'div[class="{PRICE_CLASS}"]'
+
+
+def extract_selectolax(content):
+    """Разбор страницы через selectolax (Lexbor, C)"""
+    tree = HTMLParser(content)
+    rows = []
+    for row in tree.css(_SLX_ROW):
+        username_element = row.css_first(_SLX_USERNAME)
+        price_element = row.css_first(_SLX_PRICE)
+        time_element = row.css_first("time")
+        parsed = build_row(
+            username_element.text() if username_element else None,
+            price_element.text() if price_element else None,
+            time_element.attributes.get("datetime") if time_element else None
+        )
+        if parsed:
+            rows.append(parsed)
+    return rows
+
+
+if lxml_html is not None:
+    # XPath-выражения компилируются один раз при импорте
+    _LXML_ROWS = etree.XPath(f'//tr[contains(concat(" ", normalize-space(@class), " "), " {ROW_CLASS} ")]')
+    _LXML_USERNAME = etree.XPath(f'string((.//div[@class="{USERNAME_CLASS}"])[1])')
+    _LXML_PRICE = etree.XPath(f'string((.//div[@class="{PRICE_CLASS}"])[1])')
+    _LXML_DATETIME = etree.XPath('string((.//time)[1]/@datetime)')
+
+
+def extract_lxml(content):
+    """Разбор страницы через lxml с предкомпилированными XPath"""
+    tree = lxml_html.fromstring(content)
+    rows = []
+    for row in _LXML_ROWS(tree):
+        parsed = build_row(
+            _LXML_USERNAME(row) or None,
+            _LXML_PRICE(row) or None,
+            _LXML_DATETIME(row) or None
+        )
+        if parsed:
+            rows.append(parsed)
+    return rows
+
+
+EXTRACTORS = {
+    "selectolax": (extract_selectolax, HTMLParser is not None),
+    "lxml": (extract_lxml, lxml_html is not None),
+    "soup": (extract_soup, True),
+}
+
+
+def available_extractors():
+    """Список доступных движков в порядке предпочтения"""
+    return [name for name, (_, available) in EXTRACTORS.items() if available]
+
+
+def get_extractor(name=None):
+    """Функция разбора страницы: указанный движок или самый быстрый из установленных"""
+    if name is None:
+        name = available_extractors()[0]
+    extract, available = EXTRACTORS[name]
+    if not available:
+        raise ImportError(f"Движок разбора HTML '{name}' не установлен")
+    return extract
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import re
+import time
+
+import aiohttp
+from aiohttp import web
+
+from metrics import observe_phase
+
+# Параметр пагинации ленты проданных имен ("Load more" запрашивает следующую порцию по смещению)
+OFFSET_PARAM = "offset"
+
+# Ограничения обхода по умолчанию
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_PAGES = 50
+REQUEST_TIMEOUT = 30
+
+
+async def fetch_page(session, semaphore, url, offset, headers=None):
+    """Загрузка одной страницы ленты по смещению"""
+    params = {OFFSET_PARAM: offset} if offset else None
+    async with semaphore:
+        started = time.perf_counter()
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Ошибка при загрузке страницы (offset={offset}): {response.status}")
+            content = await response.read()
+        observe_phase("fetch", time.perf_counter() - started, size=len(content))
+        return content
+
+
+async def fetch_sold_rows(url, parse, is_known=None, headers=None,
+                          concurrency=DEFAULT_CONCURRENCY, max_pages=DEFAULT_MAX_PAGES):
+    """Обход ленты проданных имен с ограниченным числом параллельных запросов.
+
+    parse(content) возвращает список строк (username, price, datetime) в порядке ленты,
+    is_known(username, datetime) сообщает, что строка уже есть в sold_usernames —
+    на первой такой строке обход останавливается.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    rows = []
+    pages = 0
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Первая страница задает размер порции для расчета смещений
+        first_page = parse(await fetch_page(session, semaphore, url, 0, headers))
+        pages += 1
+        page_size = len(first_page)
+        done = _collect(first_page, rows, is_known)
+
+        next_page = 1
+        while not done and page_size and next_page < max_pages:
+            # Загружаем окно страниц параллельно, но обрабатываем строго по порядку
+            window = range(next_page, min(next_page + concurrency, max_pages))
+            contents = await asyncio.gather(*(
+                fetch_page(session, semaphore, url, page * page_size, headers) for page in window
+            ))
+            for content in contents:
+                page_rows = parse(content)
+                pages += 1
+                done = _collect(page_rows, rows, is_known) or len(page_rows) < page_size
+                if done:
+                    break
+            next_page += len(window)
+
+    logging.info(f"Обход ленты завершен: {pages} страниц, {len(rows)} новых записей.")
+    return rows
+
+
+def _collect(page_rows, rows, is_known):
+    """Добавляет строки страницы до первой уже известной; True — обход пора остановить"""
+    for row in page_rows:
+        if is_known and is_known(row[0], row[2]):
+            return True
+        rows.append(row)
+    return not page_rows
+
+
+def make_fixture_app(directory, delay=0.0):
+    """Локальный сервер сохраненных HTML-страниц ленты для офлайн-замеров.
+
+    Страницы берутся из directory в порядке имен файлов (*.html), смещение
+    переводится в номер страницы по числу строк на первой странице.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+    if not names:
+        raise ValueError(f"В каталоге {directory} нет сохраненных страниц (*.html)")
+    pages = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            pages.append(f.read())
+    page_size = len(re.findall(rb"tm-row-selectable", pages[0])) or 1
+
+    async def handle(request):
+        if delay:
+            await asyncio.sleep(delay)
+        index = int(request.query.get(OFFSET_PARAM, 0)) // page_size
+        body = pages[index] if index < len(pages) else b"<table></table>"
+        return web.Response(body=body, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    return app
+
+
+async def start_fixture_server(directory, host="127.0.0.1", port=8089, delay=0.0):
+    """Запуск сервера сохраненных страниц; возвращает runner для остановки"""
+    runner = web.AppRunner(make_fixture_app(directory, delay))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Сервер сохраненных страниц запущен: http://{host}:{port}/")
+    return runner
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from functools import partial
+
+from aiohttp import web
+
+import metrics
+from anomaly_detector import AnomalyDetector, warm_up
+from extractors import available_extractors
+from fetcher import fetch_sold_rows, DEFAULT_CONCURRENCY, DEFAULT_MAX_PAGES
+from upload_to_db import url, headers, create_pool, insert_batch, parse_html, prepare_records
+
+# Интервалы опроса ленты, секунды
+BASE_INTERVAL = 60
+PEAK_INTERVAL = 20
+MAX_INTERVAL = 600
+
+# Множители замедления: при пустых циклах и при ошибках
+IDLE_BACKOFF = 1.5
+ERROR_BACKOFF = 2.0
+# Предел степени множителя: PEAK_INTERVAL * IDLE_BACKOFF ** 10 уже больше MAX_INTERVAL,
+# а без предела степень переполняет float после ~1000 ошибок подряд
+MAX_BACKOFF_STEPS = 10
+
+# За сколько дней оцениваются пиковые часы продаж и сколько циклов хранить в статистике
+PEAK_HOURS_WINDOW_DAYS = 30
+STATS_WINDOW = 100
+
+FEED_NAME = "fragment_sold"
+
+
+async def load_watermark(conn, feed=FEED_NAME):
+    """Последняя сохраненная продажа (sale_date, username) или None"""
+    record = await conn.fetchrow(
+        "SELECT last_sale_date, last_username FROM ingest_state WHERE feed = $1", feed
+    )
+    return (record["last_sale_date"], record["last_username"]) if record else None
+
+
+async def save_watermark(conn, watermark, feed=FEED_NAME):
+    await conn.execute(
+        """
+        INSERT INTO ingest_state (feed, last_sale_date, last_username, updated_at)
+        VALUES ($1, $2, $3, now())
+        ON CONFLICT (feed) DO UPDATE
+        SET last_sale_date = EXCLUDED.last_sale_date,
+            last_username = EXCLUDED.last_username,
+            updated_at = EXCLUDED.updated_at
+        """,
+        feed, watermark[0], watermark[1]
+    )
+
+
+async def load_peak_hours(conn, days=PEAK_HOURS_WINDOW_DAYS):
+    """Часы суток (UTC), на которые приходится продаж больше среднего"""
+    records = await conn.fetch(
+        f"""
+        SELECT EXTRACT(HOUR FROM sale_date)::INT AS hour, COUNT(*) AS sales_count
+        FROM sold_usernames
+        WHERE sale_date >= now() - INTERVAL '{days} days'
+        GROUP BY hour
+        """
+    )
+    if not records:
+        return set()
+    average = sum(record["sales_count"] for record in records) / 24
+    return {record["hour"] for record in records if record["sales_count"] > average}
+
+
+def is_before_watermark(watermark, username, sale_date):
+    """Строка ленты уже сохранена: она старше водяного знака или совпадает с ним"""
+    if watermark is None:
+        return False
+    last_sale_date, last_username = watermark
+    return sale_date < last_sale_date or (sale_date == last_sale_date and username == last_username)
+
+
+class IngestStats:
+    """Метрики циклов демона: задержка цикла и число новых строк"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.cycles = 0
+        self.errors = 0
+        self.total_rows = 0
+        self.latencies = deque(maxlen=window)
+        self.rows_per_cycle = deque(maxlen=window)
+        self.next_interval = None
+        self.last_cycle_at = None
+
+    def record(self, latency, rows):
+        self.cycles += 1
+        self.total_rows += rows
+        self.latencies.append(latency)
+        self.rows_per_cycle.append(rows)
+        self.last_cycle_at = datetime.utcnow()
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        percentile = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else None
+        return {
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "total_rows": self.total_rows,
+            "last_latency": self.latencies[-1] if self.latencies else None,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "last_rows": self.rows_per_cycle[-1] if self.rows_per_cycle else 0,
+            "avg_rows_per_cycle": sum(self.rows_per_cycle) / len(self.rows_per_cycle) if self.rows_per_cycle else 0,
+            "next_interval": self.next_interval,
+            "last_cycle_at": self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+        }
+
+
+class IngestDaemon:
+    """Постоянно работающий сбор ленты с прогретым пулом и адаптивным интервалом опроса"""
+
+    def __init__(self, pool, feed_url=url, extractor=None, concurrency=DEFAULT_CONCURRENCY,
+                 max_pages=DEFAULT_MAX_PAGES):
+        self.pool = pool
+        self.feed_url = feed_url
+        self.parse = partial(parse_html, extractor=extractor)
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.stats = IngestStats()
+        self.watermark = None
+        self.detector = AnomalyDetector()
+        self.peak_hours = set()
+        self.idle_cycles = 0
+        self.error_streak = 0
+
+    async def start(self):
+        async with self.pool.acquire() as conn:
+            self.watermark = await load_watermark(conn)
+            self.peak_hours = await load_peak_hours(conn)
+            await warm_up(conn, self.detector)
+            # Раздел следующего месяца создается заранее, а не первой вставкой после полуночи
+            await conn.execute("SELECT ensure_sold_partitions(now()::TIMESTAMP, now()::TIMESTAMP + INTERVAL '1 month')")
+        logging.info(f"Водяной знак: {self.watermark}, пиковые часы (UTC): {sorted(self.peak_hours)}")
+
+    async def run_cycle(self):
+        """Один цикл: новые строки ленты -> пакетная вставка -> сдвиг водяного знака"""
+        started = time.perf_counter()
+        watermark = self.watermark
+        rows = await fetch_sold_rows(
+            self.feed_url, self.parse,
+            is_known=partial(is_before_watermark, watermark),
+            headers=headers,
+            concurrency=self.concurrency,
+            max_pages=self.max_pages
+        )
+        inserted = 0
+        if rows:
+            newest = max(rows, key=lambda row: row[2])
+            async with self.pool.acquire() as conn:
+                inserted, _ = await insert_batch(conn, prepare_records(*zip(*rows)), detector=self.detector)
+                self.watermark = (newest[2], newest[0])
+                await save_watermark(conn, self.watermark)
+        latency = time.perf_counter() - started
+        self.stats.record(latency, inserted)
+        logging.info(f"Цикл завершен за {latency:.2f} с: новых строк {len(rows)}, вставлено {inserted}.")
+        return inserted
+
+    def next_interval(self, now=None):
+        """Интервал до следующего цикла: короче в пиковые часы, длиннее при простое и ошибках"""
+        now = now or datetime.utcnow()
+        interval = PEAK_INTERVAL if now.hour in self.peak_hours else BASE_INTERVAL
+        if self.error_streak:
+            interval *= ERROR_BACKOFF ** min(self.error_streak, MAX_BACKOFF_STEPS)
+        elif self.idle_cycles:
+            interval *= IDLE_BACKOFF ** min(self.idle_cycles, MAX_BACKOFF_STEPS)
+        return min(interval, MAX_INTERVAL)
+
+    async def run_forever(self):
+        await self.start()
+        while True:
+            try:
+                inserted = await self.run_cycle()
+                self.error_streak = 0
+                self.idle_cycles = 0 if inserted else self.idle_cycles + 1
+            except Exception as e:
+                self.error_streak += 1
+                self.stats.errors += 1
+                logging.error(f"Ошибка цикла загрузки: {e}")
+            self.stats.next_interval = self.next_interval()
+            await asyncio.sleep(self.stats.next_interval)
+
+
+async def start_stats_server(stats, port, host="127.0.0.1"):
+    """HTTP-маршруты /stats (метрики циклов в JSON) и /metrics (гистограммы фаз в формате Prometheus)"""
+    async def handle(request):
+        return web.Response(text=json.dumps(stats.snapshot()), content_type="application/json")
+
+    async def handle_metrics(request):
+        return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/stats", handle)
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Метрики демона: http://{host}:{port}/stats, http://{host}:{port}/metrics")
+    return runner
+
+
+async def main(args):
+    pool = await create_pool(min_size=1, max_size=2, dsn=args.dsn)
+    daemon = IngestDaemon(pool, feed_url=args.url, extractor=args.extractor,
+                          concurrency=args.concurrency, max_pages=args.max_pages)
+    runner = await start_stats_server(daemon.stats, args.stats_port) if args.stats_port else None
+    try:
+        await daemon.run_forever()
+    finally:
+        if runner:
+            await runner.cleanup()
+        await pool.close()
+        logging.info("Пул соединений закрыт.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Демон непрерывной загрузки проданных имен с fragment.com")
+    parser.add_argument("--url", default=url, help="Адрес ленты (например, локальный сервер-заглушка)")
+    parser.add_argument("--dsn", help="Строка подключения к PostgreSQL вместо DB_CONFIG")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Число параллельных запросов")
+    parser.add_argument("--extractor", choices=available_extractors(), help="Движок разбора HTML")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES, help="Максимум страниц за один цикл")
+    parser.add_argument("--stats-port", type=int, help="Порт HTTP-маршрутов /stats и /metrics")
+    asyncio.run(main(parser.parse_args()))
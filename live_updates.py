@@ -0,0 +1,150 @@
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from queries import histogram_upper
+from resolution import bucket_labels
+
+# Живой режим дашборда: на каждом тике из базы забираются только продажи с id больше курсора
+# (queries.get_sales_after), они добавляются к уже загруженным наборам данных, а графики
+# правятся частично (dash.Patch). Стоимость тика зависит от числа новых продаж, а не от истории.
+
+# Как часто (секунд) забирать новые продажи
+LIVE_INTERVAL = 10
+
+# Не больше строк за тик: после долгой паузы курсор догоняет данные за несколько тиков
+LIVE_BATCH_ROWS = 10_000
+
+
+def sales_mask(sales, start_date, end_date, price_range=None, purity=None):
+    """Те же условия, что queries.sales_predicates, для новых продаж в памяти (даты — по дням UTC)"""
+    day = sales['sale_date'].dt.normalize()
+    mask = np.ones(len(sales), dtype=bool)
+    if start_date is not None:
+        mask &= (day >= pd.Timestamp(start_date).normalize()).to_numpy()
+    if end_date is not None:
+        mask &= (day <= pd.Timestamp(end_date).normalize()).to_numpy()
+    price = sales['price'].to_numpy(dtype=np.float64)
+    if price_range is not None:
+        min_price, max_price = price_range
+        if min_price is not None:
+            mask &= price >= min_price
+        if max_price is not None:
+            mask &= price < max_price
+    if purity == "clean":
+        mask &= sales['is_clean'].to_numpy(dtype=bool)
+    elif purity == "not_clean":
+        mask &= ~sales['is_clean'].to_numpy(dtype=bool)
+    return mask
+
+
+def daily_sums(row):
+    """Строка статистики (средние за интервал) -> суммы, к которым можно прибавить новые продажи"""
+    count = row['sales_count']
+    clean_count = round(row['clean_ratio'] * count)
+    return {
+        "sales_count": count,
+        "price_sum": row['average_price'] * count,
+        "clean_count": clean_count,
+        "clean_price_sum": (row['avg_price_clean'] or 0) * clean_count,
+        "length_sum": row['avg_name_length'] * count,
+    }
+
+
+def daily_row(date, sums):
+    """Суммы за интервал -> строка статистики (как в queries.daily_stats_query)"""
+    count, clean_count = int(sums['sales_count']), int(sums['clean_count'])
+    price_sum, clean_price_sum = float(sums['price_sum']), float(sums['clean_price_sum'])
+    return {
+        "date": date,
+        "sales_count": count,
+        "average_price": price_sum / count,
+        "avg_price_clean": clean_price_sum / clean_count if clean_count else None,
+        "avg_price_not_clean": (price_sum - clean_price_sum) / (count - clean_count) if count > clean_count else None,
+        "clean_ratio": clean_count / count,
+        "avg_name_length": float(sums['length_sum']) / count,
+    }
+
+
+def merge_daily(rows, sales, bucket="day"):
+    """Добавление продаж (уже отфильтрованных) к статистике rows по интервалам bucket, упорядоченной по дате.
+
+    rows изменяется на месте; возвращает изменения [("set" | "insert", позиция, строка)] в порядке
+    применения — по ним правится хранилище.
+    """
+    if sales.empty:
+        return []
+    is_clean = sales['is_clean'].to_numpy(dtype=bool)
+    price = sales['price'].to_numpy(dtype=np.float64)
+    new = pd.DataFrame({
+        "date": bucket_labels(sales['sale_date'], bucket).to_numpy(),
+        "sales_count": 1,
+        "price_sum": price,
+        "clean_count": is_clean.astype(np.int64),
+        "clean_price_sum": np.where(is_clean, price, 0),
+        "length_sum": sales['name_length'].to_numpy(dtype=np.int64),
+    }).groupby("date").sum()
+
+    dates = bucket_labels([row['date'] for row in rows], bucket).tolist()
+    changes = []
+    for date, added in new.iterrows():
+        position = bisect_left(dates, date)
+        if position < len(dates) and dates[position] == date:
+            sums = daily_sums(rows[position])
+            row = daily_row(date, {name: sums[name] + added[name] for name in sums})
+            rows[position] = row
+            changes.append(("set", position, row))
+        else:
+            # Интервал без продаж в загруженных данных (обычно наступил новый)
+            row = daily_row(date, added)
+            dates.insert(position, date)
+            rows.insert(position, row)
+            changes.append(("insert", position, row))
+    return changes
+
+
+def merge_histogram(histogram, sales):
+    """Добавление продаж к гистограмме цен; counts изменяется на месте, возвращает [(бин, количество)]"""
+    min_price, max_price = histogram['min_price'], histogram['max_price']
+    counts = histogram['counts']
+    price = sales['price'].to_numpy(dtype=np.float64)
+    price = price[(price >= min_price) & (price <= max_price)]
+    if not len(price):
+        return []
+    # Как width_bucket в price_histogram_query: цена, равная max_price, — в последнем бине
+    bins = len(counts)
+    width = histogram_upper(min_price, max_price) - min_price
+    buckets = np.minimum(((price - min_price) / width * bins).astype(np.int64), bins - 1)
+    added = np.bincount(buckets, minlength=bins)
+    changes = []
+    for bucket in np.flatnonzero(added):
+        counts[bucket] += int(added[bucket])
+        changes.append((int(bucket), counts[bucket]))
+    return changes
+
+
+def merge_hourly(cells, sales, timezone):
+    """Добавление продаж к агрегату "день недели x час" в часовом поясе timezone.
+
+    cells — список {weekday, hour_of_day, sales_count}, изменяется на месте; возвращает
+    изменения [("set" | "append", позиция, ячейка)].
+    """
+    if sales.empty:
+        return []
+    local = sales['sale_date'].dt.tz_localize('UTC').dt.tz_convert(timezone)
+    added = pd.DataFrame({"weekday": local.dt.dayofweek + 1, "hour_of_day": local.dt.hour}) \
+        .value_counts().sort_index()
+
+    positions = {(cell['weekday'], cell['hour_of_day']): i for i, cell in enumerate(cells)}
+    changes = []
+    for (weekday, hour), count in added.items():
+        position = positions.get((weekday, hour))
+        if position is not None:
+            cells[position]['sales_count'] += int(count)
+            changes.append(("set", position, cells[position]))
+        else:
+            cell = {"weekday": int(weekday), "hour_of_day": int(hour), "sales_count": int(count)}
+            cells.append(cell)
+            changes.append(("append", len(cells) - 1, cell))
+    return changes
@@ -0,0 +1,183 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Гистограммы задержек, строк и байт и счетчики в текстовом формате Prometheus (маршрут /metrics
+# у дашборда и у демона загрузки). Счетчики живут в памяти процесса.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Журнал медленных запросов: порог в миллисекундах (0 — выключен) и необязательный файл
+SLOW_QUERY_MS = float(os.environ.get("SOLD_SLOW_QUERY_MS", 0))
+SLOW_QUERY_LOG = os.environ.get("SOLD_SLOW_QUERY_LOG")
+
+REGISTRY = []
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками: накопительные корзины, сумма и количество"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = np.array(buckets, dtype=np.float64)
+        self.lock = threading.Lock()
+        self.series = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, *labelvalues):
+        labelvalues = tuple(map(str, labelvalues))
+        with self.lock:
+            counts, total = self.series.get(labelvalues, (None, 0.0))
+            if counts is None:
+                counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)
+            counts[np.searchsorted(self.buckets, value, side='left')] += 1
+            self.series[labelvalues] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: (counts.copy(), total) for labels, (counts, total) in self.series.items()}
+        for labelvalues, (counts, total) in sorted(series.items()):
+            labels = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+            cumulative = np.cumsum(counts)
+            for bound, count in zip([*map(format_bound, self.buckets), "+Inf"], cumulative):
+                le = 'le="' + bound + '"'
+                lines.append(f"{self.name}_bucket{{{','.join(labels + [le])}}} {count}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {cumulative[-1]}")
+        return lines
+
+
+class Counter:
+    """Счетчик Prometheus с метками"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        labelvalues = tuple(map(str, labelvalues))
+        with self.lock:
+            self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for labelvalues, value in sorted(series.items()):
+            labels = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_bound(bound):
+    return f"{bound:g}" if bound < 1e6 else f"{bound:.0f}"
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+QUERY_SECONDS = Histogram("sold_query_duration_seconds", "Query function latency", ["source", "query"])
+QUERY_ROWS = Histogram("sold_query_rows", "Rows returned by query function", ["source", "query"], ROW_BUCKETS)
+QUERY_BYTES = Histogram("sold_query_bytes", "Bytes returned by query function", ["source", "query"], BYTE_BUCKETS)
+SQL_SECONDS = Histogram("sold_sql_duration_seconds", "SQL execution and DataFrame build time", ["query"])
+CALLBACK_SECONDS = Histogram("sold_callback_duration_seconds", "Dash callback latency", ["callback"])
+INGEST_SECONDS = Histogram("sold_ingest_duration_seconds", "Ingest phase latency", ["phase"])
+INGEST_ROWS = Histogram("sold_ingest_rows", "Rows per ingest phase call", ["phase"], ROW_BUCKETS)
+INGEST_BYTES = Histogram("sold_ingest_bytes", "Bytes per ingest phase call", ["phase"], BYTE_BUCKETS)
+QUERY_CACHE_REQUESTS = Counter("sold_query_cache_requests_total", "Query cache lookups by result", ["result"])
+QUERY_CACHE_EVICTIONS = Counter("sold_query_cache_evictions_total", "Query cache entries evicted by LRU")
+
+
+def result_size(result):
+    """(строк, байт) результата функции запроса: DataFrame, Series, массив или кортеж массивов"""
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=False).sum())
+    if isinstance(result, (pd.Series, np.ndarray)):
+        return len(result), int(result.nbytes)
+    if isinstance(result, tuple):
+        sizes = [result_size(item) for item in result]
+        return max((rows for rows, _ in sizes), default=0), sum(size for _, size in sizes)
+    return 1, 0
+
+
+def timed_query(source):
+    """Декоратор функций запросов дашборда: задержка, число строк и объем результата"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            QUERY_SECONDS.observe(time.perf_counter() - started, source, func.__name__)
+            rows, size = result_size(result)
+            QUERY_ROWS.observe(rows, source, func.__name__)
+            QUERY_BYTES.observe(size, source, func.__name__)
+            return result
+        return wrapper
+    return decorator
+
+
+slow_query_logger = logging.getLogger("sold.slow_queries")
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    slow_query_logger.addHandler(_handler)
+
+
+def observe_sql(name, seconds, query, params=None):
+    """Время выполнения SQL; запросы дольше SOLD_SLOW_QUERY_MS пишутся в журнал с текстом и параметрами"""
+    SQL_SECONDS.observe(seconds, name)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            f"Медленный запрос {name}: {seconds * 1000:.0f} мс\n{' '.join(query.split())}\nПараметры: {params}"
+        )
+
+
+def observe_phase(phase, seconds, rows=None, size=None):
+    """Фаза загрузки ленты (fetch, parse, insert): задержка, строки и байты"""
+    INGEST_SECONDS.observe(seconds, phase)
+    if rows is not None:
+        INGEST_ROWS.observe(rows, phase)
+    if size is not None:
+        INGEST_BYTES.observe(size, phase)
+
+
+def timed_callbacks(app):
+    """Замена app.callback, замеряющая каждый зарегистрированный callback Dash"""
+    def callback(*args, **kwargs):
+        register = app.callback(*args, **kwargs)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*func_args, **func_kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*func_args, **func_kwargs)
+                finally:
+                    CALLBACK_SECONDS.observe(time.perf_counter() - started, func.__name__)
+            return register(wrapper)
+        return decorator
+    return callback
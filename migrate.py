@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import logging
+import os
+
+import asyncpg
+
+from db_config import DB_CONFIG
+
+# Каталог с пронумерованными миграциями (NNN_описание.sql), применяются по порядку имен
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "migrations")
+
+
+def list_migrations():
+    """Файлы миграций в порядке применения"""
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+async def migrate(conn, dry_run=False):
+    """Применение еще не примененных миграций, каждая — в своей транзакции"""
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """
+    )
+    applied = {record["version"] for record in await conn.fetch("SELECT version FROM schema_migrations")}
+    pending = [name for name in list_migrations() if name not in applied]
+
+    for name in pending:
+        if dry_run:
+            logging.info(f"Будет применена миграция {name}")
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+            sql = f.read()
+        async with conn.transaction():
+            await conn.execute(sql)
+            await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", name)
+        logging.info(f"Миграция {name} применена.")
+
+    if not pending:
+        logging.info("Новых миграций нет.")
+    return pending
+
+
+async def main(args):
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        await migrate(conn, dry_run=args.dry_run)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Применение миграций схемы sold_usernames")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, какие миграции будут применены")
+    asyncio.run(main(parser.parse_args()))
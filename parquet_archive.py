@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from queries import get_engine
+
+# pyarrow нужен только для архива; без него остальные модули работают как раньше
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Архив sold_usernames: archive/sold_usernames/sale_day=YYYY-MM-DD/part-0.parquet
+ARCHIVE_DIR = os.path.join("archive", "sold_usernames")
+MANIFEST_NAME = "_manifest.json"
+PARTITION_KEY = "sale_day"
+PART_FILE = "part-0.parquet"
+
+# Сколько строк читать из базы за раз при выгрузке
+EXPORT_CHUNK_SIZE = 100_000
+
+ARCHIVE_COLUMNS = ["id", "username", "price", "sale_date", "name_length", "is_clean",
+                   "digit_count", "underscore_count", "name_pattern", "length_bucket"]
+
+if pa is not None:
+    # Типизированная схема файлов: цена — число, имя без @, признаки имени как в базе
+    ARCHIVE_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("username", pa.string()),
+        ("price", pa.float64()),
+        ("sale_date", pa.timestamp("us")),
+        ("name_length", pa.int16()),
+        ("is_clean", pa.bool_()),
+        ("digit_count", pa.int16()),
+        ("underscore_count", pa.int16()),
+        ("name_pattern", pa.string()),
+        ("length_bucket", pa.string()),
+    ])
+    PARTITIONING = ds.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Для Parquet-архива нужен пакет pyarrow")
+
+
+def to_day(value):
+    """Дата (строка, date, Timestamp) -> 'YYYY-MM-DD', как в имени раздела"""
+    return pd.Timestamp(value).date().isoformat()
+
+
+def partition_path(archive_dir, day):
+    return os.path.join(archive_dir, f"{PARTITION_KEY}={day}", PART_FILE)
+
+
+def temp_path(path):
+    """Временный файл раздела; префикс _ скрывает его от читателей архива"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "_" + name)
+
+
+def list_partitions(archive_dir=ARCHIVE_DIR):
+    """Дни, уже выгруженные в архив"""
+    if not os.path.isdir(archive_dir):
+        return []
+    prefix = f"{PARTITION_KEY}="
+    return sorted(
+        name[len(prefix):] for name in os.listdir(archive_dir)
+        if name.startswith(prefix) and os.path.exists(os.path.join(archive_dir, name, PART_FILE))
+    )
+
+
+def load_manifest(archive_dir=ARCHIVE_DIR):
+    """Состояние последней выгрузки: last_id и время"""
+    try:
+        with open(os.path.join(archive_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_id": 0}
+
+
+def save_manifest(manifest, archive_dir=ARCHIVE_DIR):
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def changed_days(conn, last_id):
+    """Дни, в которых появились строки с id > last_id (включая поздно пришедшие старые продажи)"""
+    rows = conn.execute(
+        text("SELECT DISTINCT sale_date::DATE AS day FROM public.sold_usernames WHERE id > :last_id ORDER BY day"),
+        {"last_id": int(last_id)}
+    )
+    return [row.day.isoformat() for row in rows]
+
+
+class PartitionWriter:
+    """Запись строк, отсортированных по sale_date, в разделы по дням.
+
+    Раздел пишется во временный файл и подменяет старый целиком, когда день закончился,
+    поэтому читатель никогда не видит наполовину записанный день.
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.day = None
+        self.writer = None
+        self.rows = 0
+        self.days = []
+
+    def write(self, df):
+        days = df['sale_date'].dt.strftime("%Y-%m-%d")
+        for day, part in df.groupby(days, sort=True):
+            if day != self.day:
+                self.close()
+                self.open(day)
+            table = pa.Table.from_pandas(part[ARCHIVE_COLUMNS], schema=ARCHIVE_SCHEMA, preserve_index=False)
+            self.writer.write_table(table)
+            self.rows += len(part)
+
+    def open(self, day):
+        path = partition_path(self.archive_dir, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.day = day
+        self.writer = pq.ParquetWriter(temp_path(path), ARCHIVE_SCHEMA, compression="zstd")
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        path = partition_path(self.archive_dir, self.day)
+        os.replace(temp_path(path), path)
+        self.days.append(self.day)
+        self.writer = None
+        self.day = None
+
+
+def export_archive(archive_dir=ARCHIVE_DIR, full=False, sql_engine=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Выгрузка sold_usernames в Parquet по дням.
+
+    По умолчанию переписываются только дни, где появились строки после прошлой выгрузки
+    (id > last_id из манифеста); full=True пересобирает архив целиком.
+    """
+    require_pyarrow()
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = {"last_id": 0} if full else load_manifest(archive_dir)
+
+    sql_engine = sql_engine or get_engine()
+    with sql_engine.connect().execution_options(stream_results=True) as conn:
+        max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM public.sold_usernames")).scalar()
+        days = changed_days(conn, manifest["last_id"])
+        if not days:
+            logging.info("Новых данных для архива нет.")
+            return []
+
+        # Дни переписываются целиком, поэтому берем все их строки, а не только новые
+        query = text(f"""
+            SELECT {", ".join(ARCHIVE_COLUMNS)}
+            FROM public.sold_usernames
+            WHERE sale_date >= CAST(:since AS DATE)
+              AND sale_date < CAST(:until AS DATE) + 1
+              AND sale_date::DATE = ANY(CAST(:days AS DATE[]))
+              AND id <= :max_id
+            ORDER BY sale_date
+        """)
+        params = {"since": days[0], "until": days[-1], "days": days, "max_id": int(max_id)}
+        writer = PartitionWriter(archive_dir)
+        try:
+            for chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_size):
+                writer.write(chunk)
+        finally:
+            writer.close()
+
+    save_manifest({"last_id": int(max_id), "exported_at": datetime.utcnow().isoformat()}, archive_dir)
+    logging.info(f"Архив обновлен: {len(writer.days)} дней, {writer.rows} строк.")
+    return writer.days
+
+
+def load_archive(start_date=None, end_date=None, columns=None, filters=None, archive_dir=ARCHIVE_DIR):
+    """Чтение архива за период (границы включительно, по дням).
+
+    Лишние дни отбрасываются по именам разделов, columns читает только нужные столбцы,
+    filters — условия pyarrow вида [("price", ">=", 10), ("is_clean", "=", True)],
+    которые проверяются по статистике row group до распаковки данных.
+    """
+    require_pyarrow()
+    predicates = list(filters or [])
+    if start_date is not None:
+        predicates.append((PARTITION_KEY, ">=", to_day(start_date)))
+    if end_date is not None:
+        predicates.append((PARTITION_KEY, "<=", to_day(end_date)))
+    if not list_partitions(archive_dir):
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+    table = pq.read_table(
+        archive_dir,
+        columns=columns,
+        filters=predicates or None,
+        partitioning=PARTITIONING,
+        ignore_prefixes=[".", "_"],
+    )
+    if columns is None:
+        table = table.drop_columns([PARTITION_KEY])
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Parquet-архив sold_usernames с разделами по дням")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Каталог архива")
+    parser.add_argument("--full", action="store_true", help="Пересобрать архив целиком")
+    args = parser.parse_args()
+    export_archive(args.dir, full=args.full)
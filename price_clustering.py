@@ -0,0 +1,204 @@
+import numpy as np
+
+# Кластеризация цен на отсортированном массиве: цены одномерные, поэтому соседей
+# и границы классов ищем бинарным поиском и префиксными суммами, без матрицы расстояний.
+
+NOISE = -1
+
+
+class PriceDistribution:
+    """Отсортированные уникальные цены с количествами; пополняется новыми продажами.
+
+    first_index — номер первой продажи с этой ценой в порядке поступления: по нему DBSCAN
+    нумерует кластеры так же, как sklearn на исходном (неотсортированном) массиве.
+    """
+
+    def __init__(self, prices=None):
+        self.values = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.first_index = np.empty(0, dtype=np.int64)
+        self.size = 0
+        if prices is not None:
+            self.add(prices)
+
+    def add(self, prices):
+        """Добавление новых продаж: слияние с уже отсортированными ценами за O((n + m) log(n + m))"""
+        prices = np.asarray(prices, dtype=np.float64).ravel()
+        if not len(prices):
+            return self
+        values, first, counts = np.unique(prices, return_index=True, return_counts=True)
+        values = np.concatenate([self.values, values])
+        counts = np.concatenate([self.counts, counts])
+        first = np.concatenate([self.first_index, first + self.size])
+        self.values, inverse = np.unique(values, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self.first_index = np.full(len(self.values), np.iinfo(np.int64).max)
+        np.minimum.at(self.first_index, inverse, first)
+        self.size += len(prices)
+        return self
+
+    def index_of(self, prices):
+        """Позиции цен в values (цены должны уже быть добавлены)"""
+        return np.searchsorted(self.values, np.asarray(prices, dtype=np.float64))
+
+    def _neighbour_bounds(self, eps):
+        """[left, right) — цены на расстоянии не больше eps по той же проверке, что у sklearn: |a - b| <= eps.
+
+        Границы x ± eps округляются иначе, чем разность цен, поэтому бинарный поиск может ошибиться
+        на одну цену у края; такие границы сдвигаются, пока проверка не совпадет.
+        """
+        values = self.values
+        n = len(values)
+        index = np.arange(n)
+        left = np.searchsorted(values, values - eps, side='left')
+        right = np.searchsorted(values, values + eps, side='right')
+        while True:
+            wider = (left > 0) & (np.abs(values[left - 1] - values) <= eps)
+            narrower = ~wider & (left < index) & (np.abs(values[np.minimum(left, n - 1)] - values) > eps)
+            if not (wider.any() or narrower.any()):
+                break
+            left = left - wider + narrower
+        while True:
+            wider = (right < n) & (np.abs(values[np.minimum(right, n - 1)] - values) <= eps)
+            narrower = ~wider & (right > index + 1) & (np.abs(values[right - 1] - values) > eps)
+            if not (wider.any() or narrower.any()):
+                break
+            right = right + wider - narrower
+        return left, right
+
+    def _prefix(self, weights):
+        return np.concatenate([[0], np.cumsum(weights)])
+
+    def dbscan(self, eps, min_samples=5):
+        """Метки DBSCAN для каждой уникальной цены, совпадающие с sklearn.cluster.DBSCAN.
+
+        Соседи — цены в [x - eps, x + eps] (включая саму точку); ядро — не меньше min_samples соседей.
+        Ядра связны, если соседние ядра в отсортированном порядке ближе eps; граничная точка
+        получает кластер ближайшего ядра слева или справа, из двух — с меньшим номером,
+        как при обходе sklearn по возрастанию индексов.
+        """
+        values = self.values
+        cumulative = self._prefix(self.counts)
+        left, right = self._neighbour_bounds(eps)
+        core = cumulative[right] - cumulative[left] >= min_samples
+        labels = np.full(len(values), NOISE, dtype=np.int64)
+        core_index = np.flatnonzero(core)
+        if not len(core_index):
+            return labels
+
+        # Компоненты связности ядер: разрыв там, где соседние ядра дальше eps (та же проверка |a - b| <= eps)
+        core_values = values[core_index]
+        component = np.concatenate([[0], np.cumsum(np.abs(core_values[1:] - core_values[:-1]) > eps)])
+
+        # Номера кластеров — в порядке первого по времени ядра компоненты
+        first_seen = np.full(component[-1] + 1, np.iinfo(np.int64).max)
+        np.minimum.at(first_seen, component, self.first_index[core_index])
+        rank = np.empty_like(first_seen)
+        rank[np.argsort(first_seen, kind='stable')] = np.arange(len(first_seen))
+        labels[core_index] = rank[component]
+
+        # Граничные точки: ближайшие ядра слева и справа в пределах eps
+        border = np.flatnonzero(~core)
+        position = np.searchsorted(core_index, border)
+        candidates = []
+        for neighbour in (position - 1, position):
+            valid = (neighbour >= 0) & (neighbour < len(core_index))
+            neighbour = np.clip(neighbour, 0, len(core_index) - 1)
+            near = valid & (np.abs(values[border] - core_values[neighbour]) <= eps)
+            candidates.append(np.where(near, rank[component[neighbour]], np.iinfo(np.int64).max))
+        border_label = np.minimum(*candidates)
+        labels[border] = np.where(border_label == np.iinfo(np.int64).max, NOISE, border_label)
+        return labels
+
+    def _segment_cost(self, starts, end, prefix):
+        """Внутриклассовая сумма квадратов отклонений для классов values[starts:end]"""
+        count, total, squares = (p[end] - p[starts] for p in prefix)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return squares - total ** 2 / count
+
+    def natural_breaks(self, k):
+        """Естественные границы Дженкса: k классов с минимальной внутриклассовой дисперсией.
+
+        Точное решение динамическим программированием по уникальным ценам (с весами-количествами);
+        оптимальная точка разбиения монотонна, поэтому каждый слой считается разделяй-и-властвуй
+        за O(m log m). Возвращает нижние границы классов 2..k (цена >= границы — следующий класс).
+        """
+        m = len(self.values)
+        k = min(k, m)
+        if k <= 1:
+            return []
+        prefix = (
+            self._prefix(self.counts),
+            self._prefix(self.counts * self.values),
+            self._prefix(self.counts * self.values ** 2),
+        )
+        # cost[j] — лучшая стоимость первых j цен, split[c][j] — начало последнего класса
+        cost = self._segment_cost(np.zeros(m + 1, dtype=np.int64), np.arange(m + 1), prefix)
+        cost[0] = 0
+        splits = []
+        for classes in range(2, k + 1):
+            new_cost = np.full(m + 1, np.inf)
+            split = np.zeros(m + 1, dtype=np.int64)
+            stack = [(classes, m, classes - 1, m - 1)]
+            while stack:
+                lo, hi, opt_lo, opt_hi = stack.pop()
+                if lo > hi:
+                    continue
+                mid = (lo + hi) // 2
+                starts = np.arange(opt_lo, min(mid - 1, opt_hi) + 1)
+                total = cost[starts] + self._segment_cost(starts, mid, prefix)
+                best = int(np.argmin(total))
+                new_cost[mid] = total[best]
+                split[mid] = starts[best]
+                stack.append((lo, mid - 1, opt_lo, starts[best]))
+                stack.append((mid + 1, hi, starts[best], opt_hi))
+            cost = new_cost
+            splits.append(split)
+
+        # Восстановление границ с конца
+        bounds = []
+        end = m
+        for split in reversed(splits):
+            end = split[end]
+            bounds.append(self.values[end])
+        return sorted(bounds)
+
+    def kmeans(self, k, max_iter=100):
+        """k-means (Ллойд) на отсортированных ценах: O(k log m) на итерацию.
+
+        Классы в одномерном случае — отрезки, поэтому назначение точек сводится к бинарному поиску
+        середин между центрами, а пересчет центров — к префиксным суммам. Возвращает (центры, границы).
+        """
+        m = len(self.values)
+        k = min(k, m)
+        if k < 1:
+            return np.empty(0), []
+        weight_prefix = self._prefix(self.counts)
+        value_prefix = self._prefix(self.counts * self.values)
+        # Начальные центры — квантили уникальных цен: различны даже при частых круглых ценах
+        centers = np.unique(self.values[((np.arange(k) + 0.5) / k * m).astype(np.int64)])
+        for _ in range(max_iter):
+            cuts = np.concatenate([
+                [0], np.searchsorted(self.values, (centers[:-1] + centers[1:]) / 2, side='right'), [m]
+            ])
+            count = weight_prefix[cuts[1:]] - weight_prefix[cuts[:-1]]
+            total = value_prefix[cuts[1:]] - value_prefix[cuts[:-1]]
+            new_centers = np.where(count > 0, total / np.maximum(count, 1), centers)
+            if np.allclose(new_centers, centers):
+                break
+            centers = new_centers
+        return centers, [self.values[cut] for cut in cuts[1:-1] if cut < m]
+
+
+def dbscan_1d(prices, eps, min_samples=5):
+    """DBSCAN для одномерных цен с теми же метками, что у sklearn DBSCAN(eps, min_samples)"""
+    distribution = PriceDistribution(prices)
+    return distribution.dbscan(eps, min_samples)[distribution.index_of(prices)]
+
+
+def natural_breaks(prices, k):
+    return PriceDistribution(prices).natural_breaks(k)
+
+
+def kmeans_1d(prices, k, max_iter=100):
+    return PriceDistribution(prices).kmeans(k, max_iter)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import queries
+
+# Сетка KDE по log10(цены): число узлов и запас по краям в ширинах ядра
+GRID_SIZE = 1024
+GRID_PADDING = 3
+
+# Пик считается модой, если его выступ не меньше этой доли от максимума плотности
+PEAK_PROMINENCE = 0.05
+
+# Сколько секунд действительны кластеры, вычисленные для окна дат
+CLUSTERS_TTL = 3600
+
+# Сколько окон дат держать в кэше (LRU): каждый выбранный в дашборде период — новая запись
+CACHE_MAX_ENTRIES = 32
+
+PriceRegimes = namedtuple("PriceRegimes", ["modes", "thresholds", "grid", "density", "bandwidth", "sample_size"])
+
+
+def silverman_bandwidth(values):
+    """Ширина ядра по правилу Сильвермана"""
+    std = values.std(ddof=1)
+    iqr = np.subtract(*np.percentile(values, [75, 25]))
+    spread = min(std, iqr / 1.349) if iqr > 0 else std
+    return 0.9 * spread * len(values) ** (-1 / 5)
+
+
+def binned_kde(values, grid_size=GRID_SIZE, bandwidth=None):
+    """Гауссова KDE на равномерной сетке: линейное бинирование + свертка через FFT.
+
+    Стоимость O(n + m log m) вместо O(n * m) у gaussian_kde. Возвращает (сетка, плотность, ширина ядра).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if bandwidth is None:
+        bandwidth = silverman_bandwidth(values)
+    if not bandwidth > 0:
+        bandwidth = 1e-3  # Все значения одинаковые: узкое ядро вместо деления на ноль
+    low = values.min() - GRID_PADDING * bandwidth
+    high = values.max() + GRID_PADDING * bandwidth
+    grid = np.linspace(low, high, grid_size)
+    step = grid[1] - grid[0]
+
+    # Линейное бинирование: вес точки делится между двумя соседними узлами
+    position = (values - low) / step
+    left = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    fraction = position - left
+    counts = np.bincount(left, weights=1 - fraction, minlength=grid_size)
+    counts += np.bincount(left + 1, weights=fraction, minlength=grid_size)
+
+    # Свертка с гауссовым ядром; дополнение нулями убирает циклический перенос
+    offsets = np.arange(-grid_size + 1, grid_size) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    n_fft = 2 ** int(np.ceil(np.log2(3 * grid_size)))
+    smoothed = np.fft.irfft(np.fft.rfft(counts, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)
+    density = smoothed[grid_size - 1:2 * grid_size - 1] / len(values)
+    return grid, np.maximum(density, 0), bandwidth
+
+
+def find_regimes(prices, grid_size=GRID_SIZE, bandwidth=None, prominence=PEAK_PROMINENCE):
+    """Ценовые режимы: моды плотности log10(цены) и пороги минимальной плотности между соседними модами"""
+    prices = np.asarray(prices, dtype=np.float64)
+    log_prices = np.log10(prices[prices > 0])
+    if len(log_prices) < 2:
+        return PriceRegimes([], [], np.empty(0), np.empty(0), None, len(log_prices))
+    # scipy.signal импортируется несколько секунд, а нужен только режиму автоматических кластеров
+    from scipy.signal import find_peaks
+
+    grid, density, bandwidth = binned_kde(log_prices, grid_size, bandwidth)
+    peaks, _ = find_peaks(density, prominence=prominence * density.max())
+    thresholds = [
+        left + np.argmin(density[left:right + 1])
+        for left, right in zip(peaks[:-1], peaks[1:])
+    ]
+    return PriceRegimes(
+        modes=list(10 ** grid[peaks]),
+        thresholds=list(10 ** grid[thresholds]),
+        grid=10 ** grid,
+        density=density,
+        bandwidth=bandwidth,
+        sample_size=len(log_prices),
+    )
+
+
+def round_price(price):
+    """Порог для подписи кластера: две значащие цифры"""
+    return float(f"{price:.2g}")
+
+
+def clusters_from_thresholds(thresholds):
+    """Кластеры в формате PRICE_CLUSTERS: {'0-25': (0, 25), ..., '400+': (400, None), 'all': (0, None)}"""
+    bounds = sorted({round_price(threshold) for threshold in thresholds if threshold > 0})
+    clusters = {}
+    low = 0
+    for high in bounds:
+        clusters[f"{low:g}-{high:g}"] = (low, high)
+        low = high
+    clusters[f"{low:g}+"] = (low, None)
+    clusters["all"] = (0, None)
+    return clusters
+
+
+def load_prices(start_date=None, end_date=None):
+    where, params = queries.sales_predicates(start_date, end_date)
+    return queries.read(
+        f"SELECT price FROM public.sold_usernames WHERE {where} AND price > 0", params, name="load_prices"
+    )['price']
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_price_regimes(start_date=None, end_date=None, max_age=CLUSTERS_TTL, load=load_prices):
+    """Режимы цен за окно дат с кэшем на max_age секунд (ключ — границы окна)"""
+    key = (str(start_date), str(end_date))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached:
+            _cache.move_to_end(key)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+    regimes = find_regimes(load(start_date, end_date).to_numpy(dtype=np.float64))
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), regimes)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return regimes
+
+
+def get_price_clusters(start_date=None, end_date=None, max_age=CLUSTERS_TTL):
+    """Кластеры цен, выведенные из плотности за окно дат (замена ручных PRICE_CLUSTERS)"""
+    return clusters_from_thresholds(get_price_regimes(start_date, end_date, max_age).thresholds)
@@ -0,0 +1,485 @@
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+import queries
+from username_features import PURITY_LABELS, classify_purity
+
+# Проверка влияния длины и чистоты имени на цену (ANOVA, Краскел-Уоллис, тесты Тьюки и Данна)
+# вместо ячеек Sold_analysis_1.ipynb; графики статьи — analysis/article_1_16.03.25.
+
+# Ценовые категории (classify_price из ноутбука): цена <= 10, <= 24.99, <= 400, дороже
+PRICE_CATEGORY_EDGES = [10, 24.99, 400]
+PRICE_CATEGORY_LABELS = ['0-10', '10.1-24.99', '25-400', '400+']
+
+# Группы длины (classify_length_group): 4-10 по отдельности, 11-32 вместе.
+# В ANOVA ноутбука 4-символьные имена не входят — они продаются на аукционах отдельно от остальных.
+LENGTH_GROUP_LABELS = ['4', '5', '6', '7', '8', '9', '10', '11-32']
+ANOVA_LENGTH_GROUPS = LENGTH_GROUP_LABELS[1:]
+UNCLEAN_LABEL = 'Нечистые'
+
+# Порог цены по умолчанию — начальное значение слайдера в ноутбуке
+MAX_PRICE = 100
+ALPHA = 0.05
+
+# Число бутстреп-выборок и перестановок
+N_RESAMPLES = 2000
+N_PERMUTATIONS = 2000
+
+# Сколько элементов (выборок x строк) держать в памяти за один пакет бутстрепа/перестановок
+BATCH_ELEMENTS = 5_000_000
+
+# Процессы для бутстрепа и перестановок; меньше MIN_PARALLEL_ROWS строк — считаем в текущем процессе
+WORKERS = os.cpu_count() or 1
+MIN_PARALLEL_ROWS = 50_000
+
+# Результаты кэшируются на диске по версии данных (число строк и последний id в sold_usernames)
+CACHE_DIR = os.path.join("cache", "price_stats")
+
+GroupComparison = namedtuple(
+    "GroupComparison", ["groups", "anova", "kruskal", "permutation", "tukey", "dunn", "version"]
+)
+
+
+def classify_prices(prices):
+    """Ценовая категория для массива цен (векторный аналог classify_price)"""
+    index = np.searchsorted(PRICE_CATEGORY_EDGES, np.asarray(prices, dtype=np.float64), side='left')
+    return np.array(PRICE_CATEGORY_LABELS, dtype=object)[index]
+
+
+def length_groups(name_length):
+    """Группа длины имени: '4'...'10' или '11-32'"""
+    index = np.clip(np.asarray(name_length, dtype=np.int64), 4, 11) - 4
+    return np.array(LENGTH_GROUP_LABELS, dtype=object)[index]
+
+
+def encode(labels, order):
+    """Метки групп -> коды 0..k-1 в порядке order; метки вне order получают -1"""
+    return pd.Index(order).get_indexer(np.asarray(labels, dtype=object)).astype(np.int64)
+
+
+def group_moments(values, codes, k):
+    """Размер, среднее и сумма квадратов отклонений каждой группы за два прохода bincount"""
+    n = np.bincount(codes, minlength=k)
+    means = np.bincount(codes, weights=values, minlength=k) / np.maximum(n, 1)
+    squares = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=k)
+    return n, means, squares
+
+
+def anova(values, codes, k):
+    """Однофакторный дисперсионный анализ: (F, p, средний квадрат внутри групп)"""
+    n, means, squares = group_moments(values, codes, k)
+    total = len(values)
+    between = np.sum(n * (means - values.mean()) ** 2)
+    within = squares.sum()
+    ms_within = within / (total - k)
+    f = between / (k - 1) / ms_within
+    return f, stats.f.sf(f, k - 1, total - k), ms_within
+
+
+def tie_sum(values):
+    """Сумма t^3 - t по группам одинаковых значений (поправка на совпадения рангов)"""
+    _, counts = np.unique(values, return_counts=True)
+    counts = counts.astype(np.float64)
+    return np.sum(counts ** 3 - counts)
+
+
+def kruskal(ranks, codes, k, ties):
+    """Тест Краскела-Уоллиса по готовым рангам"""
+    total = len(ranks)
+    n = np.bincount(codes, minlength=k)
+    rank_sums = np.bincount(codes, weights=ranks, minlength=k)
+    h = 12 / (total * (total + 1)) * np.sum(rank_sums ** 2 / n) - 3 * (total + 1)
+    h /= 1 - ties / (total ** 3 - total)
+    return h, stats.chi2.sf(h, k - 1)
+
+
+def holm(p_values):
+    """Поправка Холма на множественные сравнения"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate(p_values[order] * (len(p_values) - np.arange(len(p_values))))
+    result = np.empty_like(adjusted)
+    result[order] = np.minimum(adjusted, 1)
+    return result
+
+
+def tukey_hsd(n, means, ms_within, total, order, alpha=ALPHA):
+    """Тест Тьюки-Крамера для всех пар групп (как pairwise_tukeyhsd)"""
+    k = len(order)
+    q_critical = stats.studentized_range.ppf(1 - alpha, k, total - k)
+    rows = []
+    for i, j in combinations(range(k), 2):
+        diff = means[j] - means[i]
+        se = np.sqrt(ms_within / 2 * (1 / n[i] + 1 / n[j]))
+        p = stats.studentized_range.sf(abs(diff) / se, k, total - k)
+        rows.append((order[i], order[j], diff, p, diff - q_critical * se, diff + q_critical * se, p < alpha))
+    return pd.DataFrame(rows, columns=["group1", "group2", "meandiff", "p_adj", "lower", "upper", "reject"])
+
+
+def dunn(ranks, codes, k, ties, order, alpha=ALPHA):
+    """Тест Данна с поправкой Холма (как posthoc_dunn(p_adjust='holm'))"""
+    total = len(ranks)
+    n = np.bincount(codes, minlength=k)
+    mean_ranks = np.bincount(codes, weights=ranks, minlength=k) / n
+    variance = total * (total + 1) / 12 - ties / (12 * (total - 1))
+    pairs = list(combinations(range(k), 2))
+    z = np.array([
+        abs(mean_ranks[i] - mean_ranks[j]) / np.sqrt(variance * (1 / n[i] + 1 / n[j])) for i, j in pairs
+    ])
+    p = holm(2 * stats.norm.sf(z))
+    return pd.DataFrame({
+        "group1": [order[i] for i, _ in pairs],
+        "group2": [order[j] for _, j in pairs],
+        "z": z,
+        "p_adj": p,
+        "reject": p < alpha,
+    })
+
+
+# Данные, общие для задач одного процесса пула: передаются один раз при запуске процесса
+_worker_data = {}
+
+# Цены повторяются (в основном целые), поэтому выборки строятся по таблице уникальных значений:
+# бутстреп — мультиномиальные частоты, перестановка — многомерное гипергеометрическое распределение.
+# Распределения те же, что при выборке строк, но стоимость O(уникальных цен) вместо O(строк).
+# Если уникальных значений больше чем строк / COMPRESS_RATIO, выбираются сами строки.
+COMPRESS_RATIO = 4
+
+
+def _init_worker(values, codes, k):
+    _worker_data.update(values=values, codes=codes, k=k)
+
+
+def _bootstrap_task(count, seed):
+    """count бутстреп-выборок внутри каждой группы: массивы средних и медиан (count x k)"""
+    values, codes, k = _worker_data["values"], _worker_data["codes"], _worker_data["k"]
+    rng = np.random.default_rng(seed)
+    means = np.full((count, k), np.nan)
+    medians = np.full((count, k), np.nan)
+    for group in range(k):
+        sample = values[codes == group]
+        size = len(sample)
+        if not size:
+            continue
+        unique, frequency = np.unique(sample, return_counts=True)
+        compressed = len(unique) * COMPRESS_RATIO < size
+        batch = max(1, BATCH_ELEMENTS // (len(unique) if compressed else size))
+        for start in range(0, count, batch):
+            stop = min(start + batch, count)
+            if compressed:
+                draws = rng.multinomial(size, frequency / size, size=stop - start)
+                means[start:stop, group] = draws @ unique / size
+                # Медиана — среднее (size-1)//2-го и size//2-го значений отсортированной выборки
+                cumulative = np.cumsum(draws, axis=1)
+                low = unique[np.argmax(cumulative > (size - 1) // 2, axis=1)]
+                high = unique[np.argmax(cumulative > size // 2, axis=1)]
+                medians[start:stop, group] = (low + high) / 2
+            else:
+                resampled = sample[rng.integers(0, size, size=(stop - start, size))]
+                means[start:stop, group] = resampled.mean(axis=1)
+                medians[start:stop, group] = np.median(resampled, axis=1)
+    return means, medians
+
+
+def _permuted_sums(rng, count, values, codes, n, k):
+    """Суммы цен по группам для count перестановок меток: перестановка строк пакетами"""
+    total = len(values)
+    batch = max(1, BATCH_ELEMENTS // total)
+    sums = np.empty((count, k))
+    for start in range(0, count, batch):
+        stop = min(start + batch, count)
+        permuted = rng.permuted(np.broadcast_to(codes, (stop - start, total)), axis=1)
+        # Суммы групп всех перестановок пакета одним bincount: у каждой перестановки свои k корзин
+        permuted += np.arange(stop - start)[:, None] * k
+        sums[start:stop] = np.bincount(
+            permuted.ravel(), weights=np.tile(values, stop - start), minlength=(stop - start) * k
+        ).reshape(-1, k)
+    return sums
+
+
+def _hypergeometric_sums(rng, count, unique, frequency, n, k):
+    """Суммы цен по группам для count перестановок: группы по очереди забирают n[g] значений без возвращения"""
+    sums = np.empty((count, k))
+    for i in range(count):
+        remaining = frequency.copy()
+        for group in range(k - 1):
+            draw = rng.multivariate_hypergeometric(remaining, n[group], method="marginals")
+            sums[i, group] = draw @ unique
+            remaining -= draw
+        sums[i, k - 1] = remaining @ unique
+    return sums
+
+
+def _permutation_task(count, seed):
+    """F-статистика для count случайных перестановок меток групп"""
+    values, codes, k = _worker_data["values"], _worker_data["codes"], _worker_data["k"]
+    rng = np.random.default_rng(seed)
+    total = len(values)
+    n = np.bincount(codes, minlength=k)
+    grand = values.sum()
+    sst = np.sum((values - grand / total) ** 2)
+    unique, frequency = np.unique(values, return_counts=True)
+    if len(unique) * COMPRESS_RATIO < total:
+        sums = _hypergeometric_sums(rng, count, unique, frequency, n, k)
+    else:
+        sums = _permuted_sums(rng, count, values, codes, n, k)
+    ssb = np.sum(sums ** 2 / n, axis=1) - grand ** 2 / total
+    return ssb / (k - 1) / ((sst - ssb) / (total - k))
+
+
+def run_tasks(task, total, values, codes, k, workers, seed):
+    """total повторов task, разбитых между процессами; у каждого куска свой поток случайных чисел"""
+    workers = max(1, min(workers, total))
+    if workers == 1 or len(values) < MIN_PARALLEL_ROWS:
+        workers = 1
+    counts = [len(part) for part in np.array_split(np.arange(total), workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers == 1:
+        _init_worker(values, codes, k)
+        return [task(counts[0], seeds[0])]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(values, codes, k)) as pool:
+        return list(pool.map(task, counts, seeds))
+
+
+def compare_groups(values, labels, order, n_resamples=N_RESAMPLES, n_permutations=N_PERMUTATIONS,
+                   alpha=ALPHA, workers=WORKERS, seed=0, version=None):
+    """Сравнение цен между группами order: параметрические и ранговые тесты, бутстреп-интервалы средних
+    и медиан, перестановочный тест для F. Строки с метками вне order не учитываются."""
+    values = np.asarray(values, dtype=np.float64)
+    codes = encode(labels, order)
+    values, codes = values[codes >= 0], codes[codes >= 0]
+    k = len(order)
+
+    n, means, _ = group_moments(values, codes, k)
+    present = n > 0
+    if present.sum() < 2:
+        raise ValueError(f"Для сравнения нужно минимум две непустые группы, есть: {list(np.array(order)[present])}")
+    if not present.all():
+        # Пустые группы (например, при низком пороге цены) исключаются из тестов
+        order = [group for group, keep in zip(order, present) if keep]
+        codes = (np.cumsum(present) - 1)[codes]
+        k = len(order)
+        n, means, _ = group_moments(values, codes, k)
+
+    f, p_anova, ms_within = anova(values, codes, k)
+    ranks = stats.rankdata(values)
+    ties = tie_sum(values)
+    h, p_kruskal = kruskal(ranks, codes, k, ties)
+
+    boot_means, boot_medians = map(np.vstack, zip(*run_tasks(_bootstrap_task, n_resamples, values, codes, k,
+                                                             workers, seed)))
+    permuted_f = np.concatenate(run_tasks(_permutation_task, n_permutations, values, codes, k, workers, seed + 1))
+
+    order_index = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(n)[:-1]
+    medians = [np.median(part) for part in np.split(values[order_index], bounds)]
+    low, high = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    groups = pd.DataFrame({
+        "group": order,
+        "n": n,
+        "mean": means,
+        "mean_low": np.percentile(boot_means, low, axis=0),
+        "mean_high": np.percentile(boot_means, high, axis=0),
+        "median": medians,
+        "median_low": np.percentile(boot_medians, low, axis=0),
+        "median_high": np.percentile(boot_medians, high, axis=0),
+    })
+    return GroupComparison(
+        groups=groups,
+        anova={"F": f, "p": p_anova},
+        kruskal={"H": h, "p": p_kruskal},
+        permutation={"F": f, "p": (np.sum(permuted_f >= f) + 1) / (len(permuted_f) + 1),
+                     "n_permutations": len(permuted_f)},
+        tukey=tukey_hsd(n, means, ms_within, len(values), order, alpha),
+        dunn=dunn(ranks, codes, k, ties, order, alpha),
+        version=version,
+    )
+
+
+def load_sales(min_price=None, max_price=None, exclude_prices=()):
+    """Цена и признаки имени; фильтр по цене выполняется в базе, а не в pandas"""
+    conditions = ["price > 0"]
+    params = {}
+    if min_price is not None:
+        conditions.append("price >= %(min_price)s")
+        params["min_price"] = min_price
+    if max_price is not None:
+        conditions.append("price <= %(max_price)s")
+        params["max_price"] = max_price
+    if exclude_prices:
+        conditions.append("price <> ALL(%(exclude_prices)s)")
+        params["exclude_prices"] = list(exclude_prices)
+    query = f"""
+        SELECT price, name_length, digit_count, underscore_count
+        FROM public.sold_usernames
+        WHERE {' AND '.join(conditions)};
+    """
+    return queries.read(query, params, name="price_stats")
+
+
+def dataset_version():
+    """Версия данных для ключа кэша: меняется при любой вставке или удалении строк"""
+    row = queries.read(
+        "SELECT COUNT(*) AS rows, COALESCE(MAX(id), 0) AS max_id FROM public.sold_usernames", name="dataset_version"
+    ).iloc[0]
+    return f"{int(row['rows'])}-{int(row['max_id'])}"
+
+
+def cached(name, params, compute, cache_dir=CACHE_DIR):
+    """Результат compute(version) из кэша на диске; ключ — имя, параметры и версия данных"""
+    version = dataset_version()
+    key = hashlib.sha1(repr((name, sorted(params.items()), version)).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{name}-{key}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    result = compute(version)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump(result, f)
+    os.replace(temp_path, path)
+    logging.info(f"{name}: результат для версии данных {version} сохранен в {path}")
+    return result
+
+
+def length_effect(max_price=MAX_PRICE, exclude_prices=(), groups=ANOVA_LENGTH_GROUPS, **options):
+    """Влияние длины имени на цену (график length_ANOVA)"""
+    def compute(version):
+        data = load_sales(max_price=max_price, exclude_prices=exclude_prices)
+        return compare_groups(data["price"], length_groups(data["name_length"]), list(groups),
+                              version=version, **options)
+
+    params = {"max_price": max_price, "exclude_prices": tuple(exclude_prices), "groups": tuple(groups), **options}
+    return cached("length_effect", params, compute)
+
+
+def purity_effect(max_price=MAX_PRICE, exclude_prices=(), merge_unclean=False, **options):
+    """Влияние чистоты имени на цену (график purity_ANOVA); merge_unclean — только чистые против нечистых"""
+    def compute(version):
+        data = load_sales(max_price=max_price, exclude_prices=exclude_prices)
+        labels = classify_purity(data)
+        order = PURITY_LABELS
+        if merge_unclean:
+            labels = np.where(labels == PURITY_LABELS[0], PURITY_LABELS[0], UNCLEAN_LABEL)
+            order = [PURITY_LABELS[0], UNCLEAN_LABEL]
+        return compare_groups(data["price"], labels, list(order), version=version, **options)
+
+    params = {"max_price": max_price, "exclude_prices": tuple(exclude_prices), "merge_unclean": merge_unclean,
+              **options}
+    return cached("purity_effect", params, compute)
+
+
+def price_category_counts(min_length=4, max_length=32):
+    """Число продаж по длине имени и ценовой категории (график length_price): таблица длина x категория"""
+    def compute(version):
+        data = load_sales()
+        lengths = data["name_length"].to_numpy(dtype=np.int64)
+        keep = (lengths >= min_length) & (lengths <= max_length)
+        category = np.searchsorted(PRICE_CATEGORY_EDGES, data["price"].to_numpy(dtype=np.float64)[keep], side='left')
+        width = len(PRICE_CATEGORY_LABELS)
+        counts = np.bincount((lengths[keep] - min_length) * width + category,
+                             minlength=(max_length - min_length + 1) * width)
+        return pd.DataFrame(counts.reshape(-1, width), columns=PRICE_CATEGORY_LABELS,
+                            index=pd.RangeIndex(min_length, max_length + 1, name="name_length"))
+
+    return cached("price_category_counts", {"min_length": min_length, "max_length": max_length}, compute)
+
+
+def format_comparison(result):
+    """Текстовый отчет в духе вывода ноутбука"""
+    lines = ["Размер выборки и средние (95% бутстреп-интервал):"]
+    for row in result.groups.itertuples():
+        lines.append(f"  {row.group}: n = {row.n}, среднее = {row.mean:.2f} [{row.mean_low:.2f}; {row.mean_high:.2f}], "
+                     f"медиана = {row.median:.2f} [{row.median_low:.2f}; {row.median_high:.2f}]")
+    lines.append(f"ANOVA: F = {result.anova['F']:.4f}, p-value = {result.anova['p']:.4g}")
+    lines.append(f"Перестановочный тест ({result.permutation['n_permutations']} перестановок): "
+                 f"p-value = {result.permutation['p']:.4g}")
+    lines.append(f"Краскел-Уоллис: H = {result.kruskal['H']:.4f}, p-value = {result.kruskal['p']:.4g}")
+    lines.append("Тест Тьюки:")
+    lines.append(result.tukey.to_string(index=False))
+    lines.append("Тест Данна (поправка Холма):")
+    lines.append(result.dunn.to_string(index=False))
+    return "\n".join(lines)
+
+
+def plot_group_means(result, title, xlabel, path):
+    """Средние цены по группам с бутстреп-интервалами (аналог sns.pointplot из ноутбука)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    groups = result.groups
+    fig, ax = plt.subplots(figsize=(12, 8))
+    errors = [groups["mean"] - groups["mean_low"], groups["mean_high"] - groups["mean"]]
+    ax.errorbar(groups["group"], groups["mean"], yerr=errors, fmt="o-", color="blue", capsize=8)
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel(xlabel, fontsize=14)
+    ax.set_ylabel('Средняя цена', fontsize=14)
+    ax.tick_params(axis='both', labelsize=12)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def plot_category_counts(counts, path):
+    """Распределение имен по длине и ценовым категориям (сгруппированные столбцы)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    counts = counts[counts.sum(axis=1) > 0]
+    fig, ax = plt.subplots(figsize=(14, 6))
+    width = 0.8 / len(counts.columns)
+    colors = plt.cm.Blues(np.linspace(0.35, 0.95, len(counts.columns)))
+    positions = np.arange(len(counts))
+    for i, (category, color) in enumerate(zip(counts.columns, colors)):
+        ax.bar(positions + (i - (len(counts.columns) - 1) / 2) * width, counts[category], width,
+               label=category, color=color)
+    ax.set_xticks(positions, counts.index)
+    ax.set_title('Распределение имен по длине и ценовым категориям', fontsize=16)
+    ax.set_xlabel('Длина имени (символы)', fontsize=14)
+    ax.set_ylabel('Количество', fontsize=14)
+    ax.legend(title='Ценовая категория', bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main(args):
+    options = {"n_resamples": args.resamples, "n_permutations": args.permutations, "workers": args.workers}
+    length = length_effect(args.max_price, **options)
+    purity = purity_effect(args.max_price, **options)
+    print(f"Длина имени (цена <= {args.max_price}), версия данных {length.version}")
+    print(format_comparison(length))
+    print(f"\nЧистота имени (цена <= {args.max_price})")
+    print(format_comparison(purity))
+    if args.figures:
+        os.makedirs(args.figures, exist_ok=True)
+        plot_group_means(length, f'Сравнение средних цен (макс. цена ≤ {args.max_price})', 'Группа длины имени',
+                         os.path.join(args.figures, "length_ANOVA.png"))
+        plot_group_means(purity, f'Сравнение средних цен по чистоте имени (макс. цена ≤ {args.max_price})',
+                         'Категория имени', os.path.join(args.figures, "purity_ANOVA.png"))
+        plot_category_counts(price_category_counts(), os.path.join(args.figures, "length_price.png"))
+        print(f"\nГрафики сохранены в {args.figures}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Тесты влияния длины и чистоты имени на цену")
+    parser.add_argument("--max-price", type=float, default=MAX_PRICE, help="Верхняя граница цены")
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES, help="Число бутстреп-выборок")
+    parser.add_argument("--permutations", type=int, default=N_PERMUTATIONS, help="Число перестановок")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Процессов для бутстрепа и перестановок")
+    parser.add_argument("--figures", help="Каталог для графиков статьи (например, analysis/article_1_16.03.25)")
+    main(parser.parse_args())
@@ -0,0 +1,328 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from db_config import DB_URI
+from metrics import observe_sql, timed_query
+
+# Пул соединений: запросы одного взаимодействия с дашбордом выполняются параллельно (dashboard_data.py)
+POOL_SIZE = 8
+POOL_OVERFLOW = 4
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Подключение к базе создается при первом запросе, а не при импорте (SQLAlchemy грузится ~1 с)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                _engine = create_engine(DB_URI, pool_size=POOL_SIZE, max_overflow=POOL_OVERFLOW, pool_pre_ping=True)
+    return _engine
+
+
+def __getattr__(name):
+    # `from queries import engine` в скриптах продолжает работать
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Ценовые кластеры дашборда (границы совпадают с SQL-функцией price_cluster())
+PRICE_CLUSTERS = {
+    "0-25": (0, 25),
+    "25-75": (25, 75),
+    "75-400": (75, 400),
+    "400+": (400, None),
+    "all": (0, None)
+}
+
+# Интервал дневной статистики -> (таблица агрегатов, ее столбец времени, интервал по агрегатам, интервал по sale_date)
+STATS_BUCKETS = {
+    "hour": ("sales_hourly_rollup", "hour", "hour", "date_trunc('hour', sale_date)"),
+    "day": ("sales_daily_rollup", "day", "day", "sale_date::DATE"),
+    "week": ("sales_daily_rollup", "day", "date_trunc('week', day)::DATE", "date_trunc('week', sale_date)::DATE"),
+    "month": ("sales_daily_rollup", "day", "date_trunc('month', day)::DATE", "date_trunc('month', sale_date)::DATE"),
+}
+
+# Число бинов гистограммы цен
+HISTOGRAM_BINS = 100
+
+# Сколько последних предупреждений детектора аномалий показывать
+ALERTS_LIMIT = 50
+
+# Виды предупреждений детектора аномалий (anomaly_detector.py); здесь, чтобы дашборд не импортировал детектор
+ALERT_KINDS = {
+    "price": "Цена выше типичной",
+    "resale": "Перепродажа с накруткой",
+    "burst": "Всплеск продаж",
+}
+
+# Условия на чистоту имени: чистые — без цифр и подчеркиваний (генерируемый столбец is_clean)
+PURITY_PREDICATES = {
+    "clean": "is_clean",
+    "not_clean": "NOT is_clean",
+}
+
+
+def read(query, params=None, name="query"):
+    """Выполнение запроса дашборда; время SQL попадает в метрики и журнал медленных запросов"""
+    started = time.perf_counter()
+    df = pd.read_sql(query, get_engine(), params=params)
+    observe_sql(name, time.perf_counter() - started, query, params)
+    return df
+
+
+def date_predicates(column, start_date, end_date, params, day_column=False):
+    """Условия на диапазон дат (границы включительно, по дням) для индексного сканирования"""
+    predicates = []
+    if start_date is not None:
+        params["start_date"] = start_date
+        predicates.append(f"{column} >= %(start_date)s::DATE")
+    if end_date is not None:
+        params["end_date"] = end_date
+        if day_column:
+            predicates.append(f"{column} <= %(end_date)s::DATE")
+        else:
+            predicates.append(f"{column} < %(end_date)s::DATE + 1")
+    return predicates
+
+
+def sales_predicates(start_date=None, end_date=None, price_range=None, purity=None):
+    """WHERE-условия и параметры по sold_usernames: даты, диапазон цен, чистота имени"""
+    params = {}
+    predicates = date_predicates("sale_date", start_date, end_date, params)
+    if price_range is not None:
+        min_price, max_price = price_range
+        if min_price is not None:
+            params["min_price"] = min_price
+            predicates.append("price >= %(min_price)s")
+        if max_price is not None:
+            params["max_price"] = max_price
+            predicates.append("price < %(max_price)s")
+    if purity in PURITY_PREDICATES:
+        predicates.append(PURITY_PREDICATES[purity])
+    return " AND ".join(predicates) or "TRUE", params
+
+
+def daily_stats_query(start_date=None, end_date=None, price_cluster="all", price_range=None, purity=None,
+                      bucket="day"):
+    """Статистика продаж по интервалам STATS_BUCKETS (по умолчанию — по дням).
+
+    Из агрегатов, если фильтр совпадает с кластером, иначе по сырым данным.
+    """
+    table, time_column, rollup_bucket, sales_bucket = STATS_BUCKETS[bucket]
+    if price_range is None and purity in (None, "all"):
+        params = {"price_cluster": price_cluster}
+        predicates = date_predicates(time_column, start_date, end_date, params, day_column=time_column == "day")
+        if price_cluster != "all":
+            predicates.append("price_cluster = %(price_cluster)s")
+        where = " AND ".join(predicates) or "TRUE"
+        query = f"""
+            SELECT
+                {rollup_bucket} AS date,
+                SUM(sales_count) AS sales_count,
+                SUM(price_sum) / SUM(sales_count) AS average_price,
+                SUM(clean_price_sum) / NULLIF(SUM(clean_count), 0) AS avg_price_clean,
+                (SUM(price_sum) - SUM(clean_price_sum)) / NULLIF(SUM(sales_count) - SUM(clean_count), 0) AS avg_price_not_clean,
+                SUM(clean_count)::NUMERIC / SUM(sales_count) AS clean_ratio,
+                SUM(length_sum)::NUMERIC / SUM(sales_count) AS avg_name_length
+            FROM public.{table}
+            WHERE {where}
+            GROUP BY 1
+            ORDER BY 1;
+        """
+        return query, params
+
+    if price_range is None:
+        price_range = PRICE_CLUSTERS[price_cluster]
+    where, params = sales_predicates(start_date, end_date, price_range, purity)
+    query = f"""
+        SELECT
+            {sales_bucket} AS date,
+            COUNT(*) AS sales_count,
+            AVG(price) AS average_price,
+            AVG(CASE WHEN is_clean THEN price END) AS avg_price_clean,
+            AVG(CASE WHEN NOT is_clean THEN price END) AS avg_price_not_clean,
+            AVG(CASE WHEN is_clean THEN 1 ELSE 0 END) AS clean_ratio,
+            AVG(name_length) AS avg_name_length
+        FROM public.sold_usernames
+        WHERE {where}
+        GROUP BY 1
+        ORDER BY 1;
+    """
+    return query, params
+
+
+def histogram_upper(min_price, max_price):
+    """Верхняя граница бинов гистограммы: нулевой или пустой диапазон цен расширяется до 1 TON"""
+    return max_price if max_price > min_price else min_price + 1
+
+
+def price_histogram_query(start_date, end_date, min_price, max_price, bins=HISTOGRAM_BINS):
+    """Гистограмма цен за период: равные бины на [min_price, max_price], считаются в базе"""
+    where, params = sales_predicates(start_date, end_date)
+    params.update(min_price=min_price, max_price=max_price, upper=histogram_upper(min_price, max_price), bins=bins)
+    # Цена, равная max_price, попадает в последний бин, как в np.histogram;
+    # при min_price == max_price width_bucket получает расширенную границу (равные границы — ошибка)
+    query = f"""
+        SELECT
+            LEAST(width_bucket(price, %(min_price)s::NUMERIC, %(upper)s::NUMERIC, %(bins)s), %(bins)s) AS bucket,
+            COUNT(*) AS sales_count
+        FROM public.sold_usernames
+        WHERE {where}
+          AND price >= %(min_price)s::NUMERIC AND price <= %(max_price)s::NUMERIC
+        GROUP BY bucket
+        ORDER BY bucket;
+    """
+    return query, params
+
+
+def price_summary_query(start_date, end_date, min_price, max_price):
+    """Сводные метрики цен за период в диапазоне цен"""
+    where, params = sales_predicates(start_date, end_date)
+    params.update(min_price=min_price, max_price=max_price)
+    query = f"""
+        SELECT
+            COUNT(*) AS sample_size,
+            MIN(price) AS min_price,
+            MAX(price) AS max_price,
+            AVG(price) AS mean_price,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median_price,
+            STDDEV_SAMP(price) AS std_price,
+            percentile_cont(0.25) WITHIN GROUP (ORDER BY price) AS q1,
+            percentile_cont(0.75) WITHIN GROUP (ORDER BY price) AS q3,
+            SUM(price) AS total_revenue
+        FROM public.sold_usernames
+        WHERE {where}
+          AND price >= %(min_price)s::NUMERIC AND price <= %(max_price)s::NUMERIC;
+    """
+    return query, params
+
+
+def avg_length_by_cluster_query():
+    """Средняя длина имени по кластерам за всё время (из дневных агрегатов)"""
+    query = """
+        SELECT
+            price_cluster,
+            SUM(length_sum)::NUMERIC / SUM(sales_count) AS avg_length,
+            SUM(sales_count) AS total_count
+        FROM public.sales_daily_rollup
+        GROUP BY price_cluster
+        ORDER BY price_cluster;
+    """
+    return query, None
+
+
+def hourly_activity_query(start_date=None, end_date=None, timezone="UTC"):
+    """Продажи по дню недели (ISO, 1 = понедельник) и часу суток в заданном часовом поясе: не более 168 строк"""
+    params = {"timezone": timezone}
+    where = " AND ".join(date_predicates("hour", start_date, end_date, params)) or "TRUE"
+    # Агрегаты хранятся по часам UTC; перевод в локальное время — в базе
+    query = f"""
+        SELECT
+            EXTRACT(ISODOW FROM local_hour)::INT AS weekday,
+            EXTRACT(HOUR FROM local_hour)::INT AS hour_of_day,
+            SUM(sales_count) AS sales_count
+        FROM (
+            SELECT (hour AT TIME ZONE 'UTC') AT TIME ZONE %(timezone)s AS local_hour, sales_count
+            FROM public.sales_hourly_rollup
+            WHERE {where}
+        ) AS hourly
+        GROUP BY weekday, hour_of_day
+        ORDER BY weekday, hour_of_day;
+    """
+    return query, params
+
+
+def sales_after_query(after_id, limit):
+    """Продажи с id больше after_id по возрастанию id — дозагрузка новых строк для живого режима дашборда"""
+    query = """
+        SELECT id, price, sale_date, name_length, is_clean
+        FROM public.sold_usernames
+        WHERE id > %(after_id)s
+        ORDER BY id
+        LIMIT %(limit)s;
+    """
+    return query, {"after_id": int(after_id), "limit": int(limit)}
+
+
+def sale_alerts_query(start_date=None, end_date=None, kind=None, limit=ALERTS_LIMIT):
+    """Последние предупреждения детектора аномалий за период (sql/migrations/009_sale_alerts.sql)"""
+    params = {"limit": int(limit)}
+    predicates = date_predicates("sale_date", start_date, end_date, params)
+    if kind is not None:
+        params["kind"] = kind
+        predicates.append("kind = %(kind)s")
+    query = f"""
+        SELECT sale_id, kind, username, price, sale_date, price_cluster, length_bucket, score, baseline
+        FROM public.sale_alerts
+        WHERE {" AND ".join(predicates) or "TRUE"}
+        ORDER BY sale_date DESC, sale_id DESC
+        LIMIT %(limit)s;
+    """
+    return query, params
+
+
+@timed_query("sql")
+def get_daily_stats(start_date=None, end_date=None, price_cluster="all", price_range=None, purity=None,
+                    bucket="day"):
+    return read(*daily_stats_query(start_date, end_date, price_cluster, price_range, purity, bucket),
+                name="daily_stats")
+
+
+@timed_query("sql")
+def get_price_histogram(start_date, end_date, min_price, max_price, bins=HISTOGRAM_BINS):
+    """Границы бинов (bins + 1) и количество продаж в каждом бине"""
+    df = read(*price_histogram_query(start_date, end_date, min_price, max_price, bins), name="price_histogram")
+    edges = np.linspace(min_price, histogram_upper(min_price, max_price), bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    counts[df['bucket'].to_numpy(dtype=np.int64) - 1] = df['sales_count'].to_numpy()
+    return edges, counts
+
+
+@timed_query("sql")
+def get_price_summary(start_date, end_date, min_price, max_price):
+    return read(*price_summary_query(start_date, end_date, min_price, max_price), name="price_summary").iloc[0]
+
+
+@timed_query("sql")
+def get_avg_length_by_cluster():
+    return read(*avg_length_by_cluster_query(), name="avg_length_by_cluster")
+
+
+@timed_query("sql")
+def get_hourly_activity(start_date=None, end_date=None, timezone="UTC"):
+    return read(*hourly_activity_query(start_date, end_date, timezone), name="hourly_activity")
+
+
+@timed_query("sql")
+def get_sales_after(after_id, limit):
+    return read(*sales_after_query(after_id, limit), name="sales_after")
+
+
+@timed_query("sql")
+def get_sale_alerts(start_date=None, end_date=None, kind=None, limit=ALERTS_LIMIT):
+    return read(*sale_alerts_query(start_date, end_date, kind, limit), name="sale_alerts")
+
+
+def last_sale_id():
+    """Наибольший id в таблице продаж — курсор живого режима (не get_*: через кэш запросов не идет)"""
+    return int(read("SELECT COALESCE(MAX(id), 0) AS last_id FROM public.sold_usernames", name="last_sale_id")
+               ["last_id"].iloc[0])
+
+
+# Запросы дашборда с типичными параметрами — для проверки планов (benchmarks/explain_queries.py)
+DASHBOARD_QUERIES = {
+    "daily_stats_rollup": lambda start, end: daily_stats_query(start, end, "25-75"),
+    "daily_stats_filtered": lambda start, end: daily_stats_query(start, end, "all", (10, 1000), "clean"),
+    "daily_stats_hourly": lambda start, end: daily_stats_query(start, end, "25-75", bucket="hour"),
+    "daily_stats_weekly": lambda start, end: daily_stats_query(start, end, "all", (10, 1000), "clean", bucket="week"),
+    "price_histogram": lambda start, end: price_histogram_query(start, end, 1, 1000),
+    "hourly_activity": lambda start, end: hourly_activity_query(start, end, "Europe/Moscow"),
+    "sale_alerts": lambda start, end: sale_alerts_query(start, end),
+}
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import queries
+
+# Кэш результатов запросов дашборда. Ключ — метод и нормализованные параметры, значения
+# сбрасываются при смене версии данных (sql/migrations/008_data_version.sql), которую загрузчик
+# увеличивает после каждого пакета с новыми строками.
+
+# Объем результатов в памяти процесса (LRU) и срок жизни записи на случай, если версия не меняется
+CACHE_MAX_BYTES = int(os.environ.get("SOLD_QUERY_CACHE_MB", 256)) * 1024 * 1024
+CACHE_TTL = 600
+
+# Общий каталог на диске для нескольких процессов (gunicorn workers); не задан — только память
+CACHE_DIR = os.environ.get("SOLD_QUERY_CACHE_DIR")
+
+# Как часто (секунд) перечитывать версию данных из базы
+VERSION_CHECK_INTERVAL = 2
+
+# Дата из date-picker в любом виде ('2025-03-10', '2025-03-10T00:00:00') -> 'YYYY-MM-DD'
+DAY_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:[T ]00:00(?::00(?:\.0+)?)?)?$")
+
+# Каталоги версий внутри CACHE_DIR (v<версия>, vNone — без миграции 008); остальное в каталоге не трогаем
+VERSION_DIR_PATTERN = re.compile(r"^v(\d+|None)$")
+
+# Значащих цифр у дробных параметров (границы цены из логарифмического слайдера)
+FLOAT_DIGITS = 9
+
+
+def normalize(value):
+    """Параметр запроса -> хешируемое значение; равные по смыслу параметры дают равные ключи"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, float):
+        return float(f"{value:.{FLOAT_DIGITS}g}")
+    if isinstance(value, str):
+        match = DAY_PATTERN.match(value)
+        return match.group(1) if match else value
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return normalize(pd.Timestamp(value).isoformat())
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    return repr(value)
+
+
+def make_key(method, args, kwargs=None):
+    return (method, normalize(args), normalize(kwargs or {}))
+
+
+def load_data_version(name="sold_usernames"):
+    """Текущая версия данных; None, если миграция 008 не применена (тогда действует только CACHE_TTL)"""
+    try:
+        df = queries.read("SELECT version FROM data_version WHERE name = %(name)s", {"name": name},
+                          name="data_version")
+    except Exception as e:
+        logging.warning(f"Версия данных недоступна, кэш запросов сбрасывается только по сроку: {e}")
+        return None
+    return int(df["version"].iloc[0]) if len(df) else None
+
+
+class QueryCache:
+    """LRU-кэш результатов в памяти (не больше max_bytes) с необязательным общим каталогом на диске.
+
+    Результаты отдаются вызывающим как есть, без копирования, — изменять их нельзя.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, directory=CACHE_DIR,
+                 version_interval=VERSION_CHECK_INTERVAL, load_version=load_data_version):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.version_interval = version_interval
+        self.load_version = load_version
+        self.lock = threading.Lock()
+        # Проверка версии под отдельной блокировкой: параллельные запросы одного взаимодействия ждут,
+        # пока версия перечитывается, и не получают записи прежней версии
+        self.version_lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.current_version = None
+        self.version_checked = None
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def version(self):
+        """Версия данных, перечитывается из базы не чаще раза в version_interval секунд"""
+        with self.version_lock:
+            now = time.monotonic()
+            if self.version_checked is not None and now - self.version_checked < self.version_interval:
+                return self.current_version
+            version = self.load_version()
+            with self.lock:
+                if version != self.current_version:
+                    # Все записи относятся к прежней версии: освобождаем память сразу, а не по LRU
+                    self.entries.clear()
+                    self.bytes = 0
+                    previous, self.current_version = self.current_version, version
+                else:
+                    previous = version
+            self.version_checked = now
+        if previous != version:
+            self._remove_stale_dirs(version)
+        return version
+
+    def get(self, key, compute):
+        """Результат из памяти, с диска или compute(), сохраненный для следующих вызовов"""
+        version = self.version()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            # Запись могла быть сохранена запросом, начатым при прежней версии, уже после сброса
+            if entry is not None and entry[3] == version and now - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                metrics.QUERY_CACHE_REQUESTS.inc("hit")
+                return entry[1]
+
+        value = self._read_disk(key, version)
+        if value is not None:
+            self.disk_hits += 1
+            metrics.QUERY_CACHE_REQUESTS.inc("disk_hit")
+        else:
+            self.misses += 1
+            metrics.QUERY_CACHE_REQUESTS.inc("miss")
+            value = compute()
+            self._write_disk(key, version, value)
+        self._store(key, value, now, version)
+        return value
+
+    def _store(self, key, value, now, version):
+        size = metrics.result_size(value)[1]
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if version != self.current_version:
+                # Пока выполнялся запрос, версия сменилась: результат устарел
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self.entries[key] = (now, value, size, version)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted, _) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+                metrics.QUERY_CACHE_EVICTIONS.inc()
+
+    def _path(self, key, version):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"v{version}", f"{digest}.pkl")
+
+    def _read_disk(self, key, version):
+        if not self.directory:
+            return None
+        path = self._path(key, version)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if stored_key == key else None
+
+    def _write_disk(self, key, version, value):
+        if not self.directory:
+            return
+        path = self._path(key, version)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить результат запроса в {path}: {e}")
+
+    def _remove_stale_dirs(self, version):
+        """Удаление каталогов прежних версий (их мог уже удалить другой процесс).
+
+        Удаляются только каталоги вида v<версия>: CACHE_DIR может быть общим с другими кэшами.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name != f"v{version}" and VERSION_DIR_PATTERN.match(name):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def snapshot(self):
+        """Попадания, промахи и доля попаданий с начала работы процесса"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "version": self.current_version,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else None,
+            }
+
+
+class CachedSource:
+    """Источник данных дашборда (queries или ColumnStore), у которого get_* методы идут через кэш"""
+
+    def __init__(self, source, cache):
+        self.source = source
+        self.cache = cache
+
+    def __getattr__(self, name):
+        attribute = getattr(self.source, name)
+        if not name.startswith("get_") or not callable(attribute):
+            return attribute
+
+        def cached(*args, **kwargs):
+            return self.cache.get(make_key(name, args, kwargs), lambda: attribute(*args, **kwargs))
+        return cached
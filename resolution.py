@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# Разрешение графика продаж по времени: размер интервала выбирается по длине периода так, чтобы
+# столбцов было не больше BAR_POINTS. Линии (средняя цена, доля чистых) берутся с более мелким
+# интервалом и прореживаются LTTB до LINE_POINTS точек — пики цены не теряются при усреднении.
+
+# Интервалы от мелкого к крупному и их примерная длина (для выбора по длине периода)
+CHART_BUCKETS = {
+    "hour": pd.Timedelta(hours=1),
+    "day": pd.Timedelta(days=1),
+    "week": pd.Timedelta(days=7),
+    "month": pd.Timedelta(days=30.44),
+}
+
+# Подписи интервалов для заголовка графика
+BUCKET_TITLES = {"hour": "по часам", "day": "по дням", "week": "по неделям", "month": "по месяцам"}
+
+# Период интервала для plotly (xperiod): столбец и точка рисуются посередине своего интервала
+BUCKET_PERIODS = {"hour": 3_600_000, "day": 86_400_000, "week": 7 * 86_400_000, "month": "M1"}
+# Начало какого-нибудь интервала для plotly (xperiod0): по умолчанию это воскресенье 2000-01-02, а недели
+# date_trunc('week') начинаются с понедельника — без него недельные столбцы сдвинуты на полдня
+BUCKET_PERIOD_STARTS = {"hour": "2000-01-03", "day": "2000-01-03", "week": "2000-01-03", "month": "2000-01-01"}
+
+# Бюджет точек: столбцов, точек линии после прореживания и строк, из которых линия прореживается
+BAR_POINTS = 120
+LINE_POINTS = 400
+LINE_SOURCE_POINTS = 2000
+
+NS_PER_HOUR = 3_600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+def choose_bucket(start_date, end_date, max_points):
+    """Самый мелкий интервал, при котором за период (границы включительно) не больше max_points точек"""
+    span = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1) - pd.Timestamp(start_date).normalize()
+    for bucket, size in CHART_BUCKETS.items():
+        if span / size <= max_points:
+            return bucket
+    return bucket
+
+
+def chart_buckets(start_date, end_date):
+    """(интервал столбцов, интервал строк для линий); без границ периода — по дням, как раньше"""
+    if start_date is None or end_date is None:
+        return "day", "day"
+    return choose_bucket(start_date, end_date, BAR_POINTS), choose_bucket(start_date, end_date, LINE_SOURCE_POINTS)
+
+
+def truncate_ns(ts, bucket):
+    """Начало интервала для меток времени в наносекундах (int64), неделя — с понедельника, как date_trunc"""
+    if bucket == "hour":
+        return ts - ts % NS_PER_HOUR
+    if bucket == "day":
+        return ts - ts % NS_PER_DAY
+    if bucket == "week":
+        days = ts // NS_PER_DAY
+        return (days - (days + 3) % 7) * NS_PER_DAY  # 1970-01-01 — четверг
+    return ts.view('datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+
+
+def bucket_labels(values, bucket):
+    """Начала интервалов в виде строк — ключи строк статистики (так же их отдает JSON хранилища)"""
+    ts = truncate_ns(pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[ns]').view(np.int64), bucket)
+    return pd.Series(pd.to_datetime(ts).strftime('%Y-%m-%dT%H:%M:%S' if bucket == "hour" else '%Y-%m-%d'))
+
+
+def rebucket(df, bucket):
+    """Статистика (средние за интервал) -> та же статистика по более крупным интервалам"""
+    count = df['sales_count'].astype(np.float64)
+    clean_count = (df['clean_ratio'].astype(np.float64) * count).round()
+    sums = pd.DataFrame({
+        "date": bucket_labels(df['date'], bucket).to_numpy(),
+        "sales_count": count.to_numpy(),
+        "price_sum": (df['average_price'].astype(np.float64) * count).to_numpy(),
+        "clean_count": clean_count.to_numpy(),
+        "clean_price_sum": (df['avg_price_clean'].astype(np.float64).fillna(0) * clean_count).to_numpy(),
+        "length_sum": (df['avg_name_length'].astype(np.float64) * count).to_numpy(),
+    }).groupby("date", sort=True).sum()
+    count, clean_count = sums['sales_count'], sums['clean_count']
+    not_clean = count - clean_count
+    return pd.DataFrame({
+        "date": sums.index,
+        "sales_count": count.to_numpy(),
+        "average_price": (sums['price_sum'] / count).to_numpy(),
+        "avg_price_clean": (sums['clean_price_sum'] / clean_count.where(clean_count > 0)).to_numpy(),
+        "avg_price_not_clean": ((sums['price_sum'] - sums['clean_price_sum']) / not_clean.where(not_clean > 0)).to_numpy(),
+        "clean_ratio": (clean_count / count).to_numpy(),
+        "avg_name_length": (sums['length_sum'] / count).to_numpy(),
+    })
+
+
+def lttb(x, y, points):
+    """Индексы точек, которые оставляет Largest-Triangle-Three-Buckets (первая и последняя — всегда).
+
+    x — возрастающие числа, y — без пропусков. Ряд делится на points - 2 корзины, из каждой берется точка,
+    образующая наибольший треугольник с выбранной точкой предыдущей корзины и средним следующей.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous])
+                      - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(x, y, points=LINE_POINTS):
+    """Линия (метки времени, значения) не длиннее points точек; пропуски (None) отбрасываются"""
+    x = pd.to_datetime(pd.Series(x))
+    y = pd.Series(y, dtype=np.float64)
+    present = y.notna().to_numpy()
+    x, y = x[present], y[present]
+    index = lttb(x.to_numpy(dtype='datetime64[ns]').view(np.int64), y.to_numpy(), points)
+    return x.iloc[index], y.iloc[index]
@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import logging
+
+import asyncpg
+
+from db_config import DB_CONFIG
+
+# Гранулярность агрегатов: таблица -> (ключ времени, выражение от sale_date)
+ROLLUP_TABLES = {
+    "sales_daily_rollup": ("day", "sale_date::DATE"),
+    "sales_hourly_rollup": ("hour", "date_trunc('hour', sale_date)"),
+}
+
+# Инкрементальное обновление агрегатов строками из source (price, sale_date, name_length, is_clean)
+UPSERT_SQL = """
+    INSERT INTO {table} ({key}, price_cluster, sales_count, price_sum, clean_count, clean_price_sum, length_sum)
+    SELECT
+        {bucket} AS {key},
+        price_cluster(price),
+        COUNT(*),
+        SUM(price),
+        COUNT(*) FILTER (WHERE is_clean),
+        COALESCE(SUM(price) FILTER (WHERE is_clean), 0),
+        SUM(name_length)
+    FROM {source}
+    WHERE price >= 0
+    GROUP BY 1, 2
+    ON CONFLICT ({key}, price_cluster) DO UPDATE SET
+        sales_count = {table}.sales_count + EXCLUDED.sales_count,
+        price_sum = {table}.price_sum + EXCLUDED.price_sum,
+        clean_count = {table}.clean_count + EXCLUDED.clean_count,
+        clean_price_sum = {table}.clean_price_sum + EXCLUDED.clean_price_sum,
+        length_sum = {table}.length_sum + EXCLUDED.length_sum
+"""
+
+
+async def bump_data_version(conn, name="sold_usernames"):
+    """Новая версия данных (sql/migrations/008_data_version.sql): кэш дашборда перестает отдавать старые результаты.
+
+    Для таблиц без строки в data_version (замеры на отдельных таблицах) ничего не делает.
+    """
+    await conn.execute(
+        "UPDATE data_version SET version = version + 1, updated_at = now() WHERE name = $1", name
+    )
+
+
+async def update_rollups(conn, source):
+    """Добавление к агрегатам строк из таблицы source (например, только что вставленных)"""
+    for table, (key, bucket) in ROLLUP_TABLES.items():
+        await conn.execute(UPSERT_SQL.format(table=table, key=key, bucket=bucket, source=source))
+
+
+async def rebuild_rollups(conn):
+    """Полный пересчет агрегатов по sold_usernames (после бэкфилла или ручных правок)"""
+    async with conn.transaction():
+        await conn.execute(f"TRUNCATE {', '.join(ROLLUP_TABLES)}")
+        await update_rollups(conn, "sold_usernames")
+        await bump_data_version(conn)
+
+
+async def main(args):
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        if args.rebuild:
+            await rebuild_rollups(conn)
+            logging.info("Агрегаты продаж пересчитаны.")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание агрегатов продаж для дашборда")
+    parser.add_argument("--rebuild", action="store_true", help="Пересчитать агрегаты по всей истории")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,8 @@
+-- Идентификаторы раньше выдавались в приложении через MAX(id) + 1, поэтому последовательность
+-- SERIAL отстала от данных. Выравниваем ее, чтобы id снова генерировались сервером.
+SELECT setval(
+    pg_get_serial_sequence('sold_usernames', 'id'),
+    COALESCE(MAX(id), 0) + 1,
+    false
+)
+FROM sold_usernames;
@@ -0,0 +1,7 @@
+-- Водяной знак демона загрузки: последняя сохраненная продажа ленты
+CREATE TABLE IF NOT EXISTS ingest_state (
+    feed VARCHAR(255) PRIMARY KEY,
+    last_sale_date TIMESTAMP NOT NULL,
+    last_username VARCHAR(255) NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
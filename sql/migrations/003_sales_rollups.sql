@@ -0,0 +1,62 @@
+-- Ценовые кластеры дашборда (границы совпадают с PRICE_CLUSTERS в web_app.py)
+CREATE OR REPLACE FUNCTION price_cluster(price NUMERIC) RETURNS VARCHAR
+LANGUAGE SQL IMMUTABLE AS $$
+    SELECT CASE
+        WHEN price < 25 THEN '0-25'
+        WHEN price < 75 THEN '25-75'
+        WHEN price < 400 THEN '75-400'
+        ELSE '400+'
+    END
+$$;
+
+-- Агрегаты продаж по дням и часам в разрезе ценового кластера.
+-- Средние значения дашборда считаются как суммы, деленные на количество.
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    day DATE NOT NULL,
+    price_cluster VARCHAR(16) NOT NULL,
+    sales_count BIGINT NOT NULL,
+    price_sum NUMERIC NOT NULL,
+    clean_count BIGINT NOT NULL,
+    clean_price_sum NUMERIC NOT NULL,
+    length_sum BIGINT NOT NULL,
+    PRIMARY KEY (day, price_cluster)
+);
+
+CREATE TABLE IF NOT EXISTS sales_hourly_rollup (
+    hour TIMESTAMP NOT NULL,
+    price_cluster VARCHAR(16) NOT NULL,
+    sales_count BIGINT NOT NULL,
+    price_sum NUMERIC NOT NULL,
+    clean_count BIGINT NOT NULL,
+    clean_price_sum NUMERIC NOT NULL,
+    length_sum BIGINT NOT NULL,
+    PRIMARY KEY (hour, price_cluster)
+);
+
+-- Первичное заполнение по существующей истории (дальше агрегаты ведет загрузчик,
+-- полный пересчет: python rollups.py --rebuild)
+INSERT INTO sales_daily_rollup
+SELECT
+    sale_date::DATE,
+    price_cluster(price),
+    COUNT(*),
+    SUM(price),
+    COUNT(*) FILTER (WHERE username !~ '[0-9_]'),
+    COALESCE(SUM(price) FILTER (WHERE username !~ '[0-9_]'), 0),
+    SUM(LENGTH(username))
+FROM sold_usernames
+WHERE price >= 0
+GROUP BY 1, 2;
+
+INSERT INTO sales_hourly_rollup
+SELECT
+    date_trunc('hour', sale_date),
+    price_cluster(price),
+    COUNT(*),
+    SUM(price),
+    COUNT(*) FILTER (WHERE username !~ '[0-9_]'),
+    COALESCE(SUM(price) FILTER (WHERE username !~ '[0-9_]'), 0),
+    SUM(LENGTH(username))
+FROM sold_usernames
+WHERE price >= 0
+GROUP BY 1, 2;
@@ -0,0 +1,8 @@
+-- Индексы под фильтры дашборда (queries.py): диапазон дат, диапазон цен и их сочетание.
+-- Составной индекс покрывает и запросы только по sale_date; INCLUDE (username) позволяет
+-- считать чистоту и длину имени без обращения к таблице (index-only scan).
+CREATE INDEX IF NOT EXISTS sold_usernames_sale_date_price_idx
+    ON sold_usernames (sale_date, price) INCLUDE (username);
+
+CREATE INDEX IF NOT EXISTS sold_usernames_price_idx
+    ON sold_usernames (price);
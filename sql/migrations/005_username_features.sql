@@ -0,0 +1,35 @@
+-- Признаки имени как генерируемые столбцы: считаются при каждой вставке (в том числе
+-- из upload_to_db.py) и заполняются для существующих строк при добавлении столбцов.
+-- Определения совпадают с username_features.compute_features().
+ALTER TABLE sold_usernames
+    ADD COLUMN name_length SMALLINT
+        GENERATED ALWAYS AS (length(username)) STORED,
+    ADD COLUMN is_clean BOOLEAN
+        GENERATED ALWAYS AS (username !~ '[0-9_]') STORED,
+    ADD COLUMN digit_count SMALLINT
+        GENERATED ALWAYS AS (length(username) - length(translate(username, '0123456789', ''))) STORED,
+    ADD COLUMN underscore_count SMALLINT
+        GENERATED ALWAYS AS (length(username) - length(replace(username, '_', ''))) STORED,
+    ADD COLUMN name_pattern VARCHAR(255)
+        GENERATED ALWAYS AS (translate(
+            lower(username),
+            'aeioubcdfghjklmnpqrstvwxyz0123456789',
+            'vvvvvcccccccccccccccccccccdddddddddd'
+        )) STORED,
+    ADD COLUMN length_bucket VARCHAR(8)
+        GENERATED ALWAYS AS (CASE
+            WHEN length(username) <= 4 THEN '4'
+            WHEN length(username) <= 9 THEN length(username)::TEXT
+            WHEN length(username) <= 11 THEN '10-11'
+            WHEN length(username) <= 14 THEN '12-14'
+            WHEN length(username) <= 21 THEN '15-21'
+            ELSE '22-32'
+        END) STORED;
+
+CREATE INDEX IF NOT EXISTS sold_usernames_length_clean_idx
+    ON sold_usernames (name_length, is_clean);
+
+-- Покрывающий индекс дашборда теперь несет признаки вместо самого имени
+DROP INDEX IF EXISTS sold_usernames_sale_date_price_idx;
+CREATE INDEX sold_usernames_sale_date_price_idx
+    ON sold_usernames (sale_date, price) INCLUDE (is_clean, name_length);
@@ -0,0 +1,101 @@
+-- sold_usernames становится таблицей с помесячными разделами по sale_date: запросы дашборда
+-- за период читают только разделы своих месяцев (partition pruning).
+-- Уникальные ограничения секционированной таблицы обязаны включать ключ разделения,
+-- поэтому ключи теперь (id, sale_date) и (username, sale_date): имя уникально в пределах
+-- момента продажи, как и ожидает слияние в upload_to_db.insert_batch().
+
+ALTER TABLE sold_usernames RENAME TO sold_usernames_heap;
+ALTER TABLE sold_usernames_heap RENAME CONSTRAINT sold_usernames_pkey TO sold_usernames_heap_pkey;
+ALTER TABLE sold_usernames_heap RENAME CONSTRAINT unique_username TO sold_usernames_heap_username_key;
+ALTER SEQUENCE sold_usernames_id_seq OWNED BY NONE;
+
+CREATE TABLE sold_usernames (
+    id INTEGER NOT NULL DEFAULT nextval('sold_usernames_id_seq'),
+    username VARCHAR(255) NOT NULL,
+    price NUMERIC NOT NULL,
+    sale_date TIMESTAMP NOT NULL,
+    -- Признаки имени (см. 005_username_features.sql)
+    name_length SMALLINT
+        GENERATED ALWAYS AS (length(username)) STORED,
+    is_clean BOOLEAN
+        GENERATED ALWAYS AS (username !~ '[0-9_]') STORED,
+    digit_count SMALLINT
+        GENERATED ALWAYS AS (length(username) - length(translate(username, '0123456789', ''))) STORED,
+    underscore_count SMALLINT
+        GENERATED ALWAYS AS (length(username) - length(replace(username, '_', ''))) STORED,
+    name_pattern VARCHAR(255)
+        GENERATED ALWAYS AS (translate(
+            lower(username),
+            'aeioubcdfghjklmnpqrstvwxyz0123456789',
+            'vvvvvcccccccccccccccccccccdddddddddd'
+        )) STORED,
+    length_bucket VARCHAR(8)
+        GENERATED ALWAYS AS (CASE
+            WHEN length(username) <= 4 THEN '4'
+            WHEN length(username) <= 9 THEN length(username)::TEXT
+            WHEN length(username) <= 11 THEN '10-11'
+            WHEN length(username) <= 14 THEN '12-14'
+            WHEN length(username) <= 21 THEN '15-21'
+            ELSE '22-32'
+        END) STORED,
+    CONSTRAINT sold_usernames_pkey PRIMARY KEY (id, sale_date),
+    CONSTRAINT unique_username_sale_date UNIQUE (username, sale_date)
+) PARTITION BY RANGE (sale_date);
+
+ALTER SEQUENCE sold_usernames_id_seq OWNED BY sold_usernames.id;
+
+-- Создание недостающих месячных разделов sold_usernames_pYYYY_MM на отрезке [from_date, to_date].
+-- Вызывается из пути загрузки перед каждой вставкой; параллельные вызовы сериализуются
+-- advisory-блокировкой. Возвращает число созданных разделов.
+CREATE OR REPLACE FUNCTION ensure_sold_partitions(from_date TIMESTAMP, to_date TIMESTAMP)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', from_date);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        partition_name := 'sold_usernames_p' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            PERFORM pg_advisory_xact_lock(hashtext('sold_usernames_partitions'));
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF sold_usernames FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + INTERVAL '1 month'
+                );
+                created := created + 1;
+            END IF;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Разделы на всю историю и на месяц вперед
+SELECT ensure_sold_partitions(COALESCE(MIN(sale_date), now()::TIMESTAMP), now()::TIMESTAMP + INTERVAL '1 month')
+FROM sold_usernames_heap;
+
+INSERT INTO sold_usernames (id, username, price, sale_date)
+SELECT id, username, price, sale_date
+FROM sold_usernames_heap
+ORDER BY sale_date;
+
+DROP TABLE sold_usernames_heap;
+
+-- Индексы создаются на родительской таблице и наследуются каждым разделом.
+-- BRIN по sale_date занимает несколько страниц на раздел: строки приходят в порядке времени,
+-- поэтому диапазоны блоков почти не пересекаются. B-tree остаются для узких окон и покрытия.
+CREATE INDEX sold_usernames_sale_date_brin
+    ON sold_usernames USING brin (sale_date);
+
+CREATE INDEX sold_usernames_sale_date_price_idx
+    ON sold_usernames (sale_date, price) INCLUDE (is_clean, name_length);
+
+CREATE INDEX sold_usernames_price_idx
+    ON sold_usernames (price);
+
+CREATE INDEX sold_usernames_length_clean_idx
+    ON sold_usernames (name_length, is_clean);
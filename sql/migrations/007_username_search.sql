@@ -0,0 +1,29 @@
+-- Поиск имени и история его перепродаж.
+-- После 006 ключ продажи — (username, sale_date): одно имя может продаваться много раз,
+-- история имени читается по индексу unique_username_sale_date.
+
+-- Поиск по префиксу (username LIKE 'abc%') при любой сортировке базы
+CREATE INDEX sold_usernames_username_pattern_idx
+    ON sold_usernames (username varchar_pattern_ops);
+
+-- Подстрока и нечеткий поиск — триграммный индекс pg_trgm. Если расширение не установлено
+-- на сервере, миграция проходит без индекса, а поиск по подстроке работает перебором
+-- (username_search.py) и цель по задержке для нее не выполняется на больших таблицах;
+-- после установки pg_trgm этот блок можно выполнить повторно.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS sold_usernames_username_trgm_idx
+            ON sold_usernames USING gin (username gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm is not available: username search runs without a trigram index';
+    END IF;
+END
+$$;
+
+-- Сопоставимые продажи: та же длина и чистота, последние по времени.
+-- sale_date и price в индексе — последние N продаж и перцентили за период читаются только из индекса.
+DROP INDEX sold_usernames_length_clean_idx;
+CREATE INDEX sold_usernames_length_clean_idx
+    ON sold_usernames (name_length, is_clean, sale_date) INCLUDE (price);
@@ -0,0 +1,10 @@
+-- Версия данных: загрузчик увеличивает ее в транзакции каждого пакета, в котором есть новые строки
+-- (upload_to_db.insert_batch), и при полном пересчете агрегатов. Дашборд сбрасывает по ней
+-- кэш результатов запросов (query_cache.py).
+CREATE TABLE IF NOT EXISTS data_version (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+INSERT INTO data_version (name) VALUES ('sold_usernames') ON CONFLICT DO NOTHING;
@@ -0,0 +1,21 @@
+-- Подозрительные продажи, найденные детектором на пути загрузки (anomaly_detector.py):
+-- price — цена выше типичной для группы "длина x прошлый кластер имени", resale — перепродажа имени с накруткой,
+-- burst — всплеск числа продаж группы. Полный пересчет: python anomaly_detector.py --rebuild
+CREATE TABLE IF NOT EXISTS sale_alerts (
+    sale_id INTEGER NOT NULL,
+    kind VARCHAR(16) NOT NULL,
+    username VARCHAR(255) NOT NULL,
+    price NUMERIC NOT NULL,
+    sale_date TIMESTAMP NOT NULL,
+    price_cluster VARCHAR(16) NOT NULL,
+    length_bucket VARCHAR(8) NOT NULL,
+    -- Во сколько раз отклонение больше нормы (робастный z, отношение цен или частот)
+    score DOUBLE PRECISION NOT NULL,
+    -- С чем сравнивали: типичная цена группы, прошлая цена имени или ожидаемое число продаж
+    baseline DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (sale_id, kind)
+);
+
+-- Дашборд показывает последние предупреждения за выбранный период
+CREATE INDEX IF NOT EXISTS sale_alerts_sale_date_idx ON sale_alerts (sale_date DESC);
@@ -1,9 +1,17 @@
 import requests
-from bs4 import BeautifulSoup
+import argparse
 import asyncio
 import asyncpg
-from datetime import datetime
 import logging
+import time
+from functools import partial
+
+from anomaly_detector import AnomalyDetector, record_alerts, warm_up
+from db_config import DB_CONFIG
+from extractors import available_extractors, get_extractor
+from fetcher import fetch_sold_rows, DEFAULT_CONCURRENCY, DEFAULT_MAX_PAGES
+from metrics import observe_phase
+from rollups import bump_data_version, update_rollups
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -16,6 +24,17 @@ headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
 }
 
+# Глубина истории, по которой ищем уже известные продажи при обходе ленты
+KNOWN_KEYS_WINDOW = "1 day"
+
+# Функция для разбора HTML-страницы ленты
+def parse_html(content, extractor=None):
+    """Строки (username, price, datetime) в порядке ленты; движок разбора — из extractors"""
+    started = time.perf_counter()
+    rows = get_extractor(extractor)(content)
+    observe_phase("parse", time.perf_counter() - started, rows=len(rows), size=len(content))
+    return rows
+
 # Функция для парсинга данных
 def parse_data():
     logging.info("Начало парсинга данных.")
@@ -27,59 +46,11 @@ def parse_data():
         logging.error(f"Ошибка при загрузке страницы: {response.status_code}")
         exit()
 
-    # Разбираем HTML с помощью BeautifulSoup
-    soup = BeautifulSoup(response.content, "html.parser")
-
-    # Списки для хранения данных
-    usernames = []
-    prices = []
-    datetimes = []
-
-    # Находим все строки таблицы с данными
-    rows = soup.find_all("tr", class_="tm-row-selectable")
-
-    for row in rows:
-        # Извлекаем юзернейм
-        username_element = row.find("div", class_="table-cell-value tm-value")
-        if username_element:
-            username = username_element.text.strip()
-            # Удаляем символ @ из начала имени
-            username = username.lstrip('@')
-        else:
-            username = None
-            logging.warning("Юзернейм не найден в строке.")
-
-        # Извлекаем цену
-        price_element = row.find("div", class_="table-cell-value tm-value icon-before icon-ton")
-        if price_element:
-            price = price_element.text.strip()
-        else:
-            price = None
-            logging.warning("Цена не найдена в строке.")
-
-        # Извлекаем дату и время
-        time_element = row.find("time")
-        if time_element and time_element.has_attr("datetime"):
-            datetime_str = time_element["datetime"]
-            # Преобразуем строку в объект datetime
-            try:
-                datetime_obj = datetime.fromisoformat(datetime_str)
-                # Удаляем информацию о временной зоне (делаем timezone-naive)
-                datetime_obj = datetime_obj.replace(tzinfo=None)
-            except ValueError:
-                logging.error(f"Невозможно преобразовать дату: {datetime_str}")
-                datetime_obj = None
-        else:
-            datetime_obj = None
-            logging.warning("Дата и время не найдены в строке.")
-
-        # Добавляем данные в списки, если все элементы найдены
-        if username and price and datetime_obj:
-            usernames.append(username)
-            prices.append(price)
-            datetimes.append(datetime_obj)
-        else:
-            logging.warning("Пропущена строка из-за отсутствия данных.")
+    usernames, prices, datetimes = [], [], []
+    for username, price, datetime_obj in parse_html(response.content):
+        usernames.append(username)
+        prices.append(price)
+        datetimes.append(datetime_obj)
 
     logging.info(f"Парсинг завершен. Найдено {len(usernames)} записей.")
     return usernames, prices, datetimes
@@ -94,41 +65,115 @@ def clean_price(price):
         logging.warning(f"Некорректное значение цены: {price}")
         return None  # Возвращаем None для некорректных значений
 
+# Создание пула соединений с PostgreSQL
+async def create_pool(min_size=1, max_size=10, dsn=None):
+    if dsn:
+        return await asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size)
+    return await asyncpg.create_pool(**DB_CONFIG, min_size=min_size, max_size=max_size)
+
+# Загрузка ключей (username, sale_date) последних продаж для остановки обхода ленты
+async def load_known_keys():
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        records = await conn.fetch(
+            f"""
+            SELECT username, sale_date
+            FROM sold_usernames
+            WHERE sale_date >= (SELECT MAX(sale_date) FROM sold_usernames) - INTERVAL '{KNOWN_KEYS_WINDOW}'
+            """
+        )
+    finally:
+        await conn.close()
+    return {(record["username"], record["sale_date"]) for record in records}
+
+# Подготовка записей для пакетной вставки: очистка цен и отбрасывание некорректных строк
+def prepare_records(usernames, prices, datetimes):
+    records = []
+    for username, price, datetime_obj in zip(usernames, prices, datetimes):
+        cleaned_price = clean_price(price)
+        if cleaned_price is None:
+            continue  # Пропустить некорректные значения
+        records.append((username, cleaned_price, datetime_obj))
+    return records
+
+# Пакетная вставка: COPY во временную таблицу и одно слияние INSERT ... SELECT ... ON CONFLICT.
+# id выдает последовательность SERIAL, поэтому параллельные запуски не конфликтуют.
+# Признаки имени (name_length, is_clean, ...) база считает сама — это генерируемые столбцы.
+# Вставленные строки остаются во временной таблице sold_inserted до конца транзакции
+# и по ним инкрементально обновляются агрегаты дашборда. Месячные разделы sold_usernames
+# для дат пакета создаются заранее (partitions=False — для несекционированных таблиц).
+# Если строки вставлены, в той же транзакции растет версия данных таблицы (кэш дашборда).
+# С detector (anomaly_detector.AnomalyDetector) вставленные строки проходят через детектор
+# аномалий, и найденные предупреждения пишутся в sale_alerts в той же транзакции.
+# Возвращает (вставлено, дубликатов).
+async def insert_batch(conn, records, table="sold_usernames", rollups=True, partitions=True, detector=None):
+    started = time.perf_counter()
+    async with conn.transaction():
+        await conn.execute(
+            """
+            CREATE TEMP TABLE sold_stage (
+                username VARCHAR(255),
+                price NUMERIC,
+                sale_date TIMESTAMP
+            ) ON COMMIT DROP;
+            CREATE TEMP TABLE sold_inserted (
+                id INTEGER,
+                username VARCHAR(255),
+                price NUMERIC,
+                sale_date TIMESTAMP,
+                name_length SMALLINT,
+                is_clean BOOLEAN
+            ) ON COMMIT DROP;
+            """
+        )
+        await conn.copy_records_to_table(
+            "sold_stage", records=records, columns=["username", "price", "sale_date"]
+        )
+        if partitions:
+            await conn.execute("SELECT ensure_sold_partitions(MIN(sale_date), MAX(sale_date)) FROM sold_stage")
+        await conn.execute(
+            f"""
+            WITH ins AS (
+                INSERT INTO {table} (username, price, sale_date)
+                SELECT username, price, sale_date
+                FROM (
+                    SELECT DISTINCT ON (username, sale_date) username, price, sale_date
+                    FROM sold_stage
+                    ORDER BY username, sale_date
+                ) AS batch
+                ORDER BY sale_date  -- id растут в хронологическом порядке
+                ON CONFLICT DO NOTHING
+                RETURNING id, username, price, sale_date, name_length, is_clean
+            )
+            INSERT INTO sold_inserted SELECT * FROM ins
+            """
+        )
+        inserted = await conn.fetchval("SELECT COUNT(*) FROM sold_inserted")
+        if rollups and inserted:
+            await update_rollups(conn, "sold_inserted")
+        if detector is not None and inserted:
+            await record_alerts(conn, detector, "sold_inserted")
+        if inserted:
+            await bump_data_version(conn, table)
+    observe_phase("insert", time.perf_counter() - started, rows=len(records))
+    return inserted, len(records) - inserted
+
 # Асинхронная функция для вставки данных в PostgreSQL
 async def insert_data(usernames, prices, datetimes):
     pool = None
     try:
-        pool = await asyncpg.create_pool(
-            user="postgres",
-            password="Pdjyjr2",
-            database="SoldAnalysis",
-            host="localhost",
-            port="5432",
-            min_size=1,
-            max_size=10
-        )
+        pool = await create_pool()
         async with pool.acquire() as conn:
             logging.info("Подключение к базе данных успешно установлено.")
 
-            max_id = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM sold_usernames")
-
-            for username, price, datetime_obj in zip(usernames, prices, datetimes):
-                max_id += 1
-                # Очищаем цену и преобразуем в число
-                cleaned_price = clean_price(price)  # Используем функцию clean_price
-                if cleaned_price is None:
-                    continue  # Пропустить некорректные значения
+            # Нормы детектора аномалий — по последним продажам из базы
+            detector = AnomalyDetector()
+            await warm_up(conn, detector)
 
-                await conn.execute(
-                    """
-                    INSERT INTO sold_usernames (id, username, price, sale_date)
-                    VALUES ($1, $2, $3, $4)
-                    ON CONFLICT (username, sale_date) DO NOTHING
-                    """,
-                    max_id, username, cleaned_price, datetime_obj
-                )
+            records = prepare_records(usernames, prices, datetimes)
+            inserted, duplicates = await insert_batch(conn, records, detector=detector)
 
-            logging.info("Данные успешно добавлены в базу данных.")
+            logging.info(f"Данные успешно добавлены в базу данных: вставлено {inserted}, дубликатов {duplicates}.")
 
     except Exception as e:
         logging.error(f"Ошибка при работе с базой данных: {e}")
@@ -139,10 +184,20 @@ async def insert_data(usernames, prices, datetimes):
 
 
 # Основная асинхронная функция
-async def main():
+async def main(args):
     logging.info("Запуск программы.")
-    # Парсим данные
-    usernames, prices, datetimes = parse_data()
+    # Обходим ленту до первой уже сохраненной продажи
+    known = await load_known_keys()
+    rows = await fetch_sold_rows(
+        args.url, partial(parse_html, extractor=args.extractor),
+        is_known=lambda username, sale_date: (username, sale_date) in known,
+        headers=headers,
+        concurrency=args.concurrency,
+        max_pages=args.max_pages
+    )
+    usernames = [row[0] for row in rows]
+    prices = [row[1] for row in rows]
+    datetimes = [row[2] for row in rows]
 
     # Вставляем данные в базу данных
     await insert_data(usernames, prices, datetimes)
@@ -150,4 +205,9 @@ async def main():
 
 # Запуск асинхронного кода
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Сбор проданных имен с fragment.com в PostgreSQL")
+    parser.add_argument("--url", default=url, help="Адрес ленты (например, локальный сервер сохраненных страниц)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Число параллельных запросов")
+    parser.add_argument("--extractor", choices=available_extractors(), help="Движок разбора HTML (по умолчанию самый быстрый)")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES, help="Максимум страниц за один обход")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Признаки имени, которые хранятся в sold_usernames как генерируемые столбцы
+# (sql/migrations/005_username_features.sql); функции ниже считают их так же, но в pandas.
+FEATURE_COLUMNS = ["name_length", "is_clean", "digit_count", "underscore_count", "name_pattern", "length_bucket"]
+
+# Шаблон гласных/согласных: v — гласная, c — согласная, d — цифра, _ остается как есть
+VOWELS = "aeiou"
+CONSONANTS = "bcdfghjklmnpqrstvwxyz"
+DIGITS = "0123456789"
+PATTERN_TABLE = str.maketrans(
+    VOWELS + CONSONANTS + DIGITS,
+    "v" * len(VOWELS) + "c" * len(CONSONANTS) + "d" * len(DIGITS)
+)
+
+# Группы длины имени (как в тепловой карте длина x цена в ноутбуке)
+LENGTH_BUCKET_EDGES = [4, 5, 6, 7, 8, 9, 11, 14, 21]
+LENGTH_BUCKET_LABELS = ['4', '5', '6', '7', '8', '9', '10-11', '12-14', '15-21', '22-32']
+
+# Категории чистоты имени из ноутбуков (classify_username)
+PURITY_LABELS = ['Чистые', 'Нечистые: _ и цифры', 'Нечистые: только _', 'Нечистые: только цифры']
+
+
+def compute_features(usernames):
+    """Все признаки имени за один векторный проход; usernames — Series или список строк"""
+    names = pd.Series(usernames, dtype="string").str.lower()
+    name_length = names.str.len().to_numpy(dtype=np.int16)
+    digit_count = names.str.count(r"[0-9]").to_numpy(dtype=np.int16)
+    underscore_count = names.str.count("_").to_numpy(dtype=np.int16)
+    bucket_index = np.searchsorted(LENGTH_BUCKET_EDGES, name_length, side="left")
+    return pd.DataFrame({
+        "name_length": name_length,
+        "is_clean": (digit_count == 0) & (underscore_count == 0),
+        "digit_count": digit_count,
+        "underscore_count": underscore_count,
+        "name_pattern": names.str.translate(PATTERN_TABLE).to_numpy(dtype=object),
+        "length_bucket": np.array(LENGTH_BUCKET_LABELS, dtype=object)[bucket_index],
+    }, index=usernames.index if isinstance(usernames, pd.Series) else None)
+
+
+def classify_purity(features):
+    """Категория чистоты имени по digit_count/underscore_count (векторный аналог classify_username)"""
+    digits = features['digit_count'].to_numpy() > 0
+    underscores = features['underscore_count'].to_numpy() > 0
+    return np.select(
+        [~digits & ~underscores, digits & underscores, underscores, digits],
+        PURITY_LABELS,
+        default='Другие'
+    )
@@ -0,0 +1,193 @@
+import logging
+import re
+
+import pandas as pd
+
+from metrics import timed_query
+from queries import read
+from username_features import compute_features
+
+# Поиск имени: префикс, подстрока и нечеткий поиск (pg_trgm, sql/migrations/007_username_search.sql).
+# Цель по задержке (benchmarks/bench_search.py) выполняется для подстроки и нечеткого поиска только
+# с pg_trgm: без него подстрока ищется перебором всей таблицы, а задержка растет с ее размером
+SEARCH_MODES = ["auto", "prefix", "substring", "fuzzy"]
+SEARCH_LIMIT = 20
+
+# Триграммный индекс помогает только начиная с 3 символов; короче — только префикс
+MIN_TRIGRAM_LENGTH = 3
+
+# Сколько сопоставимых продаж показывать и за какой период считать перцентили цены
+COMPARABLE_LIMIT = 20
+COMPARABLE_DAYS = 90
+
+# Символы, допустимые в имени Telegram
+INVALID_CHARS = re.compile(r"[^a-z0-9_]")
+
+# Сводка по найденным именам: число продаж и последняя продажа
+MATCHES_SELECT = """
+    SELECT
+        username,
+        COUNT(*) AS sales_count,
+        MAX(sale_date) AS last_sale_date,
+        (ARRAY_AGG(price ORDER BY sale_date DESC))[1] AS last_price
+    FROM public.sold_usernames
+"""
+
+_trigram_available = None
+
+
+def normalize_username(text):
+    """Строка поиска -> имя: без @ и пробелов, в нижнем регистре, только допустимые символы"""
+    return INVALID_CHARS.sub("", (text or "").strip().lstrip("@").lower())
+
+
+def like_escape(text):
+    """Экранирование % и _ для LIKE (подчеркивание в именах — обычный символ)"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def trigram_available():
+    """Установлено ли расширение pg_trgm (проверяется один раз на процесс)"""
+    global _trigram_available
+    if _trigram_available is None:
+        _trigram_available = bool(len(read("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'", name="pg_trgm")))
+        if not _trigram_available:
+            logging.warning("pg_trgm не установлен: нечеткий поиск имен заменяется поиском по подстроке, "
+                            "а подстрока ищется перебором всей таблицы (медленно на больших таблицах).")
+    return _trigram_available
+
+
+def prefix_query(name, limit=SEARCH_LIMIT):
+    query = f"""
+        {MATCHES_SELECT}
+        WHERE username LIKE %(pattern)s
+        GROUP BY username
+        ORDER BY username
+        LIMIT %(limit)s;
+    """
+    return query, {"pattern": like_escape(name) + "%", "limit": limit}
+
+
+def substring_query(name, limit=SEARCH_LIMIT):
+    # Ближе к началу и короче — выше
+    query = f"""
+        {MATCHES_SELECT}
+        WHERE username LIKE %(pattern)s
+        GROUP BY username
+        ORDER BY strpos(username, %(name)s), length(username), username
+        LIMIT %(limit)s;
+    """
+    return query, {"pattern": "%" + like_escape(name) + "%", "name": name, "limit": limit}
+
+
+def fuzzy_query(name, limit=SEARCH_LIMIT):
+    # Оператор % (порог pg_trgm.similarity_threshold) использует триграммный индекс
+    query = f"""
+        SELECT matches.*, similarity(matches.username, %(name)s) AS similarity
+        FROM (
+            {MATCHES_SELECT}
+            WHERE username %% %(name)s
+            GROUP BY username
+        ) AS matches
+        ORDER BY similarity DESC, username
+        LIMIT %(limit)s;
+    """
+    return query, {"name": name, "limit": limit}
+
+
+SEARCH_QUERIES = {
+    "prefix": prefix_query,
+    "substring": substring_query,
+    "fuzzy": fuzzy_query,
+}
+
+
+@timed_query("sql")
+def search_usernames(text, mode="auto", limit=SEARCH_LIMIT):
+    """Найденные имена с числом продаж и последней продажей.
+
+    auto: сначала префикс, затем добор подстрокой, а если совпадений нет — нечеткий поиск.
+    Без pg_trgm подстрока ищется перебором всей таблицы, поэтому добирается, только если по префиксу пусто.
+    """
+    name = normalize_username(text)
+    if not name:
+        return pd.DataFrame(columns=["username", "sales_count", "last_sale_date", "last_price"])
+    if len(name) < MIN_TRIGRAM_LENGTH:
+        mode = "prefix"
+    if mode == "fuzzy" and not trigram_available():
+        mode = "substring"
+    if mode != "auto":
+        return read(*SEARCH_QUERIES[mode](name, limit), name=f"search_{mode}")
+
+    results = read(*prefix_query(name, limit), name="search_prefix")
+    if len(results) < limit and (trigram_available() or results.empty):
+        substring = read(*substring_query(name, limit), name="search_substring")
+        results = pd.concat([results, substring]).drop_duplicates("username").head(limit).reset_index(drop=True)
+    if results.empty and trigram_available():
+        results = read(*fuzzy_query(name, limit), name="search_fuzzy")
+    return results
+
+
+def sale_history_query(username):
+    query = """
+        SELECT
+            sale_date,
+            price,
+            LAG(price) OVER w AS previous_price,
+            price / NULLIF(LAG(price) OVER w, 0) - 1 AS price_change,
+            EXTRACT(EPOCH FROM sale_date - LAG(sale_date) OVER w) / 86400 AS days_since_previous
+        FROM public.sold_usernames
+        WHERE username = %(username)s
+        WINDOW w AS (ORDER BY sale_date)
+        ORDER BY sale_date;
+    """
+    return query, {"username": username}
+
+
+@timed_query("sql")
+def get_sale_history(username):
+    """Все продажи имени по времени: цена, прошлая цена и время с прошлой продажи"""
+    return read(*sale_history_query(normalize_username(username)), name="sale_history")
+
+
+def comparable_params(username):
+    """Длина и чистота имени — считаются по самому имени, поэтому работают и для непроданных"""
+    features = compute_features([username]).iloc[0]
+    return {"username": username, "name_length": int(features["name_length"]), "is_clean": bool(features["is_clean"])}
+
+
+def comparable_sales_query(username, limit=COMPARABLE_LIMIT):
+    query = """
+        SELECT username, price, sale_date
+        FROM public.sold_usernames
+        WHERE name_length = %(name_length)s AND is_clean = %(is_clean)s AND username <> %(username)s
+        ORDER BY sale_date DESC
+        LIMIT %(limit)s;
+    """
+    return query, {**comparable_params(username), "limit": limit}
+
+
+def comparable_summary_query(username, days=COMPARABLE_DAYS):
+    query = """
+        SELECT
+            COUNT(*) AS sales_count,
+            percentile_cont(0.25) WITHIN GROUP (ORDER BY price) AS price_p25,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS price_median,
+            percentile_cont(0.75) WITHIN GROUP (ORDER BY price) AS price_p75
+        FROM public.sold_usernames
+        WHERE name_length = %(name_length)s AND is_clean = %(is_clean)s AND username <> %(username)s
+          AND sale_date >= (SELECT MAX(sale_date) FROM public.sold_usernames) - make_interval(days => %(days)s);
+    """
+    return query, {**comparable_params(username), "days": days}
+
+
+@timed_query("sql")
+def get_comparable_sales(username, limit=COMPARABLE_LIMIT):
+    """Последние продажи имен той же длины и чистоты"""
+    return read(*comparable_sales_query(normalize_username(username), limit), name="comparable_sales")
+
+
+@timed_query("sql")
+def get_comparable_summary(username, days=COMPARABLE_DAYS):
+    """Число и перцентили цен сопоставимых продаж за последние days дней истории"""
+    return read(*comparable_summary_query(normalize_username(username), days), name="comparable_summary").iloc[0]